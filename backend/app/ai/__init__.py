@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Form, Response, BackgroundTasks
 from fastapi import APIRouter, Depends, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from openai import OpenAI
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.chat import Chat
 from app.models.material import Material
 from app.models.user import User
 from app.auth.middleware import get_current_user
-from app.db import get_db, SessionLocal
-import base64
+from app.db import get_db, AsyncSessionLocal
+from app.ratelimit import RateLimiter, Limit
+from app.blobs import blob_store
 import os
 import io
 import json
@@ -23,12 +27,17 @@ client = OpenAI(
     base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
 )
 
+# Each message is an LLM call
+message_limiter = RateLimiter(
+    "chat_message", per_user=Limit(0.2, 3), global_limit=Limit(5, 20), queue=True, max_wait=15
+)
+
 
 @router.get("/chat")
 async def chat(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
-    chats = db.query(Chat).all()
+    chats = (await db.scalars(select(Chat))).all()
     if not chats:
         return []
     else:
@@ -45,10 +54,12 @@ async def chat(
 @router.get("/chat/{chat_id}")
 async def get_chat(
     chat_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    chat = db.query(Chat).filter(Chat.chat_id == chat_id).first()
+    chat = await db.scalar(
+        select(Chat).where(Chat.chat_id == chat_id).options(undefer(Chat.messages))
+    )
     if not chat:
         return None
 
@@ -63,7 +74,7 @@ async def get_chat(
 
 @router.post("/chat")
 async def create_chat(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
     chat_id = str(uuid.uuid4())
     chat = Chat(
@@ -75,8 +86,8 @@ async def create_chat(
     )
 
     db.add(chat)
-    db.commit()
-    db.refresh(chat)
+    await db.commit()
+    await db.refresh(chat)
 
     return {"chat_id": chat_id}
 
@@ -85,16 +96,17 @@ async def create_chat(
 async def update_chat_name(
     chat_id: str,
     title: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    chat = db.query(Chat).filter(Chat.chat_id == chat_id).first()
+    chat = await db.scalar(
+        select(Chat).where(Chat.chat_id == chat_id).options(undefer(Chat.messages))
+    )
     if not chat:
         return None
 
     chat.title = title
-    db.commit()
-    db.refresh(chat)
+    await db.commit()
 
     return {
         "chat_id": chat.chat_id,
@@ -115,28 +127,30 @@ async def update_chat_name(
 @router.delete("/chat/{chat_id}")
 async def delete_chat(
     chat_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    chat = db.query(Chat).filter(Chat.chat_id == chat_id).first()
+    chat = await db.scalar(select(Chat).where(Chat.chat_id == chat_id))
     if not chat:
         return {"message": "Chat not found"}
 
-    db.delete(chat)
-    db.commit()
+    await db.delete(chat)
+    await db.commit()
 
     return {"message": "Chat deleted successfully"}
 
 
-@router.post("/chat/{chat_id}/message")
+@router.post("/chat/{chat_id}/message", dependencies=[Depends(message_limiter)])
 async def send_message(
     chat_id: str,
     background_tasks: BackgroundTasks,
     message: str = Form(...),
     material_id: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    chat = db.query(Chat).filter(Chat.chat_id == chat_id).first()
+    chat = await db.scalar(
+        select(Chat).where(Chat.chat_id == chat_id).options(undefer(Chat.messages))
+    )
     if not chat:
         return None
 
@@ -152,8 +166,8 @@ async def send_message(
 
     # Handle material file if needed
     if chat.material_id:
-        material = (
-            db.query(Material).filter(Material.material_id == chat.material_id).first()
+        material = await db.scalar(
+            select(Material).where(Material.material_id == chat.material_id)
         )
         if material and not any(
             (
@@ -163,14 +177,11 @@ async def send_message(
             )
             for msg in messages
         ):
-            # Extract base64 data from the data URL
-            base64_data = material.data
-            if base64_data.startswith("data:application/pdf;base64,"):
-                base64_data = base64_data.split(",", 1)[1]
-            pdf_bytes = base64.b64decode(base64_data)
+            pdf_bytes = await blob_store.load(material.data_hash)
             file_like = io.BytesIO(pdf_bytes)
             file_like.name = "material.pdf"
-            file_object = client.files.create(
+            file_object = await run_in_threadpool(
+                client.files.create,
                 file=file_like,
                 purpose="file-extract",
             )
@@ -191,7 +202,8 @@ async def send_message(
     )
 
     # Get API response
-    response = client.chat.completions.create(
+    response = await run_in_threadpool(
+        client.chat.completions.create,
         model="qwen-long",
         messages=messages,
         stream=True,
@@ -226,15 +238,14 @@ async def send_message(
         # Signal end of stream
         yield ""
 
-    def save_chat():
-        with SessionLocal() as new_db:
-            chat_obj = new_db.query(Chat).filter(Chat.chat_id == chat_id).first()
+    async def save_chat():
+        async with AsyncSessionLocal() as new_db:
+            chat_obj = await new_db.scalar(select(Chat).where(Chat.chat_id == chat_id))
             if not chat_obj:
                 print(f"ERROR: Chat {chat_id} not found in database")
                 return
             chat_obj.messages = messages
-            new_db.commit()
-            new_db.refresh(chat_obj)
+            await new_db.commit()
 
     background_tasks.add_task(save_chat)
 
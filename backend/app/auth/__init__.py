@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from datetime import timedelta, datetime
 import uuid
 
 from app.auth.middleware import get_db, get_current_user
+from app.auth.cache import notify_session_ended, revoke_token
 from app.models.user import (
     TokenSchema,
     UserCreate,
@@ -18,53 +19,76 @@ from app.auth.utils import (
     verify_password,
     get_password_hash,
     create_access_token,
+    create_stateless_token,
     get_user_by_id,
     decode_access_token,
     get_session_by_id,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_STATELESS,
 )
+from app.blobs import blob_url
+from app.membership import get_user_course_ids, get_user_group_keys
+from app.ratelimit import RateLimiter, Limit
 
 router = APIRouter()
 security = HTTPBearer()
 
+# Per client address: a classroom behind one NAT shares a bucket. The global
+# bucket keeps the bcrypt queue short.
+login_limiter = RateLimiter(
+    "login", per_user=Limit(5, 30), global_limit=Limit(50, 100), queue=True, max_wait=10
+)
+
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
-    db_user = get_user_by_id(db, user_data.user_id)
+    db_user = await get_user_by_id(db, user_data.user_id)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="User ID already registered"
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     db_user = User(
         user_id=user_data.user_id,
         name=user_data.name,
         password=hashed_password,
         email=user_data.email,
         is_teacher=user_data.is_teacher,
-        courses=[],
-        groups=[],
     )
 
     db.add(db_user)
-    db.commit()
+    await db.commit()
 
     return {"msg": "User registered successfully"}
 
 
-@router.post("/login", response_model=TokenSchema)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", response_model=TokenSchema, dependencies=[Depends(login_limiter)])
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     # Verify user
-    user = get_user_by_id(db, user_data.name)
-    if not user or not verify_password(user_data.password, user.password):
+    user = await get_user_by_id(db, user_data.name)
+    valid, new_hash = (
+        await verify_password(user_data.password, user.password) if user else (False, None)
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash is not None:
+        # AUTH_BCRYPT_ROUNDS changed since this password was stored
+        user.password = new_hash
+        await db.commit()
+
+    if AUTH_STATELESS:
+        return {
+            "token": create_stateless_token(user),
+            "user_id": user.user_id,
+            "is_teacher": str(user.is_teacher),
+        }
 
     # Create session
     session = Sessions(
@@ -73,11 +97,14 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         expires_at=datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     db.add(session)
-    db.commit()
+    await db.commit()
 
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": str(session.id)})
+    # user_id lets the token be attributed without a query (see token_user)
+    access_token = create_access_token(
+        data={"sub": str(session.id), "user_id": user.user_id}
+    )
 
     return {
         "token": access_token,
@@ -87,26 +114,50 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.delete("/logout")
-async def logout(token: str = Depends(security), db: Session = Depends(get_db)):
+async def logout(token: str = Depends(security), db: AsyncSession = Depends(get_db)):
     payload = decode_access_token(token.credentials)
+    if "jti" in payload:
+        await revoke_token(db, payload["jti"], datetime.fromtimestamp(payload["exp"]))
+        await db.commit()
+        return {"message": "Successfully logged out"}
+
     session_id: str = payload.get("sub")
-    session = get_session_by_id(db, session_id)
-    db.delete(session)
-    db.commit()
+    session = await get_session_by_id(db, session_id)
+    await db.delete(session)
+    await notify_session_ended(db, session_id)
+    await db.commit()
 
     return {"message": "Successfully logged out"}
 
 
+async def user_response(db: AsyncSession, user: User) -> UserResponse:
+    # A stateless token only carries user_id and is_teacher
+    await db.refresh(user, ["name", "email", "photo_hash", "office_hour", "office_place"])
+    return UserResponse(
+        user_id=user.user_id,
+        name=user.name,
+        email=user.email,
+        is_teacher=user.is_teacher,
+        courses=await get_user_course_ids(db, user.user_id),
+        photo=blob_url(user.photo_hash, "avatar"),
+        office_hour=user.office_hour,
+        office_place=user.office_place,
+        groups=await get_user_group_keys(db, user.user_id),
+    )
+
+
 @router.get("/user", response_model=UserResponse)
-async def get_user_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def get_user_me(
+    current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+):
+    return await user_response(db, current_user)
 
 
 @router.get("/user/{user_id}", response_model=UserResponse)
-async def get_user_by_id_endpoint(user_id: str, db: Session = Depends(get_db)):
-    user = get_user_by_id(db, user_id)
+async def get_user_by_id_endpoint(user_id: str, db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return user
+    return await user_response(db, user)
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import asyncpg
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.db import DATABASE_URL, async_engine, recent_writers
+from app.models.user import User, RevokedToken
+from app.auth.utils import AUTH_STATELESS
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+CHANNEL = "auth_cache"
+
+
+class SessionCache:
+    """Session id -> user columns, per uvicorn worker.
+
+    Entries live for ``ttl`` seconds and never past the session's expiry.
+    Writers that end a session or change a user publish a NOTIFY on
+    ``auth_cache`` in their transaction, which ``listener`` turns into
+    invalidations. The cache is bypassed whenever the listening connection
+    is down, since notifications could be missed then.
+
+    A request that misses reads ``generation`` before querying and hands it
+    to ``put``, which drops the entry if anything was invalidated meanwhile:
+    the rows may predate a logout whose notification was already handled.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()  # session_id -> (valid_until, user_id, values)
+        self.by_user = {}  # user_id -> {session_id}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0  # moved on by every invalidation
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and listener.listening
+
+    def get(self, session_id: str) -> dict | None:
+        if not self.enabled:
+            return None
+        entry = self.entries.get(session_id)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self._drop(session_id)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(session_id)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, session_id: str, user: User, expires_at: datetime, generation: int):
+        if not self.enabled or generation != self.generation:
+            return
+        unloaded = inspect(user).unloaded
+        values = {
+            column.key: getattr(user, column.key)
+            for column in User.__mapper__.column_attrs
+            if column.key not in unloaded
+        }
+        valid_until = min(time.time() + self.ttl, expires_at.timestamp())
+        self.entries[session_id] = (valid_until, user.user_id, values)
+        self.entries.move_to_end(session_id)
+        self.by_user.setdefault(user.user_id, set()).add(session_id)
+        while len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, session_id: str):
+        entry = self.entries.pop(session_id, None)
+        if entry is not None:
+            sessions = self.by_user.get(entry[1], set())
+            sessions.discard(session_id)
+            if not sessions:
+                self.by_user.pop(entry[1], None)
+
+    def invalidate_session(self, session_id: str):
+        self.generation += 1
+        self._drop(session_id)
+
+    def invalidate_user(self, user_id: str):
+        self.generation += 1
+        for session_id in list(self.by_user.get(user_id, ())):
+            self._drop(session_id)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+        self.by_user.clear()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class TokenDenylist:
+    """jti -> expiry of logged out stateless tokens, mirrored from
+    ``revoked_tokens`` while the listener is up and queried otherwise."""
+
+    def __init__(self):
+        self.entries = {}
+        self.revoked = 0
+
+    def add(self, jti: str, expires_at: float):
+        self.entries[jti] = expires_at
+        if len(self.entries) % 1000 == 0:
+            self.prune()
+
+    def prune(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self.entries.items() if expires_at <= now]:
+            del self.entries[jti]
+
+    async def load(self, connection):
+        rows = await connection.fetch(
+            "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > $1",
+            datetime.now(),
+        )
+        self.entries = {row["jti"]: row["expires_at"].timestamp() for row in rows}
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        if listener.listening:
+            return jti in self.entries
+        return (
+            await db.scalar(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+        ) is not None
+
+    def status(self) -> dict:
+        return {"entries": len(self.entries), "revoked": self.revoked}
+
+
+class InvalidationListener:
+    """LISTENs on ``auth_cache`` so every worker sees the session ends,
+    profile changes and token revocations of the others.
+
+    Payloads are ``session:<id>``, ``user:<user_id>``,
+    ``token:<jti>:<expiry timestamp>`` and ``wrote:<until timestamp>:<user>``
+    (see app.db_replica.RecentWriters).
+    """
+
+    def __init__(self):
+        self.listening = False
+        self._task = None
+
+    def on_notify(self, connection, pid, channel, payload: str):
+        kind, _, key = payload.partition(":")
+        if kind == "wrote":
+            until, _, user = key.partition(":")
+            recent_writers.mark(user, float(until))
+            return
+        session_cache.invalidations += 1
+        if kind == "session":
+            session_cache.invalidate_session(key)
+        elif kind == "user":
+            session_cache.invalidate_user(key)
+        elif kind == "token":
+            jti, _, expires_at = key.rpartition(":")
+            token_denylist.add(jti, float(expires_at))
+        else:
+            session_cache.clear()
+
+    async def listen(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(DATABASE_URL)
+                await connection.add_listener(CHANNEL, self.on_notify)
+                # Anything may have changed while nobody was listening
+                session_cache.clear()
+                await token_denylist.load(connection)
+                self.listening = True
+                while not connection.is_closed():
+                    await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Auth cache listener failed: %s", e)
+            finally:
+                self.listening = False
+                session_cache.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(5)
+
+    def start(self):
+        if (
+            session_cache.ttl > 0 or AUTH_STATELESS or recent_writers.enabled
+        ) and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+session_cache = SessionCache(AUTH_CACHE_TTL, AUTH_CACHE_SIZE)
+token_denylist = TokenDenylist()
+listener = InvalidationListener()
+
+
+async def attach_user(db: AsyncSession, values: dict) -> User:
+    """Turns known columns into a User of ``db`` without a query; the other
+    columns load on ``db.refresh``."""
+    user = User(**values)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+async def notify_session_ended(db: AsyncSession, session_id: str):
+    """Drops the session from every worker's cache once ``db`` commits."""
+    session_cache.invalidate_session(session_id)
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": f"session:{session_id}"},
+    )
+
+
+async def notify_user_changed(db: AsyncSession, user_id: str):
+    """Drops the user's sessions from every worker's cache once ``db`` commits."""
+    session_cache.invalidate_user(user_id)
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": f"user:{user_id}"},
+    )
+
+
+async def revoke_token(db: AsyncSession, jti: str, expires_at: datetime):
+    """Denies a stateless token on every worker once ``db`` commits."""
+    token_denylist.add(jti, expires_at.timestamp())
+    token_denylist.revoked += 1
+    await db.execute(
+        insert(RevokedToken)
+        .values(jti=jti, expires_at=expires_at)
+        .on_conflict_do_nothing()
+    )
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": f"token:{jti}:{expires_at.timestamp()}"},
+    )
+
+
+async def announce_write(user: str, until: float):
+    """Keeps the user's reads on the primary in every worker until ``until``."""
+    async with async_engine.begin() as conn:
+        await conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": f"wrote:{until}:{user}"},
+        )
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Cost of new hashes. Hashes of any other cost are replaced on the next login.
+AUTH_BCRYPT_ROUNDS = int(os.getenv("AUTH_BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads hash in parallel up to the core count
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Requests waiting for a hashing thread beyond this get a 503
+AUTH_HASH_MAX_QUEUE = int(os.getenv("AUTH_HASH_MAX_QUEUE", "1000"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=AUTH_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=AUTH_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=AUTH_BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    At most ``workers`` hashes run at once per uvicorn worker; the rest wait
+    in the executor's queue, which is capped at ``max_queue``.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_wait = 0.0
+        self.total_hash = 0.0
+
+    @property
+    def queued(self) -> int:
+        return self.pending - self.running
+
+    def timed(self, function, submitted: float, *args):
+        started = time.perf_counter()
+        with self.lock:
+            self.running += 1
+        try:
+            return function(*args)
+        finally:
+            finished = time.perf_counter()
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_wait += started - submitted
+                self.total_hash += finished - started
+
+    async def run(self, function, *args):
+        with self.lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many logins in progress, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.timed, function, time.perf_counter(), *args
+            )
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Checks ``password``; the second item is a replacement hash when
+        ``hashed`` was made with other settings than the current ones."""
+        valid, new_hash = await self.run(self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def status(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "rounds": AUTH_BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self.total_wait / completed * 1000, 3),
+            "avg_hash_ms": round(self.total_hash / completed * 1000, 3),
+        }
+
+
+password_hasher = PasswordHasher(pwd_context, AUTH_HASH_WORKERS, AUTH_HASH_MAX_QUEUE)
@@ -1,34 +1,64 @@
+from datetime import datetime
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.auth.utils import (
-    decode_access_token,
-    get_user_by_id,
-    validate_session,
-    get_session_by_id,
-)
+from app.models.user import User, Sessions
+from app.auth.cache import session_cache, token_denylist, attach_user
+from app.auth.utils import decode_access_token, ADMIN_USER_IDS, AUTH_STATELESS
 
 security = HTTPBearer()
 
 
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     payload = decode_access_token(credentials.credentials)
+
+    # Stateless tokens: the signature and exp were checked by decoding
+    if "jti" in payload:
+        if not AUTH_STATELESS or await token_denylist.is_revoked(db, payload["jti"]):
+            raise credentials_exception()
+        return await attach_user(
+            db, {"user_id": payload["user_id"], "is_teacher": payload["is_teacher"]}
+        )
+
     session_id: str = payload.get("sub")
+    values = session_cache.get(session_id)
+    if values is not None:
+        return await attach_user(db, values)
 
-    # Validate session
-    if not validate_session(db, session_id):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+    generation = session_cache.generation
+    # Session and user in one round trip
+    row = (
+        await db.execute(
+            select(User, Sessions.expires_at)
+            .join(Sessions, Sessions.user_id == User.user_id)
+            .where(Sessions.id == session_id)
         )
+    ).first()
+    if row is None or row.expires_at <= datetime.now():
+        raise credentials_exception()
+
+    session_cache.put(session_id, row.User, row.expires_at, generation)
+    return row.User
 
-    session = get_session_by_id(db, session_id)
-    user = get_user_by_id(db, session.user_id)
 
-    return user
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.user_id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select, text
+
+from app.db import async_engine
+from app.models.user import Sessions, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Seconds between runs; 0 disables the reaper
+AUTH_SESSION_REAP_INTERVAL = float(os.getenv("AUTH_SESSION_REAP_INTERVAL", "3600"))
+# Rows deleted per transaction, so a backlog never holds long locks
+AUTH_SESSION_REAP_BATCH = int(os.getenv("AUTH_SESSION_REAP_BATCH", "1000"))
+REAPER_LOCK_ID = 0x5345535349  # one reaper at a time across workers
+
+
+class SessionReaper:
+    """Deletes expired sessions and revoked tokens in batches.
+
+    Every worker runs one; a run only proceeds in the worker that gets the
+    advisory lock, the others skip it.
+    """
+
+    def __init__(self, engine, interval: float, batch_size: int):
+        self.engine = engine
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.reaped = 0
+        self.last_run = None
+        self._task = None
+
+    async def reap_batch(self, conn, model, key, now: datetime) -> int:
+        expired = (
+            select(key)
+            .where(model.expires_at < now)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await conn.execute(delete(model).where(key.in_(expired.scalar_subquery())))
+        return result.rowcount
+
+    async def reap(self) -> dict | None:
+        async with self.engine.connect() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": REAPER_LOCK_ID}
+            )
+            await conn.commit()
+            if not locked:
+                return None
+            try:
+                start = time.perf_counter()
+                now = datetime.now()
+                counts = {}
+                for name, model, key in (
+                    ("sessions", Sessions, Sessions.id),
+                    ("revoked_tokens", RevokedToken, RevokedToken.jti),
+                ):
+                    counts[name] = 0
+                    while True:
+                        deleted = await self.reap_batch(conn, model, key, now)
+                        await conn.commit()
+                        counts[name] += deleted
+                        if deleted < self.batch_size:
+                            break
+                        # Let other transactions in between batches
+                        await asyncio.sleep(0)
+                elapsed = time.perf_counter() - start
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": REAPER_LOCK_ID}
+                )
+                await conn.commit()
+
+        self.runs += 1
+        self.reaped += counts["sessions"]
+        self.last_run = {
+            "at": now.isoformat(),
+            "deleted": counts,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(sum(counts.values()) / elapsed, 1) if elapsed else None,
+        }
+        return self.last_run
+
+    async def run(self):
+        while True:
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Session reaper failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def table_status(self, db) -> dict:
+        # The planner's row estimate; counting the whole table would be the
+        # kind of scan this is meant to avoid
+        row = (
+            await db.execute(
+                text(
+                    """
+                    SELECT
+                        (SELECT reltuples::bigint FROM pg_class WHERE oid = 'sessions'::regclass),
+                        (SELECT count(*) FROM sessions WHERE expires_at < :now),
+                        pg_total_relation_size('sessions')
+                    """
+                ),
+                {"now": datetime.now()},
+            )
+        ).one()
+        return {"estimated_rows": row[0], "expired": row[1], "total_bytes": row[2]}
+
+    def status(self) -> dict:
+        return {
+            "interval": self.interval,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "reaped": self.reaped,
+            "last_run": self.last_run,
+        }
+
+
+session_reaper = SessionReaper(
+    async_engine, AUTH_SESSION_REAP_INTERVAL, AUTH_SESSION_REAP_BATCH
+)
@@ -1,38 +1,49 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
+import uuid
 from jose import jwt, JWTError
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import env_flag
 from app.models.user import User, Sessions
+from app.auth.hashing import password_hasher
 from fastapi import HTTPException, status
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+# Issue self-contained tokens instead of session ids (see create_stateless_token)
+AUTH_STATELESS = env_flag("AUTH_STATELESS")
+
+# Users allowed to read operational endpoints (metrics, query logs)
+ADMIN_USER_IDS = {
+    user_id.strip()
+    for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+    if user_id.strip()
+}
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """Returns whether the password matches, and a new hash to store when the
+    old one used a different cost."""
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 
-def get_user_by_id(db: Session, user_id: str):
-    return db.query(User).filter(User.user_id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: str):
+    return await db.scalar(select(User).where(User.user_id == user_id))
 
 
-def get_session_by_id(db: Session, session_id: str):
-    return db.query(Sessions).filter(Sessions.id == session_id).first()
+async def get_session_by_id(db: AsyncSession, session_id: str):
+    return await db.scalar(select(Sessions).where(Sessions.id == session_id))
 
 
-def validate_session(db: Session, session_id: str):
-    session = get_session_by_id(db, session_id)
+async def validate_session(db: AsyncSession, session_id: str):
+    session = await get_session_by_id(db, session_id)
     return session is not None and session.expires_at > datetime.now()
 
 
@@ -42,6 +53,34 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 
+def create_stateless_token(user: User) -> str:
+    """A token carrying the user, validated by its signature alone; the jti
+    lets logout revoke it before ``exp``."""
+    return create_access_token(
+        {
+            "user_id": user.user_id,
+            "is_teacher": bool(user.is_teacher),
+            "exp": datetime.now(timezone.utc)
+            + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+            "jti": uuid.uuid4().hex,
+        }
+    )
+
+
+def token_user(authorization: str | None) -> str | None:
+    """The user a bearer token is for, without a query: its user_id, or the
+    session id of session tokens issued before they carried one. None without
+    a valid token."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("user_id") or payload.get("sub")
+    return str(subject) if subject else None
+
+
 def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -0,0 +1,342 @@
+"""Content-addressed storage for uploaded files.
+
+Blobs are raw bytes stored under their SHA-256, so identical uploads share
+one file and a blob never changes once written. Rows keep the hash, size and
+mime type; the bytes live on disk (the backend PVC in deployment).
+
+    python -m app.blobs gc [--dry-run] [--grace 3600]
+
+``gc`` also drops chunked uploads older than UPLOAD_TTL (see app.uploads) and
+the thumbnails of PDFs no material uses (see app.pages).
+"""
+
+import argparse
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from urllib.parse import quote
+
+from fastapi import Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import delete, select, text, union
+
+from app.db import engine
+from app.models.file import FileDB
+from app.models.material import Material
+from app.models.pdf_index import PdfIndex
+from app.models.upload import Upload
+from app.models.user import User
+
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "data/blobs")
+# Unreferenced blobs younger than this are kept: an upload writes its blob
+# before the row pointing at it is committed
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", "3600"))
+# Uploads are copied and hashed in pieces of this size
+CHUNK_SIZE = 1024 * 1024
+
+
+# Magic bytes of the types served to browsers, trusted over file names
+SIGNATURES = (
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def guess_mime(name: str | None, data: bytes = b"") -> str:
+    for signature, mime in SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if name:
+        mime, _ = mimetypes.guess_type(name)
+        if mime:
+            return mime
+    return "application/octet-stream"
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes) -> tuple[str, int]:
+        """Stores ``data`` unless an identical blob exists; returns its hash
+        and size."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.exists(digest):
+            # Refresh the mtime so a concurrent GC keeps it
+            os.utime(self.path(digest))
+            return digest, len(data)
+        # Written aside and renamed, so a blob is never seen half written
+        tmp = self.temp()
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            self.adopt(tmp, digest)
+        except BaseException:
+            self.discard(tmp)
+            raise
+        return digest, len(data)
+
+    def put_file(self, source) -> tuple[str, int]:
+        """Like ``put`` for a file object, copied and hashed in chunks so it
+        is never in memory whole."""
+        sha = hashlib.sha256()
+        size = 0
+        tmp = self.temp()
+        try:
+            with open(tmp, "wb") as f:
+                while chunk := source.read(CHUNK_SIZE):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            self.adopt(tmp, digest)
+        except BaseException:
+            self.discard(tmp)
+            raise
+        return digest, size
+
+    def temp(self) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        os.close(fd)
+        return tmp
+
+    def discard(self, tmp: str):
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+
+    def adopt(self, tmp: str, digest: str):
+        """Moves the finished file ``tmp`` into the store as ``digest``. It
+        must be on the same filesystem."""
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.unlink(tmp)
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def head(self, digest: str, size: int = 12) -> bytes | None:
+        """The first bytes of a blob, enough for ``guess_mime``; None when
+        there is no such blob."""
+        try:
+            with open(self.path(digest), "rb") as f:
+                return f.read(size)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, digest: str):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def digests(self):
+        """Every stored blob as (hash, mtime, size)."""
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith(".tmp-"):
+                    continue
+                stat = os.stat(os.path.join(directory, name))
+                yield name, stat.st_mtime, stat.st_size
+
+    async def save(self, data: bytes) -> tuple[str, int]:
+        return await run_in_threadpool(self.put, data)
+
+    async def save_file(self, upload: UploadFile) -> tuple[str, int]:
+        await upload.seek(0)
+        return await run_in_threadpool(self.put_file, upload.file)
+
+    async def load(self, digest: str) -> bytes:
+        return await run_in_threadpool(self.get, digest)
+
+
+blob_store = BlobStore(BLOB_STORE_PATH)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    # If-None-Match compares weakly
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    media_type: str,
+    filename: str | None = None,
+    cache_control: str = "private, no-cache",
+    disposition: str = "inline",
+) -> Response:
+    """Serves a file that never changes under ``etag``, answering
+    If-None-Match with 304 and Range with 206."""
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": cache_control,
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse reads the file off the event loop in chunks and handles
+    # Range/If-Range itself
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        content_disposition_type=disposition,
+        headers=headers,
+    )
+
+
+def blob_response(
+    request: Request,
+    digest: str,
+    media_type: str,
+    filename: str | None = None,
+    cache_control: str = "private, no-cache",
+    disposition: str = "inline",
+) -> Response:
+    """Serves a blob with a strong ETag (its hash)."""
+    return file_response(
+        request,
+        blob_store.path(digest),
+        digest,
+        media_type,
+        filename,
+        cache_control,
+        disposition,
+    )
+
+
+# What is behind a URL naming its content never changes, so browsers and the
+# ingress may keep it for good
+IMMUTABLE = "public, max-age=31536000, immutable"
+# For responses that need a token, which shared caches must not keep
+PRIVATE_IMMUTABLE = "private, max-age=31536000, immutable"
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def blob_url(digest: str | None, name: str) -> str | None:
+    """The URL serving a blob as ``name`` (see app.slides.blob). It needs no
+    token, so hand it out only to users allowed to see the blob; a SHA-256
+    cannot be guessed."""
+    if digest is None:
+        return None
+    return f"/api/blob/{digest}/{quote(name.replace('/', '_'), safe='')}"
+
+
+def referenced_digests(conn) -> set[str]:
+    digests = set(
+        conn.execute(
+            union(
+                select(Material.data_hash).where(Material.data_hash.is_not(None)),
+                select(FileDB.content_hash).where(FileDB.content_hash.is_not(None)),
+                # Finalized uploads not attached to anything yet
+                select(Upload.content_hash).where(Upload.content_hash.is_not(None)),
+                select(User.photo_hash).where(User.photo_hash.is_not(None)),
+            )
+        ).scalars()
+    )
+    # Single pages split off by app.pages
+    digests.update(
+        conn.execute(
+            text("SELECT page->>2 FROM pdf_indexes, json_array_elements(pages) AS page")
+        ).scalars()
+    )
+    return digests
+
+
+def drop_stale_indexes(conn) -> int:
+    """Deletes page indexes of PDFs no material uses any more, letting their
+    pages be collected."""
+    return conn.execute(
+        delete(PdfIndex).where(
+            PdfIndex.data_hash.not_in(select(Material.data_hash))
+        )
+    ).rowcount
+
+
+def collect_garbage(
+    engine,
+    store: BlobStore = blob_store,
+    grace: float = BLOB_GC_GRACE,
+    dry_run: bool = False,
+) -> dict:
+    """Deletes blobs no row refers to that are older than ``grace`` seconds."""
+    cutoff = time.time() - grace
+    # Listed before reading the references, so a blob uploaded meanwhile is
+    # either too young or already referenced
+    candidates = [
+        (digest, size) for digest, mtime, size in store.digests() if mtime < cutoff
+    ]
+    with engine.begin() as conn:
+        if not dry_run:
+            drop_stale_indexes(conn)
+        referenced = referenced_digests(conn)
+    garbage = []
+    for digest, size in candidates:
+        if digest in referenced:
+            continue
+        # Re-uploading identical bytes touches the blob; that upload's row
+        # may not have been committed when the references were read
+        try:
+            if os.stat(store.path(digest)).st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        garbage.append((digest, size))
+        if not dry_run:
+            store.delete(digest)
+    return {
+        "deleted": len(garbage),
+        "freed_bytes": sum(size for _, size in garbage),
+        "referenced": len(referenced),
+        "dry_run": dry_run,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blob store maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="delete unreferenced blobs")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--grace", type=float, default=BLOB_GC_GRACE)
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        # These store into the blob store, so they cannot be imported up top
+        from app.pages import collect_thumbnails
+        from app.uploads import expire_uploads
+
+        if not args.dry_run:
+            print({"expired_uploads": expire_uploads(engine)})
+            print({"deleted_thumbnails": collect_thumbnails(engine, args.grace)})
+        print(collect_garbage(engine, grace=args.grace, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
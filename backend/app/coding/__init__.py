@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.models.user import User
-from app.models.group import Group
+from app.models.group import GroupMember
 from app.models.environment import Environment
 from app.models.assignment import Assignment
 from app.models.course import Course
@@ -11,12 +13,14 @@ from app.models.file import FileDB
 from typing import Dict, Any
 from kubernetes import config, client
 from app.auth.middleware import get_current_user
+from app.membership import find_user_group_id, is_group_member
+from app.ratelimit import RateLimiter, Limit
+from app.blobs import blob_store, blob_url
 from .api import *
 import os
 import websockets
 import asyncio
 import shutil
-import base64
 import httpx
 
 router = APIRouter()
@@ -25,6 +29,11 @@ if os.environ.get("ENVNAME") == "k3s":
 else:
     config.load_kube_config()
 
+# Creating an environment may start a pod
+environment_limiter = RateLimiter(
+    "create_environment", per_user=Limit(0.1, 3), global_limit=Limit(1, 10), queue=True, max_wait=30
+)
+
 
 # Establish WebSocket connection to the environment
 @router.websocket("/environment/{env_id}/wsurl/{file_path:path}")
@@ -32,10 +41,12 @@ async def websocket_endpoint(
     websocket: WebSocket,
     env_id: str,
     file_path: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
@@ -88,10 +99,12 @@ async def websocket_endpoint(
 @router.post("/terminal/{env_id}/init")
 async def init_terminal(
     env_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
@@ -114,9 +127,11 @@ async def terminal_endpoint(
     websocket: WebSocket,
     env_id: str,
     pid: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
@@ -188,11 +203,13 @@ def build_file_structure(path: str, base_uri: str = "/") -> Dict[str, Any]:
 @router.get("/environment/{env_id}/files")
 async def get_environment_files(
     env_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # TODO: add auth check
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
@@ -211,17 +228,17 @@ async def create_environment_file(
     env_id: str,
     file_path: str = Form(...),
     file_name: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
     if env.is_collaborative:
-        group_id = env.group_id
-        group = db.query(Group).filter(Group.group_id == group_id).first()
-        if not group or current_user.user_id not in group.users:
+        if not await is_group_member(db, env.group_id, current_user.user_id):
             raise HTTPException(status_code=403, detail="You are not a member of this group")
     else:
         if env.user_id != current_user.user_id:
@@ -239,17 +256,17 @@ async def create_environment_file(
 async def create_environment_directory(
     env_id: str,
     directory_path: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
     if env.is_collaborative:
-        group_id = env.group_id
-        group = db.query(Group).filter(Group.group_id == group_id).first()
-        if not group or current_user.user_id not in group.users:
+        if not await is_group_member(db, env.group_id, current_user.user_id):
             raise HTTPException(status_code=403, detail="You are not a member of this group")
     else:
         if env.user_id != current_user.user_id:
@@ -270,17 +287,17 @@ async def update_environment_path(
     env_id: str,
     from_uri: str = Form(...),  # File or a directory
     to_uri: str = Form(...),    # Always a directory
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
 
     if env.is_collaborative:
-        group_id = env.group_id
-        group = db.query(Group).filter(Group.group_id == group_id).first()
-        if not group or current_user.user_id not in group.users:
+        if not await is_group_member(db, env.group_id, current_user.user_id):
             raise HTTPException(status_code=403, detail="You are not a member of this group")
     else:
         if env.user_id != current_user.user_id:
@@ -315,17 +332,17 @@ async def update_environment_path(
 async def delete_environment_path(
     env_id: str,
     uri: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    env = db.query(Environment).filter(Environment.environment_id == env_id).first()
+    env = await db.scalar(
+        select(Environment).where(Environment.environment_id == env_id)
+    )
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found")
     
     if env.is_collaborative:
-        group_id = env.group_id
-        group = db.query(Group).filter(Group.group_id == group_id).first()
-        if not group or current_user.user_id not in group.users:
+        if not await is_group_member(db, env.group_id, current_user.user_id):
             raise HTTPException(status_code=403, detail="You are not a member of this group")
     else:
         if env.user_id != current_user.user_id:
@@ -363,24 +380,26 @@ async def get_pdf_file(
 async def get_environments(
     course_id: str,
     assign_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # This is a teacher account
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    assign = db.query(Assignment).filter(Assignment.assignment_id == assign_id).first()
+    assign = await db.scalar(
+        select(Assignment).where(Assignment.assignment_id == assign_id)
+    )
     if not assign:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     is_group = assign.is_group_assign
     
-    envs = db.query(Environment).filter(
+    envs = (await db.scalars(select(Environment).where(
         Environment.assignment_id == assign_id,
         Environment.course_id == course_id,
         Environment.is_collaborative == is_group
-    ).all()
+    ))).all()
     
     return {
         "message": "Environments retrieved successfully",
@@ -390,11 +409,11 @@ async def get_environments(
                 "users": [
                     {
                         "name": user.name,
-                        "avatar": user.photo,
+                        "avatar": blob_url(user.photo_hash, "avatar"),
                         "user_id": user.user_id
-                    } for user in db.query(User).filter(
-                        (User.user_id == env.user_id) | (User.user_id.in_(db.query(Group).filter(Group.group_id == env.group_id).first().users if env.group_id else []))
-                    ).all()
+                    } for user in await db.scalars(select(User).where(
+                        (User.user_id == env.user_id) | (User.user_id.in_(select(GroupMember.user_id).where(GroupMember.group_id == env.group_id)))
+                    ))
                 ],
                 "is_group_assign": env.is_collaborative,
                 "create_time": env.created_at.isoformat(),
@@ -403,31 +422,28 @@ async def get_environments(
         ]
     }
 
-@router.post("/environment")
+@router.post("/environment", dependencies=[Depends(environment_limiter)])
 async def get_environment(
     course_id: str = Form(...),
     assign_id: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     core_v1 = client.CoreV1Api()
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    assign = db.query(Assignment).filter(Assignment.assignment_id == assign_id).first()
+    assign = await db.scalar(
+        select(Assignment).where(Assignment.assignment_id == assign_id)
+    )
     if not assign:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     # Check if the user is in a group for the course
     is_group = assign.is_group_assign
     if is_group:
-        groups = db.query(Group).filter(Group.course_id == course_id).all()
-        group_id = None
-        for group in groups:
-            if current_user.user_id in group.users:
-                group_id = group.group_id
-                break
+        group_id = await find_user_group_id(db, course_id, current_user.user_id)
         if not group_id:
             return {
                 "message": "Require group",
@@ -437,7 +453,7 @@ async def get_environment(
         group_id = None
         
     # Check if the environment already exists
-    env = check_environment(assign_id, current_user.user_id if not is_group else group_id, is_group, db)
+    env = await check_environment(assign_id, current_user.user_id if not is_group else group_id, is_group, db)
     
     newly_created = False
     if not env:
@@ -446,27 +462,30 @@ async def get_environment(
         else:
             env = Environment(course_id=course_id, assignment_id=assign_id, user_id=current_user.user_id, is_collaborative=False)
         db.add(env)
-        db.commit()
-        db.refresh(env)
-        name = create_pod(core_v1, env.environment_id)
+        await db.commit()
+        await db.refresh(env)
+        # create_pod polls the k8s API with time.sleep, keep it off the event loop
+        name = await run_in_threadpool(create_pod, core_v1, env.environment_id)
         env.wsUrl = f"ws://{name}" # Set the WebSocket URL to the pod name
         db.add(env)
-        db.commit()
-        db.refresh(env)
+        await db.commit()
+        await db.refresh(env)
         newly_created = True
         
     env_id = env.environment_id
     
     if newly_created:
-        assign = db.query(Assignment).filter(Assignment.assignment_id == assign_id).first()
+        assign = await db.scalar(
+            select(Assignment).where(Assignment.assignment_id == assign_id)
+        )
         if not assign:
             raise HTTPException(status_code=404, detail="Assignment not found")
         files = assign.files
         for file in files:
-            file_obj = db.query(FileDB).filter(FileDB.file_id == file).first()
+            file_obj = await db.scalar(select(FileDB).where(FileDB.file_id == file))
             file_name = file_obj.file_name
             file_path = file_obj.file_path
-            file_content = base64.b64decode(file_obj.content)  # Decode the base64 content from 'data'
+            file_content = await blob_store.load(file_obj.content_hash)
             os.makedirs(f"/app/data/{env_id}/{file_path}", exist_ok=True)
             with open(f"/app/data/{env_id}/{file_path}/{file_name}", "wb") as f:
                 f.write(file_content)
@@ -475,9 +494,9 @@ async def get_environment(
         "environment_id": env_id
     }
 
-def check_environment(assign_id: str, id: str, is_group: bool, db: Session = Depends(get_db)):
+async def check_environment(assign_id: str, id: str, is_group: bool, db: AsyncSession = Depends(get_db)):
     if is_group:
-        env = db.query(Environment).filter(Environment.assignment_id == assign_id, Environment.group_id == id, Environment.is_collaborative == True).first()
+        env = await db.scalar(select(Environment).where(Environment.assignment_id == assign_id, Environment.group_id == id, Environment.is_collaborative == True))
     else:
-        env = db.query(Environment).filter(Environment.assignment_id == assign_id, Environment.user_id == id, Environment.is_collaborative == False).first()
+        env = await db.scalar(select(Environment).where(Environment.assignment_id == assign_id, Environment.user_id == id, Environment.is_collaborative == False))
     return env
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""Per-course fragments of the dashboard responses.
+
+Every course carries a ``version`` drawn from the ``course_versions``
+sequence, and every write to a course, its sections or its assignments
+moves it to a new value in the writer's transaction (``bump_course_versions``).
+Fragments are cached per worker under (kind, course id, version): a request
+reads the versions of the user's courses, which is one indexed query, and
+only builds fragments for versions it has not seen. Stale entries are never
+looked up again and fall out of the LRU. Versions are never reused, even by
+a course created again under the same id.
+"""
+
+import os
+from collections import OrderedDict
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.course import Course, CourseMember, course_versions
+
+COURSE_CACHE_SIZE = int(os.getenv("COURSE_CACHE_SIZE", "10000"))
+
+
+async def bump_course_versions(db: AsyncSession, *course_ids):
+    """Marks what is cached of these courses stale. Call it in the
+    transaction of the write, after any earlier commit of the handler."""
+    course_ids = [course_id for course_id in course_ids if course_id is not None]
+    if not course_ids:
+        return
+    await db.execute(
+        update(Course)
+        .where(Course.course_id.in_(course_ids))
+        .values(version=course_versions.next_value(), updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def user_course_versions(db: AsyncSession, user_id: str) -> dict:
+    """Course id -> version of every course the user belongs to."""
+    return dict(
+        (
+            await db.execute(
+                select(Course.course_id, Course.version)
+                .join(CourseMember, CourseMember.course_id == Course.course_id)
+                .where(CourseMember.user_id == user_id)
+            )
+        ).all()
+    )
+
+
+class CourseCache:
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()  # (kind, course_id, version) -> fragment
+        self.hits = 0
+        self.misses = 0
+
+    async def fragments(self, kind: str, versions: dict, build) -> dict:
+        """Course id -> fragment of ``kind`` for the courses in ``versions``.
+        Those not cached are made by ``await build(course_ids)`` at once,
+        which returns them by course id."""
+        found, missing = {}, []
+        for course_id, version in versions.items():
+            fragment = self.entries.get((kind, course_id, version))
+            if fragment is None:
+                missing.append(course_id)
+            else:
+                self.entries.move_to_end((kind, course_id, version))
+                found[course_id] = fragment
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            built = await build(missing)
+            for course_id in missing:
+                # Gone since the versions were read
+                if course_id not in built:
+                    continue
+                found[course_id] = built[course_id]
+                self.entries[(kind, course_id, versions[course_id])] = built[course_id]
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return found
+
+    def status(self) -> dict:
+        return {
+            "size": self.size,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+course_cache = CourseCache(COURSE_CACHE_SIZE)
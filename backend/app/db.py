@@ -1,22 +1,148 @@
 # app/db.py
 import os
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from dotenv import load_dotenv
 
+from app.db_pool import instrumented_pool
+from app.db_queries import track_queries
+from app.db_slow import SlowQueryLog
+from app.db_replica import RecentWriters, ReplicaHealth, request_user
+
 load_dotenv()
 
 host = "postgres" if os.environ.get("ENVNAME") == "k3s" else "localhost"
 db_port = 5432
 DATABASE_URL = f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{host}:{db_port}/{os.getenv('POSTGRES_DB')}"
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+# Optional streaming replica serving read-only handlers (see get_read_db).
+replica_host = os.getenv("POSTGRES_REPLICA_HOST")
+replica_port = int(os.getenv("POSTGRES_REPLICA_PORT", "5432"))
+REPLICA_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{replica_host}:{replica_port}/{os.getenv('POSTGRES_DB')}"
+    if replica_host
+    else None
+)
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# Every uvicorn worker owns its own pools, so the connections the backend can
+# hold are workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) per engine.
+DB_ECHO = env_flag("DB_ECHO")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING")
+# asyncpg connections are bound to the loop that opened them, so callers that
+# spin up a fresh loop per request (the test client) disable pooling.
+DB_NULL_POOL = env_flag("DB_NULL_POOL")
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "10"))
+# Requests above either limit are reported as likely N+1 offenders
+DB_QUERY_WARN_THRESHOLD = int(os.getenv("DB_QUERY_WARN_THRESHOLD", "20"))
+DB_QUERY_REPEAT_THRESHOLD = int(os.getenv("DB_QUERY_REPEAT_THRESHOLD", "5"))
+# Slow query log, off unless a threshold is set
+DB_SLOW_QUERY_MS = os.getenv("DB_SLOW_QUERY_MS")
+DB_SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+DB_SLOW_QUERY_RETENTION_DAYS = float(os.getenv("DB_SLOW_QUERY_RETENTION_DAYS", "7"))
+
+
+def pool_options(base: type[QueuePool]) -> dict:
+    if DB_NULL_POOL:
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": instrumented_pool(base),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Synchronous engine, only used for schema management (tests, scripts).
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, **pool_options(QueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Request handlers run on the event loop and must only use the async engine.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=DB_ECHO, **pool_options(AsyncAdaptedQueuePool)
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+track_queries(async_engine.sync_engine)
+
+if DB_SLOW_QUERY_MS:
+    slow_query_log = SlowQueryLog(
+        async_engine,
+        float(DB_SLOW_QUERY_MS),
+        DB_SLOW_QUERY_EXPLAIN_SAMPLE,
+        DB_SLOW_QUERY_RETENTION_DAYS,
+    )
+    slow_query_log.install()
+else:
+    slow_query_log = None
+
+if REPLICA_DATABASE_URL:
+    replica_engine = create_async_engine(
+        REPLICA_DATABASE_URL, echo=DB_ECHO, **pool_options(AsyncAdaptedQueuePool)
+    )
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, autoflush=False, expire_on_commit=False
+    )
+    track_queries(replica_engine.sync_engine)
+    if slow_query_log is not None:
+        slow_query_log.install(replica_engine)
+    replica_health = ReplicaHealth(
+        replica_engine, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL
+    )
+else:
+    replica_engine = ReplicaSessionLocal = replica_health = None
+recent_writers = RecentWriters(DB_READ_YOUR_WRITES_WINDOW, replica_health is not None)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_read_db(request: Request):
+    """Session for read-only handlers.
+
+    Uses the replica unless none is configured, it is down or lagging, or the
+    user wrote something within the read-your-writes window.
+    """
+    if (
+        replica_health is None
+        or recent_writers.wrote(request_user(request))
+        or not await replica_health.usable()
+    ):
+        request.state.db_target = "primary"
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    request.state.db_target = "replica"
+    async with ReplicaSessionLocal() as db:
+        try:
+            yield db
+        except (InterfaceError, OperationalError, OSError) as e:
+            # Send the following requests to the primary until the next probe
+            replica_health.mark_down(e)
+            raise
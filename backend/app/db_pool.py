@@ -0,0 +1,78 @@
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+
+class CheckoutStats:
+    """Checkout wait times of one pool, as seen by this worker process."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.timeouts = 0
+
+    def record(self, elapsed: float, timed_out: bool = False):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if timed_out:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.count,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "wait_max_ms": round(self.max * 1000, 3),
+            "wait_total_ms": round(self.total * 1000, 3),
+        }
+
+
+class _TimedCheckout:
+    """Times how long ``_do_get`` blocks before handing out a connection.
+
+    That covers waiting for a checked-in connection as well as opening a new
+    one when the pool is allowed to overflow.
+    """
+
+    stats: CheckoutStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - start, timed_out)
+
+
+def instrumented_pool(base: type[QueuePool]) -> type[QueuePool]:
+    """A subclass of ``base`` with its own checkout stats; use one per engine."""
+    return type(
+        f"Instrumented{base.__name__}",
+        (_TimedCheckout, base),
+        {"stats": CheckoutStats()},
+    )
+
+
+def pool_status(pool) -> dict:
+    """Current occupancy of ``pool`` plus its accumulated checkout waits."""
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    status = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # overflow() goes negative while the pool is still below ``size``
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout(),
+    }
+    if isinstance(pool, _TimedCheckout):
+        status.update(pool.stats.snapshot())
+    return status
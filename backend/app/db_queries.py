@@ -0,0 +1,184 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Expanded IN lists and bind markers of both paramstyles in use
+_IN_LIST = re.compile(r"\((?:\s*(?:\$\d+|%\([^)]*\)s|\?)\s*,?)+\)")
+_PARAM = re.compile(r"\$\d+|%\([^)]*\)s")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with parameters and IN lists collapsed, so the same query
+    issued for different rows counts as one shape."""
+    statement = _IN_LIST.sub("(?)", statement)
+    statement = _PARAM.sub("?", statement)
+    return " ".join(statement.split())
+
+
+class QueryStats:
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope  # ASGI scope of the request, if any
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration: float, rows: int = 0):
+        self.count += 1
+        self.total += duration
+        self.rows += rows
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def count_queries(scope: dict | None = None):
+    """Collects the statements run inside the block, e.g. in tests."""
+    stats = QueryStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def route_name(scope: dict | None) -> str | None:
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {route.path}" if route else "unmatched"
+
+
+def current_route() -> str | None:
+    """Route template of the request issuing the current statement."""
+    stats = _current.get()
+    return route_name(stats.scope) if stats is not None else None
+
+
+def track_queries(engine):
+    """Attributes every statement run on ``engine`` to the active QueryStats."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            # DBAPI rowcount: rows returned or changed, -1 when the driver
+            # cannot tell
+            stats.record(statement, duration, max(cursor.rowcount, 0))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+class RouteQueryStats:
+    """Per-route totals since the worker started, for /metrics/queries."""
+
+    def __init__(self):
+        self.routes = {}
+
+    def record(self, route: str, stats: QueryStats, flagged: bool):
+        entry = self.routes.setdefault(
+            route,
+            {"requests": 0, "queries": 0, "db_time": 0.0, "max_queries": 0, "flagged": 0},
+        )
+        entry["requests"] += 1
+        entry["queries"] += stats.count
+        entry["db_time"] += stats.total
+        entry["max_queries"] = max(entry["max_queries"], stats.count)
+        entry["flagged"] += int(flagged)
+
+    def snapshot(self) -> dict:
+        return {
+            route: {
+                **entry,
+                "db_time": round(entry["db_time"], 6),
+                "avg_queries": round(entry["queries"] / entry["requests"], 2),
+            }
+            for route, entry in sorted(self.routes.items())
+        }
+
+
+route_query_stats = RouteQueryStats()
+
+
+def query_counter(threshold: int, repeat_threshold: int):
+    """HTTP middleware reporting the statements and DB time of each request.
+
+    Requests issuing more than ``threshold`` statements, or the same statement
+    shape ``repeat_threshold`` times or more (the N+1 pattern), are logged and
+    marked with an ``X-DB-Query-Warning`` header.
+
+    The headers go out before the body, so they only cover the statements run
+    until the response started. The log and /metrics/queries are written once
+    the body has been sent and include statements run while it streamed.
+    """
+
+    def check(stats: QueryStats) -> list[str]:
+        warnings = []
+        if stats.count > threshold:
+            warnings.append(f"{stats.count} queries")
+        repeated = stats.repeated(repeat_threshold)
+        if repeated:
+            warnings.append(f"statement repeated {repeated[0][1]} times")
+        return warnings
+
+    async def middleware(request: Request, call_next):
+        # The route runs in a copy of this context, so statements issued while
+        # the body streams still land in ``stats``
+        with count_queries(request.scope) as stats:
+            response = await call_next(request)
+
+        warnings = check(stats)
+        if warnings:
+            response.headers["X-DB-Query-Warning"] = "; ".join(warnings)
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time"] = f"{stats.total * 1000:.2f}"
+        response.headers["X-DB-Rows"] = str(stats.rows)
+
+        body = response.body_iterator
+
+        async def report():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                path = route_name(request.scope)
+                warnings = check(stats)
+                if warnings:
+                    repeated = stats.repeated(repeat_threshold)
+                    logger.warning(
+                        "%s: %s; most repeated: %s",
+                        path,
+                        ", ".join(warnings),
+                        repeated[0][0] if repeated else stats.shapes.most_common(1)[0][0],
+                    )
+                route_query_stats.record(path, stats, bool(warnings))
+
+        response.body_iterator = report()
+        return response
+
+    return middleware
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from fastapi import Request
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaHealth:
+    """Cached view of whether the read replica may serve queries.
+
+    The replica is probed at most once per ``check_interval`` by whichever
+    request finds the last probe stale. It is unusable while unreachable or
+    while its replay lag exceeds ``max_lag`` seconds.
+    """
+
+    def __init__(self, engine, max_lag: float, check_interval: float, timeout: float = 1.0):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def usable(self) -> bool:
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            async with self._lock:
+                if time.monotonic() - self.checked_at >= self.check_interval:
+                    await self.check()
+        return self.healthy
+
+    async def _probe(self):
+        async with self.engine.connect() as conn:
+            return await conn.scalar(REPLICA_LAG_QUERY)
+
+    async def check(self):
+        try:
+            lag = await asyncio.wait_for(self._probe(), timeout=self.timeout)
+            self.lag = float(lag or 0)
+            self.error = None
+            self.healthy = self.lag <= self.max_lag
+        except Exception as e:
+            self.lag = None
+            self.error = str(e)
+            self.healthy = False
+        self.checked_at = time.monotonic()
+
+    def mark_down(self, error: Exception):
+        self.healthy = False
+        self.error = str(error)
+        self.checked_at = time.monotonic()
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "error": self.error,
+        }
+
+
+class RecentWriters:
+    """Users who wrote within the read-your-writes window, whose reads stay on
+    the primary so they see their own changes even if the replica is behind.
+
+    Keyed by the user a request's token names (see app.auth.utils.token_user),
+    as the frontend sends tokens but no cookies. Each worker keeps its own
+    map; ``read_your_writes`` announces writes on ``auth_cache`` so the others
+    (app.auth.cache.listener) learn of them as well.
+    """
+
+    def __init__(self, window: float, enabled: bool, size: int = 100_000):
+        self.window = window
+        self.enabled = enabled
+        self.size = size
+        self._until: dict[str, float] = {}
+
+    def mark(self, user: str, until: float):
+        if user not in self._until and len(self._until) >= self.size:
+            now = time.time()
+            self._until = {key: end for key, end in self._until.items() if end > now}
+            if len(self._until) >= self.size:
+                # Oldest first
+                del self._until[next(iter(self._until))]
+        self._until[user] = max(until, self._until.get(user, 0))
+
+    def wrote(self, user: str | None) -> bool:
+        until = self._until.get(user)
+        if until is None:
+            return False
+        if until <= time.time():
+            self._until.pop(user, None)
+            return False
+        return True
+
+
+def request_user(request: Request) -> str | None:
+    # app.auth uses app.db, so it cannot be imported up top
+    from app.auth.utils import token_user
+
+    return token_user(request.headers.get("Authorization"))
+
+
+def read_your_writes(writers: RecentWriters, announce):
+    """HTTP middleware pinning a user's reads to the primary after they write.
+    ``announce(user, until)`` tells the other workers."""
+
+    async def middleware(request: Request, call_next):
+        response = await call_next(request)
+        target = getattr(request.state, "db_target", None)
+        if target is not None:
+            response.headers["X-DB-Target"] = target
+        if (
+            writers.enabled
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            user = request_user(request)
+            if user is not None:
+                until = time.time() + writers.window
+                writers.mark(user, until)
+                try:
+                    await announce(user, until)
+                except Exception as e:
+                    # This worker still knows; the others may serve stale reads
+                    logger.warning("Could not announce a write: %s", e)
+        return response
+
+    return middleware
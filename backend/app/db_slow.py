@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, insert
+
+from app.db_queries import current_route
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 10000
+MAX_PARAM_LENGTH = 64
+MAX_PARAM_ITEMS = 10
+
+
+def normalize_param(value):
+    """Keeps enough of a bind value to reproduce a plan without storing
+    uploaded files or long texts."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, (list, tuple)):
+        items = [normalize_param(item) for item in value[:MAX_PARAM_ITEMS]]
+        if len(value) > MAX_PARAM_ITEMS:
+            items.append(f"... {len(value)} items")
+        return items
+    value = str(value)
+    if len(value) > MAX_PARAM_LENGTH:
+        return f"{value[:MAX_PARAM_LENGTH]}... {len(value)} chars"
+    return value
+
+
+class SlowQueryLog:
+    """Records statements slower than ``threshold_ms`` into ``slow_queries``.
+
+    Rows are written through ``engine`` from a background task, so the
+    request that ran the slow statement does not wait for it. A random
+    ``explain_sample`` fraction of slow SELECTs is re-run under
+    ``EXPLAIN (ANALYZE, BUFFERS)`` with the same parameters on the engine
+    that ran them.
+    """
+
+    def __init__(
+        self,
+        engine,
+        threshold_ms: float,
+        explain_sample: float,
+        retention_days: float,
+        max_pending: int = 100,
+    ):
+        self.engine = engine
+        self.threshold = threshold_ms / 1000
+        self.explain_sample = explain_sample
+        self.retention = timedelta(days=retention_days)
+        self.max_pending = max_pending
+        self.pending = set()
+        self.recorded = 0
+        self.dropped = 0
+
+    def install(self, source=None):
+        """Watches ``source`` (default: the engine the log is written to)."""
+        source = source or self.engine
+        sync_engine = source.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+            if duration >= self.threshold and not context.execution_options.get(
+                "skip_slow_query_log"
+            ):
+                self.submit(source, statement, parameters, duration, executemany)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def handle_error(exception_context):
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("slow_query_start"):
+                conn.info["slow_query_start"].pop()
+
+    def submit(self, source, statement, parameters, duration: float, executemany: bool):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        explain = (
+            not executemany
+            and statement.lstrip().upper().startswith("SELECT")
+            and random.random() < self.explain_sample
+        )
+        record = {
+            "created_at": datetime.now(),
+            "route": current_route(),
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "params": None if executemany else normalize_param(parameters),
+            "duration_ms": round(duration * 1000, 3),
+        }
+        # A fresh context keeps these statements out of the request's counts
+        task = loop.create_task(
+            self.save(record, source, statement, tuple(parameters) if explain else None),
+            context=contextvars.Context(),
+        )
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def explain(self, source, statement: str, parameters: tuple) -> str:
+        async with source.connect() as conn:
+            conn = await conn.execution_options(skip_slow_query_log=True)
+            plan = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+            )
+            lines = [row[0] for row in plan]
+            # ANALYZE really ran the statement; keep none of its effects
+            await conn.rollback()
+            return "\n".join(lines)
+
+    async def save(self, record: dict, source, statement: str, parameters: tuple | None):
+        from app.models.slow_query import SlowQuery
+
+        try:
+            if parameters is not None:
+                record["plan"] = await self.explain(source, statement, parameters)
+            async with self.engine.connect() as conn:
+                conn = await conn.execution_options(skip_slow_query_log=True)
+                await conn.execute(insert(SlowQuery).values(**record))
+                self.recorded += 1
+                if self.recorded % 100 == 1:
+                    await conn.execute(
+                        delete(SlowQuery).where(
+                            SlowQuery.created_at < datetime.now() - self.retention
+                        )
+                    )
+                await conn.commit()
+        except Exception:
+            logger.exception("Could not record slow query")
+
+    def status(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "explain_sample": self.explain_sample,
+            "retention_days": self.retention.total_seconds() / 86400,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "pending": len(self.pending),
+        }
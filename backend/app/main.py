@@ -1,14 +1,30 @@
 # app/main.py
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.models import *
+from app.db import (
+    DB_QUERY_WARN_THRESHOLD,
+    DB_QUERY_REPEAT_THRESHOLD,
+    env_flag,
+    recent_writers,
+)
+from app.db_queries import query_counter
+from app.db_replica import read_your_writes
+from app.migrate import upgrade_database
+from app.auth.cache import announce_write, listener as auth_listener
+from app.auth.reaper import session_reaper
+from app.pages import material_processor
 
 from app.ai import router as ai_router
 from app.auth import router as auth_router
 from app.coding import router as coding_router
+from app.monitor import router as monitor_router
 from app.slides.assignment import router as assignment_router
+from app.slides.blob import router as blob_router
+from app.slides.calendar import router as calendar_router
 from app.slides.bookmarklist import router as bookmarklist_router
 from app.slides.code_snippet import router as code_snippet_router
 from app.slides.course import router as course_router
@@ -17,13 +33,24 @@ from app.slides.group import router as group_router
 from app.slides.material import router as material_router
 from app.slides.note import router as note_router
 from app.slides.section import router as section_router
+from app.slides.search import router as search_router
 from app.slides.user import router as user_router
 from app.slides.file import router as file_router
+from app.slides.upload import router as upload_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Off by default: entrypoint.sh migrates once before starting the workers
+    if env_flag("DB_MIGRATE_ON_STARTUP"):
+        await run_in_threadpool(upgrade_database)
+    # LISTEN for auth cache invalidations, revocations and writes of the other workers
+    auth_listener.start()
+    session_reaper.start()
+    material_processor.start()
     yield
-    # Shutdown: no cleanup needed
+    await material_processor.stop()
+    await session_reaper.stop()
+    await auth_listener.stop()
 
 
 app = FastAPI(
@@ -40,11 +67,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    # Lets the PDF viewer see that downloads support ranges
+    expose_headers=["Accept-Ranges", "Content-Range", "Content-Length", "ETag"],
+)
+
+# Keep a user's reads on the primary for a while after they write
+app.middleware("http")(read_your_writes(recent_writers, announce_write))
+# Count statements and DB time per request (X-DB-Query-* headers)
+app.middleware("http")(
+    query_counter(DB_QUERY_WARN_THRESHOLD, DB_QUERY_REPEAT_THRESHOLD)
 )
 
 # Register routers
 app.include_router(ai_router, tags=["ai"], prefix="/api")
 app.include_router(assignment_router, tags=["assignments"], prefix="/api")
+app.include_router(blob_router, tags=["blobs"], prefix="/api")
+app.include_router(calendar_router, tags=["calendar"], prefix="/api")
 app.include_router(bookmarklist_router, tags=["bookmarklists"], prefix="/api")
 app.include_router(code_snippet_router, tags=["code_snippets"], prefix="/api")
 app.include_router(coding_router, tags=["coding"], prefix="/api")
@@ -54,6 +92,7 @@ app.include_router(group_router, tags=["groups"], prefix="/api")
 app.include_router(material_router, tags=["materials"], prefix="/api")
 app.include_router(note_router, tags=["notes"], prefix="/api")
 app.include_router(section_router, tags=["sections"], prefix="/api")
+app.include_router(search_router, tags=["search"], prefix="/api")
 app.include_router(user_router, tags=["users"], prefix="/api")
 app.include_router(
     auth_router,
@@ -62,6 +101,8 @@ app.include_router(
     responses={401: {"description": "Unauthorized"}},
 )
 app.include_router(file_router, tags=["files"], prefix="/api")
+app.include_router(upload_router, tags=["uploads"], prefix="/api")
+app.include_router(monitor_router, tags=["monitor"], prefix="/api")
 
 
 @app.get("/api", tags=["health"])
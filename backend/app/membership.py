@@ -0,0 +1,84 @@
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.course import CourseMember
+from app.models.group import Group, GroupMember
+
+
+async def get_user_course_ids(db: AsyncSession, user_id: str) -> list[str]:
+    return [
+        str(course_id)
+        for course_id in await db.scalars(
+            select(CourseMember.course_id).where(CourseMember.user_id == user_id)
+        )
+    ]
+
+
+async def get_user_group_keys(db: AsyncSession, user_id: str) -> list[str]:
+    """The user's groups in the legacy "course_id:group_id" form."""
+    rows = await db.execute(
+        select(GroupMember.course_id, GroupMember.group_id).where(
+            GroupMember.user_id == user_id
+        )
+    )
+    return [f"{course_id}:{group_id}" for course_id, group_id in rows]
+
+
+async def add_course_member(
+    db: AsyncSession, course_id: str, user_id: str, is_teacher: bool
+):
+    statement = insert(CourseMember).values(
+        course_id=course_id, user_id=user_id, is_teacher=is_teacher
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[CourseMember.course_id, CourseMember.user_id],
+            set_={"is_teacher": statement.excluded.is_teacher},
+        )
+    )
+
+
+async def get_group_user_ids(db: AsyncSession, group_id: str) -> list[str]:
+    return list(
+        await db.scalars(
+            select(GroupMember.user_id)
+            .where(GroupMember.group_id == group_id)
+            .order_by(GroupMember.user_id)
+        )
+    )
+
+
+async def is_group_member(db: AsyncSession, group_id: str, user_id: str) -> bool:
+    member = await db.scalar(
+        select(GroupMember.user_id).where(
+            GroupMember.group_id == group_id, GroupMember.user_id == user_id
+        )
+    )
+    return member is not None
+
+
+async def find_user_group_id(db: AsyncSession, course_id: str, user_id: str):
+    return await db.scalar(
+        select(GroupMember.group_id).where(
+            GroupMember.course_id == course_id, GroupMember.user_id == user_id
+        )
+    )
+
+
+async def add_group_member(db: AsyncSession, group: Group, user_id: str) -> bool:
+    """Returns False if the user was already in the group."""
+    result = await db.execute(
+        insert(GroupMember)
+        .values(group_id=group.group_id, user_id=user_id, course_id=group.course_id)
+        .on_conflict_do_nothing()
+    )
+    return result.rowcount > 0
+
+
+async def remove_group_member(db: AsyncSession, group_id: str, user_id: str):
+    await db.execute(
+        delete(GroupMember).where(
+            GroupMember.group_id == group_id, GroupMember.user_id == user_id
+        )
+    )
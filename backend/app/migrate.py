@@ -0,0 +1,48 @@
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from app.db import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+BASELINE_REVISION = "0001"
+
+# Arbitrary constant shared by every worker and pod; whoever takes the lock
+# first migrates, the rest wait and then find nothing left to do.
+MIGRATION_LOCK_ID = 0x504541434849
+
+
+def alembic_config() -> Config:
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return config
+
+
+def upgrade_database(revision: str = "head"):
+    config = alembic_config()
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        config.attributes["connection"] = connection
+
+        # Databases created with create_all before migrations existed
+        tables = set(inspect(connection).get_table_names())
+        if "alembic_version" not in tables and "users" in tables:
+            logger.info("Existing schema found, stamping baseline %s", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+
+        command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("revision", nargs="?", default="head")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    upgrade_database(args.revision)
@@ -0,0 +1,58 @@
+from alembic import context
+
+from app.db import Base, engine
+from app.models import (  # noqa: F401  register every table on Base.metadata
+    assignment,
+    bookmarklist,
+    calendar_removal,
+    chat,
+    code_snippet,
+    comment,
+    course,
+    environment,
+    file,
+    group,
+    material,
+    material_page,
+    note,
+    pdf_index,
+    rate_limit,
+    section,
+    slow_query,
+    upload,
+    user,
+)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # app.migrate hands over a connection that already holds the migration lock
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,290 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Schema as previously created by ``Base.metadata.create_all``. Databases that
+already have these tables are stamped at this revision instead of running it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.String(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("is_teacher", sa.Boolean(), nullable=True),
+        sa.Column("courses", postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column("groups", postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column("photo", sa.String(), nullable=True),
+        sa.Column("office_hour", sa.String(), nullable=True),
+        sa.Column("office_place", sa.String(), nullable=True),
+    )
+    op.create_index("ix_users_user_id", "users", ["user_id"])
+
+    op.create_table(
+        "sessions",
+        sa.Column("id", postgresql.UUID(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_sessions_id", "sessions", ["id"])
+
+    op.create_table(
+        "courses",
+        sa.Column("course_id", postgresql.UUID(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=False),
+        sa.Column("number", sa.String(), nullable=True),
+        sa.Column("require_group", sa.Boolean(), nullable=True),
+        sa.Column("group_num", sa.Integer(), nullable=True),
+        sa.Column("people_per_group", sa.Integer(), nullable=True),
+        sa.Column("group_deadline", sa.String(), nullable=True),
+        sa.Column("teacher_id", postgresql.ARRAY(sa.String()), nullable=False),
+        sa.Column("sections", postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column("assignments", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.create_index("ix_courses_course_id", "courses", ["course_id"])
+
+    op.create_table(
+        "sections",
+        sa.Column("section_id", postgresql.UUID(), primary_key=True),
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("materials", postgresql.ARRAY(postgresql.UUID()), nullable=True),
+        sa.Column("schedules", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.create_index("ix_sections_section_id", "sections", ["section_id"])
+    op.create_index("ix_sections_course_id", "sections", ["course_id"])
+    op.create_index("ix_sections_name", "sections", ["name"])
+    op.create_index("ix_sections_materials", "sections", ["materials"])
+    op.create_index("ix_sections_schedules", "sections", ["schedules"])
+
+    op.create_table(
+        "materials",
+        sa.Column("material_id", postgresql.UUID(), primary_key=True),
+        sa.Column("material_name", sa.String(), nullable=False),
+        sa.Column(
+            "section_id",
+            postgresql.UUID(),
+            sa.ForeignKey("sections.section_id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("data", sa.String(), nullable=False),
+        sa.Column("comments", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.create_index("ix_materials_material_id", "materials", ["material_id"])
+    op.create_index("ix_materials_section_id", "materials", ["section_id"])
+
+    op.create_table(
+        "assignments",
+        sa.Column("assignment_id", postgresql.UUID(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("teacher_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column("deadline", sa.String(), nullable=True),
+        sa.Column("is_over", sa.Boolean(), nullable=True),
+        sa.Column("is_group_assign", sa.Boolean(), nullable=True),
+        sa.Column("files", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    for column in (
+        "assignment_id",
+        "name",
+        "description",
+        "course_id",
+        "teacher_id",
+        "deadline",
+        "is_over",
+        "is_group_assign",
+        "files",
+    ):
+        op.create_index(f"ix_assignments_{column}", "assignments", [column])
+
+    op.create_table(
+        "groups",
+        sa.Column("group_id", postgresql.UUID(), primary_key=True),
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("users", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.create_index("ix_groups_group_id", "groups", ["group_id"])
+    op.create_index("ix_groups_course_id", "groups", ["course_id"])
+    op.create_index("ix_groups_users", "groups", ["users"])
+
+    op.create_table(
+        "comments",
+        sa.Column("comment_id", postgresql.UUID(), primary_key=True),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("page", sa.Integer(), nullable=False),
+        sa.Column("ancestor_id", postgresql.UUID(), nullable=True),
+    )
+    op.create_index("ix_comments_comment_id", "comments", ["comment_id"])
+    op.create_index("ix_comments_user_id", "comments", ["user_id"])
+    op.create_index("ix_comments_material_id", "comments", ["material_id"])
+
+    op.create_table(
+        "code_snippets",
+        sa.Column("snippet_id", postgresql.UUID(), nullable=False),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("lang", sa.String(), nullable=False),
+        sa.Column("page", sa.Integer(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("position_x", sa.Integer(), nullable=False),
+        sa.Column("position_y", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("snippet_id", "user_id"),
+    )
+    op.create_index("ix_code_snippets_snippet_id", "code_snippets", ["snippet_id"])
+    op.create_index("ix_code_snippets_material_id", "code_snippets", ["material_id"])
+
+    op.create_table(
+        "notes",
+        sa.Column("note_id", postgresql.UUID(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("content", sa.String(), nullable=False),
+    )
+    op.create_index("ix_notes_note_id", "notes", ["note_id"])
+
+    op.create_table(
+        "bookmark_lists",
+        sa.Column("list_id", postgresql.UUID(), primary_key=True),
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column("page", sa.Integer(), nullable=True),
+        sa.Column("bookmark_list", postgresql.ARRAY(sa.Integer()), nullable=True),
+    )
+    for column in ("list_id", "material_id", "user_id", "page", "bookmark_list"):
+        op.create_index(f"ix_bookmark_lists_{column}", "bookmark_lists", [column])
+
+    op.create_table(
+        "chats",
+        sa.Column("chat_id", postgresql.UUID(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("messages", sa.JSON(), nullable=True),
+    )
+    for column in ("chat_id", "user_id", "material_id", "title"):
+        op.create_index(f"ix_chats_{column}", "chats", [column])
+
+    op.create_table(
+        "environments",
+        sa.Column("environment_id", postgresql.UUID(), primary_key=True),
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "assignment_id",
+            postgresql.UUID(),
+            sa.ForeignKey("assignments.assignment_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column(
+            "group_id",
+            postgresql.UUID(),
+            sa.ForeignKey("groups.group_id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("is_collaborative", sa.Boolean(), nullable=True),
+        sa.Column("wsUrl", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("is_running", sa.Boolean(), nullable=True),
+        sa.Column("layout", postgresql.JSON(), nullable=True),
+    )
+    op.create_index("ix_environments_environment_id", "environments", ["environment_id"])
+
+    op.create_table(
+        "files",
+        sa.Column("file_id", postgresql.UUID(), primary_key=True),
+        sa.Column("file_name", sa.String(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("file_type", sa.String(), nullable=False),
+        sa.Column("file_size", sa.String(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("uploader_id", sa.String(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    for table in (
+        "files",
+        "environments",
+        "chats",
+        "bookmark_lists",
+        "notes",
+        "code_snippets",
+        "comments",
+        "groups",
+        "assignments",
+        "materials",
+        "sections",
+        "courses",
+        "sessions",
+        "users",
+    ):
+        op.drop_table(table)
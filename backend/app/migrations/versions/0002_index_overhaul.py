@@ -0,0 +1,94 @@
+"""index overhaul
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- Array columns are searched by membership, which a btree cannot serve; the
+  ones we query get GIN indexes (``@>``) instead.
+- Btrees on primary keys, free text, booleans and unqueried columns only cost
+  writes and are dropped.
+- Per-material lookups that also filter by user or thread get composites.
+
+Every step is guarded so databases created by ``create_all`` from the current
+models, then stamped at the baseline, upgrade cleanly.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DROPPED = [
+    # duplicates of the primary key index
+    ("ix_users_user_id", "users", ["user_id"]),
+    ("ix_sessions_id", "sessions", ["id"]),
+    ("ix_courses_course_id", "courses", ["course_id"]),
+    ("ix_sections_section_id", "sections", ["section_id"]),
+    ("ix_materials_material_id", "materials", ["material_id"]),
+    ("ix_assignments_assignment_id", "assignments", ["assignment_id"]),
+    ("ix_groups_group_id", "groups", ["group_id"]),
+    ("ix_comments_comment_id", "comments", ["comment_id"]),
+    ("ix_code_snippets_snippet_id", "code_snippets", ["snippet_id"]),
+    ("ix_notes_note_id", "notes", ["note_id"]),
+    ("ix_bookmark_lists_list_id", "bookmark_lists", ["list_id"]),
+    ("ix_chats_chat_id", "chats", ["chat_id"]),
+    ("ix_environments_environment_id", "environments", ["environment_id"]),
+    # btrees on arrays
+    ("ix_groups_users", "groups", ["users"]),
+    ("ix_sections_materials", "sections", ["materials"]),
+    ("ix_sections_schedules", "sections", ["schedules"]),
+    ("ix_assignments_files", "assignments", ["files"]),
+    ("ix_bookmark_lists_bookmark_list", "bookmark_lists", ["bookmark_list"]),
+    # free text, booleans and columns nothing filters on
+    ("ix_assignments_name", "assignments", ["name"]),
+    ("ix_assignments_description", "assignments", ["description"]),
+    ("ix_assignments_deadline", "assignments", ["deadline"]),
+    ("ix_assignments_is_over", "assignments", ["is_over"]),
+    ("ix_assignments_is_group_assign", "assignments", ["is_group_assign"]),
+    ("ix_sections_name", "sections", ["name"]),
+    ("ix_chats_title", "chats", ["title"]),
+    ("ix_bookmark_lists_page", "bookmark_lists", ["page"]),
+    # superseded by the composites below
+    ("ix_comments_material_id", "comments", ["material_id"]),
+    ("ix_code_snippets_material_id", "code_snippets", ["material_id"]),
+    ("ix_bookmark_lists_material_id", "bookmark_lists", ["material_id"]),
+]
+
+GIN = [
+    ("ix_groups_users_gin", "groups", ["users"]),
+    ("ix_users_courses_gin", "users", ["courses"]),
+    ("ix_courses_teacher_id_gin", "courses", ["teacher_id"]),
+]
+
+COMPOSITE = [
+    ("ix_notes_material_id_user_id", "notes", ["material_id", "user_id"]),
+    ("ix_code_snippets_material_id_user_id", "code_snippets", ["material_id", "user_id"]),
+    ("ix_bookmark_lists_material_id_user_id", "bookmark_lists", ["material_id", "user_id"]),
+    ("ix_comments_material_id_ancestor_id", "comments", ["material_id", "ancestor_id"]),
+    ("ix_comments_ancestor_id", "comments", ["ancestor_id"]),
+    ("ix_environments_assignment_id_user_id", "environments", ["assignment_id", "user_id"]),
+    ("ix_environments_assignment_id_group_id", "environments", ["assignment_id", "group_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in DROPPED:
+        op.drop_index(name, table_name=table, if_exists=True)
+    for name, table, columns in GIN:
+        op.create_index(name, table, columns, postgresql_using="gin", if_not_exists=True)
+    for name, table, columns in COMPOSITE:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in COMPOSITE + GIN:
+        op.drop_index(name, table_name=table, if_exists=True)
+    for name, table, columns in DROPPED:
+        op.create_index(name, table, columns, if_not_exists=True)
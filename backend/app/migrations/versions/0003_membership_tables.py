@@ -0,0 +1,162 @@
+"""course and group membership tables
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Moves membership out of users.courses, users.groups ("course_id:group_id"),
+courses.teacher_id and groups.users into course_members and group_members,
+then drops the arrays. Entries pointing at missing users, courses or groups
+are discarded.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "course_members",
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "user_id",
+            sa.String(),
+            sa.ForeignKey("users.user_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("is_teacher", sa.Boolean(), nullable=False),
+    )
+    op.create_index(
+        "ix_course_members_user_id_course_id", "course_members", ["user_id", "course_id"]
+    )
+
+    op.create_table(
+        "group_members",
+        sa.Column(
+            "group_id",
+            postgresql.UUID(),
+            sa.ForeignKey("groups.group_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "user_id",
+            sa.String(),
+            sa.ForeignKey("users.user_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_group_members_course_id_user_id", "group_members", ["course_id", "user_id"]
+    )
+    op.create_index("ix_group_members_user_id", "group_members", ["user_id"])
+
+    op.execute(
+        """
+        INSERT INTO course_members (course_id, user_id, is_teacher)
+        SELECT c.course_id, u.user_id, bool_or(src.is_teacher)
+        FROM (
+            SELECT c.course_id::text AS course_id, t.user_id, true AS is_teacher
+            FROM courses c CROSS JOIN LATERAL unnest(c.teacher_id) AS t(user_id)
+            UNION ALL
+            SELECT m.course_id, u.user_id, false
+            FROM users u CROSS JOIN LATERAL unnest(u.courses) AS m(course_id)
+        ) src
+        JOIN courses c ON c.course_id::text = src.course_id
+        JOIN users u ON u.user_id = src.user_id
+        GROUP BY c.course_id, u.user_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO group_members (group_id, user_id, course_id)
+        SELECT DISTINCT g.group_id, u.user_id, g.course_id
+        FROM (
+            SELECT g.group_id::text AS group_id, m.user_id
+            FROM groups g CROSS JOIN LATERAL unnest(g.users) AS m(user_id)
+            UNION
+            SELECT split_part(k.entry, ':', 2), u.user_id
+            FROM users u CROSS JOIN LATERAL unnest(u.groups) AS k(entry)
+        ) src
+        JOIN groups g ON g.group_id::text = src.group_id
+        JOIN users u ON u.user_id = src.user_id
+        """
+    )
+
+    op.drop_column("users", "courses")
+    op.drop_column("users", "groups")
+    op.drop_column("courses", "teacher_id")
+    op.drop_column("groups", "users")
+
+
+def downgrade() -> None:
+    op.add_column("users", sa.Column("courses", postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column("users", sa.Column("groups", postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column(
+        "courses",
+        sa.Column(
+            "teacher_id",
+            postgresql.ARRAY(sa.String()),
+            nullable=False,
+            server_default="{}",
+        ),
+    )
+    op.add_column("groups", sa.Column("users", postgresql.ARRAY(sa.String()), nullable=True))
+
+    op.execute(
+        """
+        UPDATE users u SET
+            courses = COALESCE((
+                SELECT array_agg(m.course_id::text) FROM course_members m
+                WHERE m.user_id = u.user_id
+            ), '{}'),
+            groups = COALESCE((
+                SELECT array_agg(m.course_id::text || ':' || m.group_id::text)
+                FROM group_members m WHERE m.user_id = u.user_id
+            ), '{}')
+        """
+    )
+    op.execute(
+        """
+        UPDATE courses c SET teacher_id = COALESCE((
+            SELECT array_agg(m.user_id) FROM course_members m
+            WHERE m.course_id = c.course_id AND m.is_teacher
+        ), '{}')
+        """
+    )
+    op.execute(
+        """
+        UPDATE groups g SET users = COALESCE((
+            SELECT array_agg(m.user_id) FROM group_members m
+            WHERE m.group_id = g.group_id
+        ), '{}')
+        """
+    )
+    op.alter_column("courses", "teacher_id", server_default=None)
+    op.create_index("ix_groups_users_gin", "groups", ["users"], postgresql_using="gin")
+    op.create_index("ix_users_courses_gin", "users", ["courses"], postgresql_using="gin")
+    op.create_index(
+        "ix_courses_teacher_id_gin", "courses", ["teacher_id"], postgresql_using="gin"
+    )
+
+    op.drop_table("group_members")
+    op.drop_table("course_members")
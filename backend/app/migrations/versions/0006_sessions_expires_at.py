@@ -0,0 +1,29 @@
+"""index sessions by expiry
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+Lets the session reaper find expired rows without scanning the table.
+Building it blocks logins while it runs.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_sessions_expires_at", "sessions", ["expires_at"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sessions_expires_at", table_name="sessions", if_exists=True)
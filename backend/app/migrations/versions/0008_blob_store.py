@@ -0,0 +1,144 @@
+"""move material and file contents to the blob store
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Base64 ``materials.data`` and ``files.content`` are decoded and written to
+``app.blobs``; the rows keep the SHA-256, size and mime type. Rows are moved
+in batches so memory stays bounded. Blobs written by a failed run are left
+for ``python -m app.blobs gc``.
+"""
+import base64
+import binascii
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.blobs import blob_store, guess_mime
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 50
+
+
+def decode(text: str | None) -> bytes:
+    text = text or ""
+    # Some clients stored data URLs
+    if text.startswith("data:") and "," in text:
+        text = text.split(",", 1)[1]
+    try:
+        return base64.b64decode(text, validate=True)
+    except binascii.Error:
+        return text.encode("utf-8")
+
+
+materials = sa.table(
+    "materials",
+    sa.column("material_id"),
+    sa.column("material_name"),
+    sa.column("data"),
+    sa.column("data_hash"),
+    sa.column("data_size"),
+    sa.column("data_mime"),
+)
+files = sa.table(
+    "files",
+    sa.column("file_id"),
+    sa.column("file_name"),
+    sa.column("file_size"),
+    sa.column("content"),
+    sa.column("content_hash"),
+    sa.column("content_mime"),
+)
+
+
+def move_out():
+    conn = op.get_bind()
+    while rows := conn.execute(
+        sa.select(materials.c.material_id, materials.c.material_name, materials.c.data)
+        .where(materials.c.data_hash.is_(None))
+        .limit(BATCH_SIZE)
+    ).all():
+        for material_id, name, text in rows:
+            data = decode(text)
+            digest, size = blob_store.put(data)
+            conn.execute(
+                materials.update()
+                .where(materials.c.material_id == material_id)
+                .values(data_hash=digest, data_size=size, data_mime=guess_mime(name, data))
+            )
+    while rows := conn.execute(
+        sa.select(files.c.file_id, files.c.file_name, files.c.content)
+        .where(files.c.content_hash.is_(None))
+        .limit(BATCH_SIZE)
+    ).all():
+        for file_id, name, text in rows:
+            data = decode(text)
+            digest, size = blob_store.put(data)
+            conn.execute(
+                files.update()
+                .where(files.c.file_id == file_id)
+                .values(
+                    content_hash=digest,
+                    file_size=str(size),
+                    content_mime=guess_mime(name, data),
+                )
+            )
+
+
+def move_in():
+    conn = op.get_bind()
+    for table, key, column, hash_column in (
+        (materials, materials.c.material_id, materials.c.data, materials.c.data_hash),
+        (files, files.c.file_id, files.c.content, files.c.content_hash),
+    ):
+        while rows := conn.execute(
+            sa.select(key, hash_column).where(column.is_(None)).limit(BATCH_SIZE)
+        ).all():
+            for row_key, digest in rows:
+                data = base64.b64encode(blob_store.get(digest)).decode("utf-8")
+                conn.execute(table.update().where(key == row_key).values({column: data}))
+
+
+def upgrade() -> None:
+    op.add_column("materials", sa.Column("data_hash", sa.String(64), nullable=True))
+    op.add_column("materials", sa.Column("data_size", sa.BigInteger(), nullable=True))
+    op.add_column("materials", sa.Column("data_mime", sa.String(), nullable=True))
+    op.add_column("files", sa.Column("content_hash", sa.String(64), nullable=True))
+    op.add_column("files", sa.Column("content_mime", sa.String(), nullable=True))
+
+    # Moving bytes needs the database; --sql only prints the schema change
+    if not context.is_offline_mode():
+        move_out()
+
+    for table, column in (
+        ("materials", "data_hash"),
+        ("materials", "data_size"),
+        ("materials", "data_mime"),
+        ("files", "content_hash"),
+        ("files", "content_mime"),
+    ):
+        op.alter_column(table, column, nullable=False)
+    op.drop_column("materials", "data")
+    op.drop_column("files", "content")
+
+
+def downgrade() -> None:
+    op.add_column("materials", sa.Column("data", sa.String(), nullable=True))
+    op.add_column("files", sa.Column("content", sa.String(), nullable=True))
+    if not context.is_offline_mode():
+        move_in()
+    op.alter_column("materials", "data", nullable=False)
+    op.alter_column("files", "content", nullable=False)
+    op.drop_column("materials", "data_hash")
+    op.drop_column("materials", "data_size")
+    op.drop_column("materials", "data_mime")
+    op.drop_column("files", "content_hash")
+    op.drop_column("files", "content_mime")
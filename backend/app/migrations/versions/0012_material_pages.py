@@ -0,0 +1,40 @@
+"""per-page text of materials
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "material_pages",
+        sa.Column(
+            "material_id",
+            postgresql.UUID(),
+            sa.ForeignKey("materials.material_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("page", sa.Integer(), primary_key=True),
+        sa.Column("data_hash", sa.String(length=64), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+    )
+    op.create_index("ix_material_pages_data_hash", "material_pages", ["data_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_material_pages_data_hash", table_name="material_pages")
+    op.drop_table("material_pages")
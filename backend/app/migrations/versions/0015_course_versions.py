@@ -0,0 +1,37 @@
+"""course versions for the course cache
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0015"
+down_revision: Union[str, None] = "0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence("course_versions")))
+    # Existing rows take a value each
+    op.add_column(
+        "courses",
+        sa.Column(
+            "version",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('course_versions')"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("courses", "version")
+    op.execute(sa.schema.DropSequence(sa.Sequence("course_versions")))
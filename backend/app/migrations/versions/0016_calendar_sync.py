@@ -0,0 +1,71 @@
+"""calendar change tracking and feed tokens
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0016"
+down_revision: Union[str, None] = "0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STAMPED = [
+    ("courses", "updated_at"),
+    ("course_members", "joined_at"),
+    ("sections", "updated_at"),
+    ("assignments", "updated_at"),
+]
+
+
+def upgrade() -> None:
+    # Existing rows count as changed now, so clients sync them once
+    for table, column in STAMPED:
+        op.add_column(
+            table,
+            sa.Column(
+                column,
+                sa.DateTime(timezone=True),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+        )
+    op.create_table(
+        "calendar_removals",
+        sa.Column(
+            "course_id",
+            postgresql.UUID(),
+            sa.ForeignKey("courses.course_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("kind", sa.String(), primary_key=True),
+        sa.Column("item_id", sa.String(), primary_key=True),
+        sa.Column(
+            "removed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_calendar_removals_removed_at", "calendar_removals", ["removed_at"]
+    )
+    op.add_column("users", sa.Column("calendar_token", sa.String(), nullable=True))
+    op.create_unique_constraint("users_calendar_token_key", "users", ["calendar_token"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("users_calendar_token_key", "users", type_="unique")
+    op.drop_column("users", "calendar_token")
+    op.drop_index("ix_calendar_removals_removed_at", table_name="calendar_removals")
+    op.drop_table("calendar_removals")
+    for table, column in reversed(STAMPED):
+        op.drop_column(table, column)
@@ -0,0 +1,26 @@
+"""record thumbnail rendering errors
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0017"
+down_revision: Union[str, None] = "0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("pdf_indexes", sa.Column("thumbnail_error", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("pdf_indexes", "thumbnail_error")
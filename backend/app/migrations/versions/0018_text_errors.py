@@ -0,0 +1,26 @@
+"""record text extraction errors
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0018"
+down_revision: Union[str, None] = "0017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("pdf_indexes", sa.Column("text_error", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("pdf_indexes", "text_error")
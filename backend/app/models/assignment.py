@@ -1,5 +1,5 @@
 # app/models/assignment.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, Boolean, ForeignKey, func
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from app.db import Base
 import uuid
@@ -7,12 +7,14 @@ import uuid
 class Assignment(Base):
     __tablename__ = "assignments"
 
-    assignment_id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
-    name = Column(String, index=True)
-    description = Column(String, index=True, nullable=True)
+    assignment_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String)
+    description = Column(String, nullable=True)
     course_id = Column(UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), index=True)
     teacher_id = Column(String, ForeignKey("users.user_id"), index=True)
-    deadline = Column(String, index=True)
-    is_over = Column(Boolean, index=True)
-    is_group_assign = Column(Boolean, index=True)
-    files = Column(ARRAY(String), index=True)
+    deadline = Column(String)
+    is_over = Column(Boolean)
+    is_group_assign = Column(Boolean)
+    files = Column(ARRAY(String))
+    # Last change to what the calendar shows (see app.slides.calendar)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,5 +1,5 @@
 # app/models/bookmarklist.py
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, ForeignKey
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from app.db import Base
 
@@ -7,8 +7,12 @@ from app.db import Base
 class BookmarkList(Base):
     __tablename__ = "bookmark_lists"
 
-    list_id = Column(UUID, primary_key=True, index=True)
-    material_id = Column(UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), index=True)
+    list_id = Column(UUID, primary_key=True)
+    material_id = Column(UUID, ForeignKey("materials.material_id", ondelete="CASCADE"))
     user_id = Column(String, ForeignKey("users.user_id"), index=True)
-    page = Column(Integer, index=True)
-    bookmark_list = Column(ARRAY(Integer), index=True)
+    page = Column(Integer)
+    bookmark_list = Column(ARRAY(Integer))
+
+    __table_args__ = (
+        Index("ix_bookmark_lists_material_id_user_id", "material_id", "user_id"),
+    )
@@ -0,0 +1,18 @@
+# app/models/calendar_removal.py
+from sqlalchemy import Column, DateTime, ForeignKey, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.db import Base
+
+
+# Sections and assignments that left a course, so calendar deltas can drop them
+class CalendarRemoval(Base):
+    __tablename__ = "calendar_removals"
+
+    course_id = Column(
+        UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), primary_key=True
+    )
+    kind = Column(String, primary_key=True)  # "section" or "assignment"
+    item_id = Column(String, primary_key=True)
+    removed_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
@@ -4,24 +4,32 @@ from sqlalchemy import (
     Integer,
     String,
     ForeignKey,
+    Index,
     PrimaryKeyConstraint,
+    Computed,
 )
 from app.db import Base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred
 
 
 class CodeSnippet(Base):
     __tablename__ = "code_snippets"
 
-    snippet_id = Column(UUID, index=True)
+    snippet_id = Column(UUID)
     user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     material_id = Column(
-        UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), index=True, nullable=False
+        UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), nullable=False
     )
     lang = Column(String, nullable=False)
     page = Column(Integer, nullable=False)
     content = Column(String, nullable=False)
     position_x = Column(Integer, nullable=False)
     position_y = Column(Integer, nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content)")))
 
-    __table_args__ = (PrimaryKeyConstraint("snippet_id", "user_id"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("snippet_id", "user_id"),
+        Index("ix_code_snippets_material_id_user_id", "material_id", "user_id"),
+        Index("ix_code_snippets_search_vector", "search_vector", postgresql_using="gin"),
+    )
@@ -1,17 +1,24 @@
 # app/models/comment.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy import Column, Computed, Index, Integer, String, Boolean, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, UUID
+from sqlalchemy.orm import deferred
 from app.db import Base
 
 
 class Comment(Base):
     __tablename__ = "comments"
 
-    comment_id = Column(UUID, primary_key=True, index=True)
+    comment_id = Column(UUID, primary_key=True)
     content = Column(String, nullable=False)
     user_id = Column(String, ForeignKey("users.user_id"), index=True, nullable=False)
     material_id = Column(
-        UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), index=True, nullable=False
+        UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), nullable=False
     )
     page = Column(Integer, nullable=False)
-    ancestor_id = Column(UUID, nullable=True)
+    ancestor_id = Column(UUID, index=True, nullable=True)
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content)")))
+
+    __table_args__ = (
+        Index("ix_comments_material_id_ancestor_id", "material_id", "ancestor_id"),
+        Index("ix_comments_search_vector", "search_vector", postgresql_using="gin"),
+    )
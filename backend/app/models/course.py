@@ -1,13 +1,28 @@
 # app/models/course.py
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Sequence,
+    String,
+    func,
+)
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from app.db import Base
 
 
+# Shared by all courses, so a version is never seen twice (see app.course_cache)
+course_versions = Sequence("course_versions")
+
+
 class Course(Base):
     __tablename__ = "courses"
 
-    course_id = Column(UUID, primary_key=True, index=True)
+    course_id = Column(UUID, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(String, nullable=False)
     number = Column(String, nullable=True)
@@ -15,6 +30,32 @@ class Course(Base):
     group_num = Column(Integer, nullable=True)
     people_per_group = Column(Integer, nullable=True)
     group_deadline = Column(String, nullable=True)
-    teacher_id = Column(ARRAY(String), nullable=False)
     sections = Column(ARRAY(String), nullable=True)
-    assignments = Column(ARRAY(String), nullable=True)
\ No newline at end of file
+    assignments = Column(ARRAY(String), nullable=True)
+    # Moved on by every write to the course, its sections and assignments
+    version = Column(
+        BigInteger,
+        course_versions,
+        server_default=course_versions.next_value(),
+        nullable=False,
+    )
+    # When the version last moved, for Last-Modified
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class CourseMember(Base):
+    __tablename__ = "course_members"
+
+    course_id = Column(
+        UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(
+        String, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True
+    )
+    is_teacher = Column(Boolean, nullable=False, default=False)  # teaches the course
+    joined_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # The primary key serves rosters; this serves "my courses"
+    __table_args__ = (
+        Index("ix_course_members_user_id_course_id", "user_id", "course_id"),
+    )
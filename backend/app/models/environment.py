@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Index, String, ForeignKey, DateTime, Boolean
 from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSON
 from app.db import Base
 from datetime import datetime
@@ -8,7 +8,7 @@ import uuid
 class Environment(Base):
     __tablename__ = "environments"
 
-    environment_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    environment_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     course_id = Column(UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False)
     assignment_id = Column(UUID, ForeignKey("assignments.assignment_id", ondelete="CASCADE"), nullable=False)
     user_id = Column(String, ForeignKey("users.user_id"), nullable=True)
@@ -41,4 +41,9 @@ class Environment(Base):
                 }
             ]
         }
-    })
\ No newline at end of file
+    })
+
+    __table_args__ = (
+        Index("ix_environments_assignment_id_user_id", "assignment_id", "user_id"),
+        Index("ix_environments_assignment_id_group_id", "assignment_id", "group_id"),
+    )
@@ -12,7 +12,8 @@ class FileDB(Base):
     file_name = Column(String, nullable=False)
     file_path = Column(String, nullable=False) # In an environment, the relative path to the root directory
     file_type = Column(String, nullable=False) # example: "code" or "pdf"
-    file_size = Column(String, nullable=False)
-    content = Column(String, nullable=False)
+    file_size = Column(String, nullable=False)  # bytes
+    content_hash = Column(String(64), nullable=False)  # SHA-256 in app.blobs
+    content_mime = Column(String, nullable=False)
     uploader_id = Column(String, ForeignKey("users.user_id"), nullable=False) # Teacher's id
     is_deleted = Column(Boolean, default=False) # Soft delete
\ No newline at end of file
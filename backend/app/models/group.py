@@ -1,14 +1,33 @@
-# app/models/section.py
-from sqlalchemy import Column, String, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY, UUID
+# app/models/group.py
+from sqlalchemy import Column, Index, String, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
 from app.db import Base
 
 
 class Group(Base):
     __tablename__ = "groups"
 
-    group_id = Column(UUID, primary_key=True, index=True)
+    group_id = Column(UUID, primary_key=True)
     course_id = Column(
         UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False, index=True
     )
-    users = Column(ARRAY(String), index=True)
+
+
+class GroupMember(Base):
+    __tablename__ = "group_members"
+
+    group_id = Column(
+        UUID, ForeignKey("groups.group_id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(
+        String, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True
+    )
+    # Copied from the group so "which group am I in for this course" is one lookup
+    course_id = Column(
+        UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_group_members_course_id_user_id", "course_id", "user_id"),
+        Index("ix_group_members_user_id", "user_id"),
+    )
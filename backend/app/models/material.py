@@ -1,5 +1,5 @@
 # app/models/material.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, ForeignKey
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from app.db import Base
 
@@ -7,12 +7,15 @@ from app.db import Base
 class Material(Base):
     __tablename__ = "materials"
 
-    material_id = Column(UUID, primary_key=True, index=True)
+    material_id = Column(UUID, primary_key=True)
     material_name = Column(String, nullable=False)
     section_id = Column(
         UUID, ForeignKey("sections.section_id", ondelete="CASCADE"), index=True, nullable=True
     )
-    data = Column(String, nullable=False)
+    # The PDF itself is in app.blobs under this SHA-256
+    data_hash = Column(String(64), nullable=False)
+    data_size = Column(BigInteger, nullable=False)
+    data_mime = Column(String, nullable=False)
     comments = Column(
         ARRAY(String), nullable=True
     )  # corresponding to the comment_id, but whole comment in the api
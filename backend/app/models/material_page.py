@@ -0,0 +1,23 @@
+# app/models/material_page.py
+from sqlalchemy import Column, Computed, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred
+from app.db import Base
+
+
+# Text of each page of a material's PDF, extracted by app.pages
+class MaterialPage(Base):
+    __tablename__ = "material_pages"
+
+    material_id = Column(
+        UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), primary_key=True
+    )
+    page = Column(Integer, primary_key=True)  # from 1
+    # Material.data_hash the text was extracted from; stale once they differ
+    data_hash = Column(String(64), nullable=False, index=True)
+    text = Column(Text, nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', text)")))
+
+    __table_args__ = (
+        Index("ix_material_pages_search_vector", "search_vector", postgresql_using="gin"),
+    )
@@ -1,13 +1,21 @@
 # app/models/note.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Computed, Index, Integer, String, Boolean, ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred
 from app.db import Base
 
 
 class Note(Base):
     __tablename__ = "notes"
 
-    note_id = Column(UUID, primary_key=True, index=True)
+    note_id = Column(UUID, primary_key=True)
     user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     material_id = Column(UUID, ForeignKey("materials.material_id", ondelete="CASCADE"), nullable=False)
     content = Column(String, nullable=False)
+    # Kept up to date by Postgres, searched through app.slides.search
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content)")))
+
+    __table_args__ = (
+        Index("ix_notes_material_id_user_id", "material_id", "user_id"),
+        Index("ix_notes_search_vector", "search_vector", postgresql_using="gin"),
+    )
@@ -0,0 +1,22 @@
+# app/models/pdf_index.py
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, JSON
+from app.db import Base
+
+
+# Pages of a PDF in the blob store, built by app.pages; keyed by content so
+# identical uploads share it
+class PdfIndex(Base):
+    __tablename__ = "pdf_indexes"
+
+    data_hash = Column(String(64), primary_key=True)
+    page_count = Column(Integer, nullable=False)
+    # [width, height, hash, size] per page: size in points, and the blob
+    # holding that page alone as a PDF
+    pages = Column(JSON, nullable=False)
+    error = Column(String, nullable=True)  # set instead when the PDF can't be read
+    # Widths the page thumbnails have been rendered at
+    thumbnails = Column(ARRAY(Integer), nullable=True)
+    thumbnail_error = Column(String, nullable=True)  # set when they can't be rendered
+    text_error = Column(String, nullable=True)  # set when the text can't be extracted
+    created_at = Column(DateTime, nullable=False)
@@ -0,0 +1,11 @@
+# app/models/rate_limit.py
+from sqlalchemy import Column, Float, String
+from app.db import Base
+
+
+# Token buckets of app.ratelimit.PostgresBackend
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limits"
+
+    key = Column(String, primary_key=True)  # e.g. "login:ip:10.0.0.1"
+    tat = Column(Float, nullable=False)  # theoretical arrival time, epoch seconds
@@ -1,5 +1,5 @@
 # app/models/section.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, Boolean, ForeignKey, func
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from app.db import Base
 
@@ -7,10 +7,12 @@ from app.db import Base
 class Section(Base):
     __tablename__ = "sections"
 
-    section_id = Column(UUID, primary_key=True, index=True)
+    section_id = Column(UUID, primary_key=True)
     course_id = Column(
         UUID, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False, index=True
     )
-    name = Column(String, index=True)
-    materials = Column(ARRAY(UUID), index=True)
-    schedules = Column(ARRAY(String), index=True)
+    name = Column(String)
+    materials = Column(ARRAY(UUID))
+    schedules = Column(ARRAY(String))
+    # Last change to what the calendar shows (see app.slides.calendar)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,15 @@
+# app/models/slow_query.py
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, String
+from app.db import Base
+
+
+class SlowQuery(Base):
+    __tablename__ = "slow_queries"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    route = Column(String, nullable=True)  # e.g. "GET /api/group/{course_id}"
+    statement = Column(String, nullable=False)
+    params = Column(JSON, nullable=True)  # truncated, see app.db_slow
+    duration_ms = Column(Float, nullable=False)
+    plan = Column(String, nullable=True)  # EXPLAIN (ANALYZE, BUFFERS), sampled
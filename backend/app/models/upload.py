@@ -0,0 +1,22 @@
+# app/models/upload.py
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+from app.db import Base
+import uuid
+
+
+# A chunked upload in progress; the bytes received so far are in
+# app.uploads.upload_path(upload_id) until it is finalized into the blob store
+class Upload(Base):
+    __tablename__ = "uploads"
+
+    upload_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        String, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False
+    )
+    file_name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)  # declared at init
+    created_at = Column(DateTime, nullable=False, index=True)  # for expiry
+    # Set once finalized
+    content_hash = Column(String(64), nullable=True)
+    content_mime = Column(String, nullable=True)
@@ -1,6 +1,6 @@
 # app/models/user.py
 from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime
-from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSON
+from sqlalchemy.dialects.postgresql import UUID
 from app.db import Base
 from pydantic import BaseModel
 from typing import Optional
@@ -10,27 +10,32 @@ import uuid
 class User(Base):
     __tablename__ = "users"
 
-    user_id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
     email = Column(String, nullable=True)
     password = Column(String, nullable=False)
     is_teacher = Column(Boolean, default=False)
-    courses = Column(
-        ARRAY(String), nullable=True
-    )  # corresponding to course_id, but whole course in the api
-    groups = Column(ARRAY(String), nullable=True)  # Array of "course_id:group_id"
-    photo = Column(String, nullable=True)
+    photo_hash = Column(String(64), nullable=True)  # avatar in app.blobs
     office_hour = Column(String, nullable=True)
     office_place = Column(String, nullable=True)
+    calendar_token = Column(String, nullable=True, unique=True)  # secret of the .ics feed URL
 
 
 class Sessions(Base):
     __tablename__ = "sessions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     created_at = Column(DateTime, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # for the reaper
+
+
+# Logged out stateless tokens, kept until they would have expired anyway
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
 
 # Pydantic models for API schemas
@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+
+from app.auth.middleware import get_admin_user
+from app.auth.cache import session_cache, token_denylist
+from app.course_cache import course_cache
+from app.auth.hashing import password_hasher
+from app.auth.reaper import session_reaper
+from app.pages import material_processor
+from app.ratelimit import limiters, RATE_LIMIT_BACKEND, RATE_LIMIT_ENABLED
+from app.db import (
+    engine,
+    async_engine,
+    replica_engine,
+    replica_health,
+    slow_query_log,
+    get_db,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_ECHO,
+    DB_QUERY_WARN_THRESHOLD,
+    DB_QUERY_REPEAT_THRESHOLD,
+)
+from app.models.user import User
+from app.models.slow_query import SlowQuery
+from app.db_pool import pool_status
+from app.db_queries import route_query_stats
+
+router = APIRouter()
+
+
+# Pools live per uvicorn worker; the response describes the worker that
+# served it, identified by pid.
+@router.get("/metrics/db")
+async def get_db_metrics(admin: User = Depends(get_admin_user)):
+    return {
+        "pid": os.getpid(),
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "echo": DB_ECHO,
+        },
+        "pools": {
+            "primary": pool_status(async_engine.pool),
+            "sync": pool_status(engine.pool),
+            **(
+                {"replica": pool_status(replica_engine.pool)}
+                if replica_engine is not None
+                else {}
+            ),
+        },
+        "replica": replica_health.status() if replica_health is not None else None,
+        "auth_cache": session_cache.status(),
+        "token_denylist": token_denylist.status(),
+        "password_hashing": password_hasher.status(),
+        "material_processing": material_processor.status(),
+        "course_cache": course_cache.status(),
+    }
+
+
+@router.get("/metrics/queries")
+async def get_query_metrics(admin: User = Depends(get_admin_user)):
+    return {
+        "pid": os.getpid(),
+        "warn_threshold": DB_QUERY_WARN_THRESHOLD,
+        "repeat_threshold": DB_QUERY_REPEAT_THRESHOLD,
+        "routes": route_query_stats.snapshot(),
+    }
+
+
+@router.get("/metrics/sessions")
+async def get_session_metrics(
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    return {
+        "pid": os.getpid(),
+        "table": await session_reaper.table_status(db),
+        "reaper": session_reaper.status(),
+    }
+
+
+@router.get("/metrics/rate-limits")
+async def get_rate_limit_metrics(admin: User = Depends(get_admin_user)):
+    return {
+        "pid": os.getpid(),
+        "enabled": RATE_LIMIT_ENABLED,
+        "backend": RATE_LIMIT_BACKEND,
+        "routes": {limiter.name: limiter.status() for limiter in limiters},
+    }
+
+
+# Shared by all workers, unlike the metrics above
+@router.get("/metrics/slow-queries")
+async def get_slow_queries(
+    route: str = None,
+    min_ms: float = 0,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    if slow_query_log is None:
+        return {"message": "Slow query log is disabled", "enabled": False, "queries": []}
+    query = select(SlowQuery).where(SlowQuery.duration_ms >= min_ms)
+    if route is not None:
+        query = query.where(SlowQuery.route == route)
+    queries = (
+        await db.scalars(query.order_by(SlowQuery.created_at.desc()).limit(min(limit, 500)))
+    ).all()
+    return {
+        "message": "Slow queries retrieved successfully",
+        "enabled": True,
+        "worker": {"pid": os.getpid(), **slow_query_log.status()},
+        "queries": [
+            {
+                "id": query.id,
+                "created_at": query.created_at.isoformat(),
+                "route": query.route,
+                "duration_ms": query.duration_ms,
+                "statement": query.statement,
+                "params": query.params,
+                "plan": query.plan,
+            }
+            for query in queries
+        ],
+    }
@@ -0,0 +1,507 @@
+"""Background processing of material PDFs.
+
+Every PDF uploaded as a material is split into single-page PDFs, stored in
+the blob store like any other blob, and its page count and page sizes are
+recorded in ``pdf_indexes``. Indexes are keyed by content hash, so a file
+uploaded twice is processed once. The parsing runs in a process pool, off the
+event loop and across cores.
+
+Their text is extracted per page into ``material_pages``, keyed by material
+and page, and extracted again only when a material's file changes (copied
+from another material when it is the same file).
+
+Pages are also rendered to WebP thumbnails at each of ``THUMBNAIL_WIDTHS``,
+stored under ``THUMBNAIL_PATH`` by the PDF's hash, page and width; they never
+change, and identical uploads share them too.
+
+Uploads submit their PDF right away; each worker also scans for PDFs without
+an index every ``MATERIAL_SCAN_INTERVAL`` seconds (uploads from before this
+existed, or submitted to a worker that went away).
+
+A PDF that cannot be parsed gets its error recorded and is left alone. Other
+split failures (a pool process dying, running out of memory, the blob store
+failing) record nothing: the PDF is queued again up to ``MATERIAL_RETRIES``
+times, and after that left to the next scan.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pypdfium2 as pdfium
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
+from sqlalchemy import delete, exists, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.blobs import BlobStore, blob_store
+from app.db import async_engine
+from app.models.material import Material
+from app.models.material_page import MaterialPage
+from app.models.pdf_index import PdfIndex
+
+logger = logging.getLogger(__name__)
+
+MATERIAL_WORKERS = int(os.getenv("MATERIAL_WORKERS", str(os.cpu_count() or 1)))
+# Seconds between scans for unprocessed PDFs; 0 disables them
+MATERIAL_SCAN_INTERVAL = float(os.getenv("MATERIAL_SCAN_INTERVAL", "300"))
+# Requeues of a PDF whose split failed for a passing reason, the first after
+# MATERIAL_RETRY_DELAY seconds and doubling from there
+MATERIAL_RETRIES = int(os.getenv("MATERIAL_RETRIES", "3"))
+MATERIAL_RETRY_DELAY = float(os.getenv("MATERIAL_RETRY_DELAY", "30"))
+PROCESSOR_LOCK_ID = 0x5041474553  # one scan at a time across workers
+TEXT_LOCK_NAMESPACE = 0x54455854  # with the hash: one writer of a PDF's text
+THUMBNAIL_PATH = os.getenv("THUMBNAIL_PATH", "data/thumbnails")
+THUMBNAIL_WIDTHS = sorted(
+    int(width) for width in os.getenv("THUMBNAIL_WIDTHS", "160,480").split(",")
+)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "70"))
+# What a broken file raises; anything else may not happen again
+PARSE_ERRORS = (PdfReadError, pdfium.PdfiumError)
+
+
+def page_size(page) -> list[float]:
+    box = page.cropbox
+    width, height = round(float(box.width), 2), round(float(box.height), 2)
+    if page.rotation % 180:
+        return [height, width]
+    return [width, height]
+
+
+def split_pages(path: str, store_root: str) -> list[list]:
+    """Runs in the process pool: stores every page of the PDF at ``path`` as
+    a PDF of its own and returns [width, height, hash, size] per page."""
+    store = BlobStore(store_root)
+    pages = []
+    for page in PdfReader(path).pages:
+        writer = PdfWriter()
+        writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        digest, size = store.put(buffer.getvalue())
+        pages.append([*page_size(page), digest, size])
+    return pages
+
+
+def thumbnail_path(data_hash: str, page: int, width: int, root: str = THUMBNAIL_PATH) -> str:
+    return os.path.join(root, data_hash[:2], data_hash, str(width), f"{page}.webp")
+
+
+def render_thumbnails(
+    path: str, pages: range, data_hash: str, widths: list[int], root: str
+):
+    """Runs in the process pool: renders ``pages`` (from 1) of the PDF at
+    ``path`` once each, large enough for the widest thumbnail, and scales them
+    down to each width. Thumbnails already on disk are kept; pages without
+    an area get none."""
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for number in pages:
+            page = pdf[number - 1]
+            targets = [
+                (width, thumbnail_path(data_hash, number, width, root))
+                for width in widths
+            ]
+            targets = [(width, target) for width, target in targets if not os.path.exists(target)]
+            side = min(page.get_size())
+            if targets and side > 0:
+                # Either side may end up as the width once rotation is applied
+                image = page.render(scale=max(widths) / side).to_pil()
+                for width, target in targets:
+                    height = max(1, round(image.height * width / image.width))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    tmp = f"{target}.tmp-{os.getpid()}"
+                    image.resize((width, height), Image.LANCZOS).save(
+                        tmp, "WEBP", quality=THUMBNAIL_QUALITY
+                    )
+                    os.replace(tmp, target)
+            page.close()
+    finally:
+        pdf.close()
+
+
+def extract_text(path: str, pages: range) -> list[str]:
+    """Runs in the process pool: the text of ``pages`` (from 1) of the PDF at
+    ``path``."""
+    pdf = pdfium.PdfDocument(path)
+    try:
+        texts = []
+        for number in pages:
+            page = pdf[number - 1]
+            textpage = page.get_textpage()
+            # Postgres text cannot hold NUL
+            texts.append(
+                textpage.get_text_bounded().replace("\r\n", "\n").replace("\x00", "")
+            )
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def text_missing():
+    """Materials whose pages' text is missing or from an older file."""
+    return ~exists().where(
+        MaterialPage.material_id == Material.material_id,
+        MaterialPage.data_hash == Material.data_hash,
+    )
+
+
+def collect_thumbnails(engine, grace: float) -> int:
+    """Deletes the thumbnails of PDFs no material uses any more."""
+    cutoff = time.time() - grace
+    with engine.connect() as conn:
+        referenced = set(conn.execute(select(Material.data_hash)).scalars())
+    deleted = 0
+    if not os.path.isdir(THUMBNAIL_PATH):
+        return deleted
+    for prefix in os.listdir(THUMBNAIL_PATH):
+        for data_hash in os.listdir(os.path.join(THUMBNAIL_PATH, prefix)):
+            directory = os.path.join(THUMBNAIL_PATH, prefix, data_hash)
+            if data_hash not in referenced and os.stat(directory).st_mtime < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                deleted += 1
+    return deleted
+
+
+class MaterialProcessor:
+    """Queue of PDFs to process, worked through by ``workers`` processes."""
+
+    def __init__(self, engine, workers: int, scan_interval: float):
+        self.engine = engine
+        self.workers = workers
+        self.scan_interval = scan_interval
+        self.pool = None
+        self.queue = None
+        self.pending = set()
+        self.attempts = {}  # data_hash: failed splits since the last success
+        self.processed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self._tasks = []
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            # Forking a worker with a running event loop and open
+            # connections is unsafe; children start from scratch instead
+            self.pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.pool
+
+    def retry(self, data_hash: str):
+        """Queues the PDF again after a backoff, or leaves it to the next scan
+        once it has failed ``MATERIAL_RETRIES`` times in a row."""
+        attempt = self.attempts.get(data_hash, 0) + 1
+        if attempt > MATERIAL_RETRIES:
+            del self.attempts[data_hash]
+            return
+        self.attempts[data_hash] = attempt
+        asyncio.get_running_loop().call_later(
+            MATERIAL_RETRY_DELAY * 2 ** (attempt - 1), self.submit, data_hash
+        )
+
+    async def split(self, data_hash: str) -> tuple[int, str | None] | None:
+        """Indexes the pages of the PDF; None when that failed for a reason
+        that may pass, in which case nothing is recorded."""
+        pages, error = [], None
+        pool = self.executor()
+        try:
+            pages = await asyncio.get_running_loop().run_in_executor(
+                pool, split_pages, blob_store.path(data_hash), blob_store.root
+            )
+        except PARSE_ERRORS as e:
+            # Recorded, so a broken upload is not retried on every scan
+            logger.warning("Could not split %s into pages: %s", data_hash, e)
+            error = str(e) or type(e).__name__
+            self.failed += 1
+        except Exception as e:
+            logger.warning("Could not split %s into pages, retrying: %r", data_hash, e)
+            if isinstance(e, BrokenProcessPool) and self.pool is pool:
+                # A process died (e.g. killed for memory); the pool takes no
+                # more work
+                self.pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            self.failed += 1
+            self.retry(data_hash)
+            return None
+        self.attempts.pop(data_hash, None)
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                insert(PdfIndex)
+                .values(
+                    data_hash=data_hash,
+                    page_count=len(pages),
+                    pages=pages,
+                    error=error,
+                    created_at=datetime.now(),
+                )
+                .on_conflict_do_nothing()
+            )
+        return len(pages), error
+
+    async def map_pages(self, func, data_hash: str, page_count: int, *args) -> list:
+        """Runs ``func(path, pages, *args)`` on ranges of the pages, one per
+        process, so even a single deck uses all of them."""
+        loop = asyncio.get_running_loop()
+        step = -(-page_count // self.workers) or 1
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor(),
+                    func,
+                    blob_store.path(data_hash),
+                    range(first, min(first + step, page_count + 1)),
+                    *args,
+                )
+                for first in range(1, page_count + 1, step)
+            )
+        )
+
+    async def render(self, data_hash: str, page_count: int):
+        values = {"thumbnails": THUMBNAIL_WIDTHS}
+        try:
+            await self.map_pages(
+                render_thumbnails, data_hash, page_count, data_hash, THUMBNAIL_WIDTHS, THUMBNAIL_PATH
+            )
+        except Exception as e:
+            # Recorded like split errors, so it is not rendered on every scan
+            logger.warning("Could not render thumbnails of %s: %s", data_hash, e)
+            values = {"thumbnail_error": str(e) or type(e).__name__}
+            self.failed += 1
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(PdfIndex).where(PdfIndex.data_hash == data_hash).values(**values)
+            )
+
+    async def store_text(self, data_hash: str, page_count: int) -> bool:
+        """Fills ``material_pages`` of the materials with this PDF that lack
+        its text; returns whether there were any."""
+        async with self.engine.connect() as conn:
+            missing = (
+                await conn.scalars(
+                    select(Material.material_id).where(
+                        Material.data_hash == data_hash, text_missing()
+                    )
+                )
+            ).all()
+            if not missing:
+                return False
+            source = (
+                select(MaterialPage.material_id)
+                .where(MaterialPage.data_hash == data_hash)
+                .limit(1)
+                .scalar_subquery()
+            )
+            texts = (
+                await conn.scalars(
+                    select(MaterialPage.text)
+                    .where(MaterialPage.material_id == source)
+                    .order_by(MaterialPage.page)
+                )
+            ).all()
+        if len(texts) != page_count:
+            try:
+                texts = [
+                    page_text
+                    for shard in await self.map_pages(extract_text, data_hash, page_count)
+                    for page_text in shard
+                ]
+            except Exception as e:
+                # Recorded like split errors, so it is not extracted on every scan
+                logger.warning("Could not extract the text of %s: %s", data_hash, e)
+                self.failed += 1
+                async with self.engine.begin() as conn:
+                    await conn.execute(
+                        update(PdfIndex)
+                        .where(PdfIndex.data_hash == data_hash)
+                        .values(text_error=str(e) or type(e).__name__)
+                    )
+                return True
+        async with self.engine.begin() as conn:
+            # Another worker may be storing the same PDF; the second one finds
+            # nothing missing any more
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:data_hash))"),
+                {"namespace": TEXT_LOCK_NAMESPACE, "data_hash": data_hash},
+            )
+            missing = (
+                await conn.scalars(
+                    select(Material.material_id).where(
+                        Material.data_hash == data_hash, text_missing()
+                    )
+                )
+            ).all()
+            if not missing:
+                return False
+            await conn.execute(
+                delete(MaterialPage).where(MaterialPage.material_id.in_(missing))
+            )
+            await conn.execute(
+                insert(MaterialPage),
+                [
+                    {
+                        "material_id": material_id,
+                        "page": number,
+                        "data_hash": data_hash,
+                        "text": page_text,
+                    }
+                    for material_id in missing
+                    for number, page_text in enumerate(texts, start=1)
+                ],
+            )
+        return True
+
+    async def process(self, data_hash: str):
+        async with self.engine.connect() as conn:
+            index = (
+                await conn.execute(
+                    select(
+                        PdfIndex.page_count,
+                        PdfIndex.error,
+                        PdfIndex.thumbnails,
+                        PdfIndex.thumbnail_error,
+                        PdfIndex.text_error,
+                    ).where(PdfIndex.data_hash == data_hash)
+                )
+            ).first()
+        start = time.perf_counter()
+        worked = False
+        if index is None:
+            split = await self.split(data_hash)
+            if split is None:
+                return
+            page_count, error = split
+            thumbnails, thumbnail_error, text_error, worked = None, None, None, True
+        else:
+            page_count, error, thumbnails, thumbnail_error, text_error = index
+        if error is None:
+            if thumbnail_error is None and not set(THUMBNAIL_WIDTHS) <= set(thumbnails or []):
+                await self.render(data_hash, page_count)
+                worked = True
+            if page_count and text_error is None and await self.store_text(data_hash, page_count):
+                worked = True
+        if worked:
+            self.processed += 1
+            self.total_seconds += time.perf_counter() - start
+
+    def submit(self, data_hash: str):
+        """Queues a PDF; a no-op in a worker whose processor isn't running,
+        the next scan picks it up."""
+        if self.queue is None or data_hash in self.pending:
+            return
+        self.pending.add(data_hash)
+        self.queue.put_nowait(data_hash)
+
+    async def work(self):
+        while True:
+            data_hash = await self.queue.get()
+            try:
+                await self.process(data_hash)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Processing %s failed", data_hash)
+            finally:
+                self.pending.discard(data_hash)
+
+    async def scan(self):
+        async with self.engine.connect() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": PROCESSOR_LOCK_ID}
+            )
+            await conn.commit()
+            if not locked:
+                return
+            try:
+                missing = (
+                    await conn.scalars(
+                        select(Material.data_hash)
+                        .distinct()
+                        .outerjoin(PdfIndex, PdfIndex.data_hash == Material.data_hash)
+                        .where(
+                            Material.data_mime == "application/pdf",
+                            or_(
+                                PdfIndex.data_hash.is_(None),
+                                PdfIndex.error.is_(None)
+                                & or_(
+                                    PdfIndex.thumbnail_error.is_(None)
+                                    & or_(
+                                        PdfIndex.thumbnails.is_(None),
+                                        ~PdfIndex.thumbnails.contains(THUMBNAIL_WIDTHS),
+                                    ),
+                                    (PdfIndex.page_count > 0)
+                                    & PdfIndex.text_error.is_(None)
+                                    & text_missing(),
+                                ),
+                            ),
+                        )
+                        .limit(1000)
+                    )
+                ).all()
+                await conn.commit()
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": PROCESSOR_LOCK_ID}
+                )
+                await conn.commit()
+        for data_hash in missing:
+            self.submit(data_hash)
+
+    async def run_scans(self):
+        while True:
+            try:
+                await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Scanning for unprocessed materials failed")
+            await asyncio.sleep(self.scan_interval)
+
+    def start(self):
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self.work()) for _ in range(self.workers)]
+        if self.scan_interval > 0:
+            self._tasks.append(loop.create_task(self.run_scans()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.queue = None
+        self.pending.clear()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.queue is not None,
+            "queued": len(self.pending),
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_seconds": round(self.total_seconds / self.processed, 3) if self.processed else None,
+        }
+
+
+material_processor = MaterialProcessor(
+    async_engine, MATERIAL_WORKERS, MATERIAL_SCAN_INTERVAL
+)
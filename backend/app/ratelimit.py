@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+
+from app.db import async_engine, env_flag
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", True)
+# "memory" keeps buckets per worker; "postgres" shares them between workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+
+class Limit:
+    """``rate`` requests per second on average, with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+
+    @property
+    def interval(self) -> float:
+        return 1 / self.rate
+
+    def __repr__(self):
+        return f"Limit(rate={self.rate}, burst={self.burst})"
+
+
+# Buckets are kept as GCRA "theoretical arrival times": one float per key
+# instead of a token count and a timestamp. A request is due at
+# max(tat, now) + interval; it may go ahead once that is no more than
+# burst * interval in the future, and may wait for the remainder.
+
+
+class MemoryBackend:
+    """Buckets of this worker only; limits are effectively per worker."""
+
+    def __init__(self):
+        self.tats = {}
+
+    async def reserve(self, key: str, limit: Limit, max_wait: float) -> float | None:
+        """Takes a token, returning how long to wait for it, or None (and
+        takes nothing) when that would be longer than ``max_wait``."""
+        now = time.time()
+        tat = max(self.tats.get(key, now), now) + limit.interval
+        wait = tat - now - limit.burst * limit.interval
+        if wait > max_wait:
+            return None
+        self.tats[key] = tat
+        if len(self.tats) > 100000:
+            self.tats = {k: v for k, v in self.tats.items() if v > now}
+        return max(wait, 0.0)
+
+    async def refund(self, key: str, limit: Limit):
+        if key in self.tats:
+            self.tats[key] -= limit.interval
+
+
+class PostgresBackend:
+    """Buckets in the ``rate_limits`` table, one upsert per reservation."""
+
+    RESERVE = text(
+        """
+        INSERT INTO rate_limits (key, tat)
+        VALUES (:key, CAST(:now AS float8) + CAST(:interval AS float8))
+        ON CONFLICT (key) DO UPDATE
+            SET tat = GREATEST(rate_limits.tat, CAST(:now AS float8)) + CAST(:interval AS float8)
+            WHERE GREATEST(rate_limits.tat, CAST(:now AS float8)) + CAST(:interval AS float8)
+                - CAST(:now AS float8) <= CAST(:limit AS float8)
+        RETURNING tat
+        """
+    )
+    REFUND = text(
+        "UPDATE rate_limits SET tat = tat - CAST(:interval AS float8) WHERE key = :key"
+    )
+    # A bucket whose tat has passed is full, the same as no row
+    PRUNE = text("DELETE FROM rate_limits WHERE tat < CAST(:now AS float8)")
+
+    def __init__(self, engine, prune_every: int = 1000):
+        self.engine = engine
+        self.prune_every = prune_every
+        self.reservations = 0
+
+    async def reserve(self, key: str, limit: Limit, max_wait: float) -> float | None:
+        now = time.time()
+        async with self.engine.begin() as conn:
+            tat = await conn.scalar(
+                self.RESERVE,
+                {
+                    "key": key,
+                    "now": now,
+                    "interval": limit.interval,
+                    "limit": limit.burst * limit.interval + max_wait,
+                },
+            )
+            self.reservations += 1
+            if self.reservations % self.prune_every == 0:
+                await conn.execute(self.PRUNE, {"now": now})
+        if tat is None:
+            return None
+        return max(tat - now - limit.burst * limit.interval, 0.0)
+
+    async def refund(self, key: str, limit: Limit):
+        async with self.engine.begin() as conn:
+            await conn.execute(self.REFUND, {"key": key, "interval": limit.interval})
+
+
+def client_key(request: Request) -> str:
+    """The user a request is made by, per token; the client address when it
+    carries none (e.g. /login)."""
+    # app.auth applies a limiter to /login, so it cannot be imported up top
+    from app.auth.utils import token_user
+
+    user = token_user(request.headers.get("Authorization"))
+    if user is not None:
+        return f"user:{user}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """FastAPI dependency admitting requests through a per-user and a global
+    token bucket.
+
+    Over the limit, ``queue=False`` answers 429 straight away; ``queue=True``
+    makes the request wait for its token, at most ``max_wait`` seconds and
+    with at most ``max_queue`` requests waiting in this worker, and answers
+    429 beyond that.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_user: Limit | None = None,
+        global_limit: Limit | None = None,
+        queue: bool = False,
+        max_wait: float = 10.0,
+        max_queue: int = 100,
+        key=client_key,
+    ):
+        self.name = name
+        self.per_user = per_user
+        self.global_limit = global_limit
+        self.queue = queue
+        self.max_wait = max_wait if queue else 0.0
+        self.max_queue = max_queue
+        self.key = key
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.longest_wait = 0.0
+        limiters.append(self)
+
+    def reject(self, retry_after: float):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        max_wait = self.max_wait if self.waiting < self.max_queue else 0.0
+
+        wait = 0.0
+        taken = []
+        for key, limit in (
+            (f"{self.name}:{self.key(request)}", self.per_user),
+            (f"{self.name}:global", self.global_limit),
+        ):
+            if limit is None:
+                continue
+            bucket_wait = await backend.reserve(key, limit, max_wait)
+            if bucket_wait is None:
+                for taken_key, taken_limit in taken:
+                    await backend.refund(taken_key, taken_limit)
+                self.reject(limit.interval)
+            taken.append((key, limit))
+            wait = max(wait, bucket_wait)
+
+        if wait > 0:
+            self.queued += 1
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+            self.total_wait += wait
+            self.longest_wait = max(self.longest_wait, wait)
+        self.admitted += 1
+
+    def status(self) -> dict:
+        return {
+            "per_user": repr(self.per_user),
+            "global": repr(self.global_limit),
+            "mode": "queue" if self.queue else "reject",
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "waiting": self.waiting,
+            "avg_wait_ms": round(self.total_wait / self.queued * 1000, 3) if self.queued else 0.0,
+            "max_wait_ms": round(self.longest_wait * 1000, 3),
+        }
+
+
+limiters: list[RateLimiter] = []
+
+if RATE_LIMIT_BACKEND == "postgres":
+    backend = PostgresBackend(async_engine)
+else:
+    if RATE_LIMIT_BACKEND != "memory":
+        logger.warning("Unknown RATE_LIMIT_BACKEND %r, using memory", RATE_LIMIT_BACKEND)
+    backend = MemoryBackend()
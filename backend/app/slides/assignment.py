@@ -1,35 +1,66 @@
 from fastapi import APIRouter, Depends, Form, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.assignment import Assignment
 from app.models.user import User
-from app.models.course import Course
+from app.models.course import Course, CourseMember
+from app.models.file import FileDB
 from app.auth.middleware import get_current_user
 from app.db import get_db
+from app.blobs import blob_url
+from app.course_cache import bump_course_versions
+from app.slides.calendar import record_removal
 from typing import List
 
 
 router = APIRouter()
 
 
+def starter_file(file: FileDB) -> dict:
+    return {
+        "file_id": file.file_id,
+        "file_name": file.file_name,
+        "file_path": file.file_path,
+        "size": int(file.file_size),
+        "mime": file.content_mime,
+        "url": blob_url(file.content_hash, file.file_name),
+    }
+
+
 @router.get("/assignments/{course_id}")
 async def get_assignments(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    # Members only, starter file urls need no token to download
+    course = await db.scalar(
+        select(Course)
+        .join(CourseMember, CourseMember.course_id == Course.course_id)
+        .where(Course.course_id == course_id, CourseMember.user_id == user.user_id)
+    )
     if not course:
         raise HTTPException(status_code=404, detail="Course not found.")
 
     assignments = (
-        db.query(Assignment)
-        .filter(Assignment.assignment_id.in_(course.assignments))
-        .all()
-    )
+        await db.scalars(
+            select(Assignment).where(Assignment.assignment_id.in_(course.assignments))
+        )
+    ).all()
     if not assignments:
         raise HTTPException(
             status_code=404, detail="No assignments found for this course."
         )
+    # Starter files of all of them in one query
+    file_ids = {file_id for assignment in assignments for file_id in assignment.files or []}
+    files = {}
+    if file_ids:
+        files = {
+            str(file.file_id): file
+            for file in await db.scalars(
+                select(FileDB).where(FileDB.file_id.in_(file_ids), FileDB.is_deleted == False)
+            )
+        }
     return {
         "message": "Assignments found.",
         "assignments": [
@@ -42,6 +73,11 @@ async def get_assignments(
                 "deadline": assignment.deadline,
                 "is_over": assignment.is_over,
                 "description": assignment.description,
+                "files": [
+                    starter_file(files[file_id])
+                    for file_id in assignment.files or []
+                    if file_id in files
+                ],
             }
             for assignment in assignments
         ],
@@ -56,10 +92,10 @@ async def create_assignment(
     course_id: str = Form(None),
     deadline: str = Form(None),
     files: List[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found.")
 
@@ -75,15 +111,17 @@ async def create_assignment(
         files=files,
     )
     db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
+    await db.commit()
+    await db.refresh(new_assignment)
 
     # Update course's assignments list
-    if new_assignment.assignment_id not in course.assignments:
-        course.assignments = course.assignments + [new_assignment.assignment_id]
+    assignment_id = str(new_assignment.assignment_id)
+    if assignment_id not in course.assignments:
+        course.assignments = course.assignments + [assignment_id]
     course.assignments = list(set(course.assignments))
 
-    db.commit()
+    await bump_course_versions(db, course_id)
+    await db.commit()
     return {
         "message": "Assignment created successfully.",
         "assignment_id": new_assignment.assignment_id,
@@ -96,11 +134,11 @@ async def edit_assignment(
     name: str = Form(None),
     description: str = Form(None),
     deadline: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    assignment = (
-        db.query(Assignment).filter(Assignment.assignment_id == assignment_id).first()
+    assignment = await db.scalar(
+        select(Assignment).where(Assignment.assignment_id == assignment_id)
     )
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found.")
@@ -117,20 +155,24 @@ async def edit_assignment(
         assignment.description = description
     if deadline is not None and deadline != "":
         assignment.deadline = deadline
+    if name or deadline:
+        # Calendar deltas send it again
+        assignment.updated_at = func.now()
 
-    db.commit()
-    db.refresh(assignment)
+    await bump_course_versions(db, assignment.course_id)
+    await db.commit()
+    await db.refresh(assignment)
     return {"message": "Assignment updated successfully."}
 
 
 @router.delete("/assignment/{assignment_id}")
 async def delete_assignment(
     assignment_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    assignment = (
-        db.query(Assignment).filter(Assignment.assignment_id == assignment_id).first()
+    assignment = await db.scalar(
+        select(Assignment).where(Assignment.assignment_id == assignment_id)
     )
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found.")
@@ -142,13 +184,17 @@ async def delete_assignment(
         )
 
     # Remove assignment from course's assignments list
-    course = db.query(Course).filter(Course.course_id == assignment.course_id).first()
-    if course and assignment.assignment_id in course.assignments:
+    course = await db.scalar(
+        select(Course).where(Course.course_id == assignment.course_id)
+    )
+    if course and str(assignment.assignment_id) in course.assignments:
         course.assignments = [
-            aid for aid in course.assignments if aid != assignment.assignment_id
+            aid for aid in course.assignments if aid != str(assignment.assignment_id)
         ]
-        db.commit()
+        await db.commit()
 
-    db.delete(assignment)
-    db.commit()
+    await db.delete(assignment)
+    await record_removal(db, "assignment", assignment.assignment_id, assignment.course_id)
+    await bump_course_versions(db, assignment.course_id)
+    await db.commit()
     return {"message": "Assignment deleted successfully."}
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from app.blobs import DIGEST, IMMUTABLE, blob_response, blob_store, guess_mime
+
+router = APIRouter()
+
+# Shown by the browser; anything else is downloaded, so an uploaded page
+# cannot run scripts on this origin
+INLINE_TYPES = {
+    "application/pdf",
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "text/plain",
+}
+
+
+# Unauthenticated, the hash is the capability: URLs come from blob_url in
+# responses of users allowed to see the blob
+@router.get("/blob/{data_hash}/{name}")
+async def get_blob(data_hash: str, name: str, request: Request):
+    head = None
+    if DIGEST.fullmatch(data_hash):
+        head = await run_in_threadpool(blob_store.head, data_hash)
+    if head is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blob not found")
+    mime = guess_mime(name, head)
+    return blob_response(
+        request,
+        data_hash,
+        mime,
+        name,
+        IMMUTABLE,
+        "inline" if mime in INLINE_TYPES else "attachment",
+    )
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, Body, Form, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.models.bookmarklist import BookmarkList
 from app.auth.middleware import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
 import json
 
 
@@ -13,12 +14,14 @@ router = APIRouter()
 @router.get("/marklist/{material_id}")
 async def get_marklist(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     marklist = (
-        db.query(BookmarkList).filter(BookmarkList.material_id == material_id).all()
-    )
+        await db.scalars(
+            select(BookmarkList).where(BookmarkList.material_id == material_id)
+        )
+    ).all()
     return {
         "message": "Marklist retrieved successfully",
         "marklists": [
@@ -50,9 +53,11 @@ async def create_marklist(
     current_user: User = Depends(get_current_user),
     material_id: str = Form(None),
     bookmark_list: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    marklist = db.query(BookmarkList).filter(BookmarkList.list_id == list_id).first()
+    marklist = await db.scalar(
+        select(BookmarkList).where(BookmarkList.list_id == list_id)
+    )
     if marklist is None:
         marklist = BookmarkList(
             list_id=list_id,
@@ -62,8 +67,8 @@ async def create_marklist(
             bookmark_list=convert_string_to_int_list(bookmark_list),
         )
         db.add(marklist)
-        db.commit()
-        db.refresh(marklist)
+        await db.commit()
+        await db.refresh(marklist)
         return {
             "message": "Marklist created successfully",
             "marklist": {
@@ -83,8 +88,8 @@ async def create_marklist(
             marklist.bookmark_list = convert_string_to_int_list(bookmark_list)
         if material_id is not None:
             marklist.material_id = material_id
-        db.commit()
-        db.refresh(marklist)
+        await db.commit()
+        await db.refresh(marklist)
         return {
             "message": "Marklist updated successfully",
             "marklist": {
@@ -100,10 +105,12 @@ async def create_marklist(
 @router.delete("/marklist/{list_id}")
 async def delete_marklist(
     list_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
-    marklist = db.query(BookmarkList).filter(BookmarkList.list_id == list_id).first()
+    marklist = await db.scalar(
+        select(BookmarkList).where(BookmarkList.list_id == list_id)
+    )
     if marklist is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Marklist not found"
@@ -113,6 +120,6 @@ async def delete_marklist(
             status_code=status.HTTP_403_FORBIDDEN, detail="User not authorized"
         )
     else:
-        db.delete(marklist)
-        db.commit()
+        await db.delete(marklist)
+        await db.commit()
         return {"message": "Marklist deleted successfully"}
@@ -0,0 +1,372 @@
+import hashlib
+import os
+import secrets
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from app.models.course import Course, CourseMember
+from app.models.section import Section
+from app.models.assignment import Assignment
+from app.models.calendar_removal import CalendarRemoval
+from app.auth.middleware import get_current_user
+from app.blobs import etag_matches
+from app.db import get_db, get_read_db
+from app.course_cache import course_cache
+
+
+router = APIRouter()
+
+# Writes stamp rows with the start of their transaction but may commit after a
+# reader has taken its token, so deltas look back this many seconds further.
+# Entries sent twice are harmless, clients replace them by uid.
+SYNC_GRACE = timedelta(seconds=int(os.getenv("CALENDAR_SYNC_GRACE", "60")))
+# How long removals are kept; older tokens get a full sync
+REMOVAL_RETENTION = timedelta(days=int(os.getenv("CALENDAR_REMOVAL_DAYS", "30")))
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+async def record_removal(db: AsyncSession, kind: str, item_id, course_id):
+    """Lets calendar deltas drop a section or assignment that left the course.
+    Call it in the transaction of the write."""
+    if course_id is None:
+        return
+    statement = insert(CalendarRemoval).values(
+        course_id=course_id, kind=kind, item_id=str(item_id)
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[
+                CalendarRemoval.course_id,
+                CalendarRemoval.kind,
+                CalendarRemoval.item_id,
+            ],
+            set_={"removed_at": func.now()},
+        )
+    )
+    await db.execute(
+        delete(CalendarRemoval).where(
+            CalendarRemoval.removed_at < func.now() - REMOVAL_RETENTION
+        )
+    )
+
+
+def encode_token(stamp: datetime) -> str:
+    return str((stamp - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        return EPOCH + timedelta(microseconds=int(token))
+    except (ValueError, OverflowError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token"
+        )
+
+
+async def calendar_state(db: AsyncSession, user_id: str):
+    """The user's courses and when the last of them changed, in one query.
+    Every calendar write bumps its course (app.course_cache), so this is
+    all that is needed to tell whether anything changed."""
+    courses = (
+        await db.execute(
+            select(
+                Course.course_id,
+                Course.name,
+                Course.version,
+                Course.updated_at,
+                CourseMember.joined_at,
+            )
+            .join(CourseMember, CourseMember.course_id == Course.course_id)
+            .where(CourseMember.user_id == user_id)
+            .order_by(Course.course_id)
+        )
+    ).all()
+    modified = max(
+        (max(course.updated_at, course.joined_at) for course in courses), default=None
+    )
+    return courses, modified
+
+
+def validators(courses, modified: datetime | None, *variant) -> dict:
+    state = [(str(course.course_id), course.version) for course in courses]
+    etag = hashlib.sha256(repr((state, variant)).encode()).hexdigest()[:32]
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            modified.astimezone(timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def not_modified(request: Request, headers: dict, modified: datetime | None) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since
+    if "if-none-match" in request.headers:
+        return etag_matches(request, headers["ETag"])
+    since = request.headers.get("if-modified-since")
+    if since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return modified.replace(microsecond=0) <= since
+
+
+def section_entry(section: Section) -> dict:
+    return {
+        "uid": f"section-{section.section_id}",
+        "kind": "section",
+        "course_id": section.course_id,
+        "section_id": section.section_id,
+        "name": section.name,
+        "schedules": section.schedules or [],
+    }
+
+
+def assignment_entry(assignment: Assignment) -> dict:
+    return {
+        "uid": f"assignment-{assignment.assignment_id}",
+        "kind": "assignment",
+        "course_id": assignment.course_id,
+        "assignment_id": assignment.assignment_id,
+        "name": assignment.name,
+        "deadline": assignment.deadline,
+    }
+
+
+@router.get("/calendar/changes")
+async def get_calendar_changes(
+    request: Request,
+    response: Response,
+    sync_token: str = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    since = None if sync_token is None else decode_token(sync_token)
+    courses, modified = await calendar_state(db, current_user.user_id)
+    headers = validators(courses, modified, sync_token)
+    if not_modified(request, headers, modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+    full = since is None or since < datetime.now(timezone.utc) - REMOVAL_RETENTION
+    members = CourseMember.user_id == current_user.user_id
+    sections = (
+        select(Section)
+        .join(CourseMember, CourseMember.course_id == Section.course_id)
+        .where(members)
+    )
+    assignments = (
+        select(Assignment)
+        .join(CourseMember, CourseMember.course_id == Assignment.course_id)
+        .where(members)
+    )
+    if not full:
+        since -= SYNC_GRACE
+        # Everything of a course joined since counts as changed
+        sections = sections.where(
+            or_(Section.updated_at > since, CourseMember.joined_at > since)
+        )
+        assignments = assignments.where(
+            or_(Assignment.updated_at > since, CourseMember.joined_at > since)
+        )
+    changed = [section_entry(section) for section in await db.scalars(sections)] + [
+        assignment_entry(assignment) for assignment in await db.scalars(assignments)
+    ]
+
+    removed = []
+    if not full:
+        uids = {entry["uid"] for entry in changed}
+        removals = await db.execute(
+            select(CalendarRemoval.kind, CalendarRemoval.item_id)
+            .join(CourseMember, CourseMember.course_id == CalendarRemoval.course_id)
+            .where(members, CalendarRemoval.removed_at > since)
+            .distinct()
+        )
+        # Moved into another of the user's courses rather than gone
+        removed = [
+            uid for kind, item_id in removals if (uid := f"{kind}-{item_id}") not in uids
+        ]
+
+    return {
+        "message": "Calendar changes retrieved successfully",
+        "sync_token": encode_token(modified) if modified is not None else sync_token,
+        "full": full,
+        "courses": [
+            {"course_id": course.course_id, "name": course.name} for course in courses
+        ],
+        "changed": changed,
+        "removed": removed,
+    }
+
+
+def feed_url(token: str | None) -> str | None:
+    return None if token is None else f"/api/calendar/{token}.ics"
+
+
+@router.get("/calendar/feed")
+async def get_calendar_feed_url(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    token = await db.scalar(
+        select(User.calendar_token).where(User.user_id == current_user.user_id)
+    )
+    return {"message": "Calendar feed retrieved successfully", "url": feed_url(token)}
+
+
+# Issues a new feed URL; the previous one stops working
+@router.post("/calendar/feed")
+async def reset_calendar_feed_url(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    token = secrets.token_urlsafe(32)
+    await db.execute(
+        update(User)
+        .where(User.user_id == current_user.user_id)
+        .values(calendar_token=token)
+    )
+    await db.commit()
+    return {"message": "Calendar feed created successfully", "url": feed_url(token)}
+
+
+def parse_when(text: str | None) -> date | datetime | None:
+    """A date for all-day entries, else a datetime; None if unreadable."""
+    text = (text or "").strip()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def escape(text: str | None) -> str:
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r", "")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """Splits a content line into parts of at most 75 octets (RFC 5545)."""
+    parts, part, size = [], "", 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > 75:
+            parts.append(part)
+            # Continuations start with a space
+            part, size = "", 1
+        part += char
+        size += width
+    parts.append(part)
+    return "\r\n ".join(parts)
+
+
+def vevent(uid: str, stamp: datetime, summary: str, when) -> list[str]:
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            # Floating: the same wall-clock time wherever the calendar is
+            start = f"DTSTART:{when:%Y%m%dT%H%M%S}"
+        else:
+            start = f"DTSTART:{when.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+    else:
+        start = f"DTSTART;VALUE=DATE:{when:%Y%m%d}"
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@peachide",
+        f"DTSTAMP:{stamp.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+        start,
+        f"SUMMARY:{escape(summary)}",
+        "END:VEVENT",
+    ]
+
+
+# Unauthenticated, calendar apps cannot send tokens: the secret in the URL
+# from /calendar/feed is the capability
+@router.get("/calendar/{feed_token}.ics")
+async def get_calendar_feed(
+    feed_token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    user_id = await db.scalar(select(User.user_id).where(User.calendar_token == feed_token))
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    courses, modified = await calendar_state(db, user_id)
+    headers = validators(courses, modified, "ics")
+    if not_modified(request, headers, modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    async def build(course_ids):
+        found = {
+            course.course_id: course
+            for course in await db.scalars(
+                select(Course).where(Course.course_id.in_(course_ids))
+            )
+        }
+        events = {course_id: [] for course_id in found}
+        for section in await db.scalars(
+            select(Section)
+            .where(Section.course_id.in_(list(found)))
+            .order_by(Section.section_id)
+        ):
+            course = found[section.course_id]
+            for schedule in section.schedules or []:
+                when = parse_when(schedule)
+                if when is not None:
+                    events[course.course_id] += vevent(
+                        f"section-{section.section_id}-{when.isoformat()}",
+                        course.updated_at,
+                        f"{course.name}: {section.name}",
+                        when,
+                    )
+        for assignment in await db.scalars(
+            select(Assignment)
+            .where(Assignment.course_id.in_(list(found)))
+            .order_by(Assignment.assignment_id)
+        ):
+            course = found[assignment.course_id]
+            when = parse_when(assignment.deadline)
+            if when is not None:
+                events[course.course_id] += vevent(
+                    f"assignment-{assignment.assignment_id}",
+                    course.updated_at,
+                    f"{course.name}: {assignment.name} due",
+                    when,
+                )
+        return events
+
+    # Event lines of each course are cached under its version
+    events = await course_cache.fragments(
+        "ics", {course.course_id: course.version for course in courses}, build
+    )
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//PeachIDE//Course calendar//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:PeachIDE",
+        *(line for course in courses for line in events.get(course.course_id, [])),
+        "END:VCALENDAR",
+    ]
+    return Response(
+        "".join(fold(line) + "\r\n" for line in lines),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
@@ -1,39 +1,46 @@
 from fastapi import APIRouter, Depends, Body, Form, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.code_snippet import CodeSnippet
 from pyston import PystonClient, File
 from app.auth.middleware import get_current_user
 from app.models.user import User
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.ratelimit import RateLimiter, Limit
 
 router = APIRouter()
 
+# Each execution is a run on the Piston server
+execute_limiter = RateLimiter(
+    "execute_snippet", per_user=Limit(1, 5), global_limit=Limit(10, 20), queue=True, max_wait=10
+)
+
 
 @router.get("/snippet/{material_id}")
 async def get_code_snippet(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     code_snippets = (
-        db.query(CodeSnippet).filter(CodeSnippet.material_id == material_id).all()
-    )
+        await db.scalars(
+            select(CodeSnippet).where(CodeSnippet.material_id == material_id)
+        )
+    ).all()
     # 找出所有code_snippetes中user_id对应的user是老师的
     teacher_code_snippets = []
     for snippet in code_snippets:
-        user = db.query(User).filter(User.user_id == snippet.user_id).first()
+        user = await db.scalar(select(User).where(User.user_id == snippet.user_id))
         if user.is_teacher:
             teacher_code_snippets.append(snippet)
     current_user_code_snippets = []
     for snippet in teacher_code_snippets:
         # 搜索出 当前user的code_snippet中snippet_id与snippet.snippet_id相同的snippet
-        current_user_code_snippet = (
-            db.query(CodeSnippet)
-            .filter(
+        current_user_code_snippet = await db.scalar(
+            select(CodeSnippet).where(
                 CodeSnippet.snippet_id == snippet.snippet_id,
                 CodeSnippet.user_id == current_user.user_id,
             )
-            .first()
         )
         if current_user_code_snippet is None:
             current_user_code_snippets.append(snippet)
@@ -67,15 +74,13 @@ async def create_code_snippet(
     position_x: float = Form(None),
     position_y: float = Form(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    snippet = (
-        db.query(CodeSnippet)
-        .filter(
+    snippet = await db.scalar(
+        select(CodeSnippet).where(
             CodeSnippet.snippet_id == snippet_id,
             CodeSnippet.user_id == current_user.user_id,
         )
-        .first()
     )
     if snippet is None:
         snippet = CodeSnippet(
@@ -89,8 +94,8 @@ async def create_code_snippet(
             position_y=position_y,
         )
         db.add(snippet)
-        db.commit()
-        db.refresh(snippet)
+        await db.commit()
+        await db.refresh(snippet)
         return {
             "message": "Code snippet created successfully",
             "code_snippet": {
@@ -112,8 +117,8 @@ async def create_code_snippet(
             snippet.position_x = position_x
         if position_y is not None:
             snippet.position_y = position_y
-        db.commit()
-        db.refresh(snippet)
+        await db.commit()
+        await db.refresh(snippet)
         return {
             "message": "Code snippet updated successfully",
             "code_snippet": {
@@ -131,7 +136,7 @@ async def create_code_snippet(
 @router.delete("/teacher/{snippet_id}")
 async def delete_code_snippet(
     snippet_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.is_teacher:
@@ -139,33 +144,33 @@ async def delete_code_snippet(
             status_code=status.HTTP_403_FORBIDDEN, detail="Unauthorized"
         )
 
-    snippets = db.query(CodeSnippet).filter(CodeSnippet.snippet_id == snippet_id).all()
+    snippets = (
+        await db.scalars(select(CodeSnippet).where(CodeSnippet.snippet_id == snippet_id))
+    ).all()
     if snippets:
         for snippet in snippets:
-            db.delete(snippet)
-        db.commit()
+            await db.delete(snippet)
+        await db.commit()
         return {"message": "Code snippets deleted successfully"}
     else:
         return {"message": "Code snippet not found"}
 
 
-@router.post("/execute/snippet/{snippet_id}")
+@router.post("/execute/snippet/{snippet_id}", dependencies=[Depends(execute_limiter)])
 async def execute_code_snippet(
     snippet_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    own_snippet = (
-        db.query(CodeSnippet)
-        .filter(
+    own_snippet = await db.scalar(
+        select(CodeSnippet).where(
             CodeSnippet.snippet_id == snippet_id,
             CodeSnippet.user_id == current_user.user_id,
         )
-        .first()
     )
     if not own_snippet:
-        snippet = (
-            db.query(CodeSnippet).filter(CodeSnippet.snippet_id == snippet_id).first()
+        snippet = await db.scalar(
+            select(CodeSnippet).where(CodeSnippet.snippet_id == snippet_id)
         )
     else:
         snippet = own_snippet
@@ -1,6 +1,7 @@
 import uuid
 from fastapi import APIRouter, Depends, Body, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.comment import Comment
 from app.auth.middleware import get_current_user
 from app.models.user import User
@@ -12,13 +13,15 @@ router = APIRouter()
 @router.get("/comment/{comment_id}")
 async def get_comment(
     comment_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    comment = db.query(Comment).filter(Comment.comment_id == comment_id).first()
+    comment = await db.scalar(select(Comment).where(Comment.comment_id == comment_id))
     if comment is None:
         return {"error": "Comment not found"}
-    replies = db.query(Comment).filter(Comment.ancestor_id == comment_id).all()
+    replies = (
+        await db.scalars(select(Comment).where(Comment.ancestor_id == comment_id))
+    ).all()
     return {
         "message": "Comment retrieved successfully",
         "comment": {
@@ -49,7 +52,7 @@ async def create_comment(
     current_user: User = Depends(get_current_user),
     material_id: str = Form(...),
     page: int = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     comment = Comment(
         comment_id=str(uuid.uuid4()),
@@ -60,7 +63,7 @@ async def create_comment(
         ancestor_id=None,
     )
     db.add(comment)
-    db.commit()
+    await db.commit()
     return {"message": "Comment created successfully"}
 
 
@@ -72,15 +75,15 @@ async def reply_to_comment(
     material_id: str = Form(...),
     page: int = Form(...),
     ancestor_id: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    comment = db.query(Comment).filter(Comment.comment_id == comment_id).first()
+    comment = await db.scalar(select(Comment).where(Comment.comment_id == comment_id))
     if comment is None:
         return {"error": "Comment not found"}
-    ancestor = db.query(Comment).filter(Comment.comment_id == ancestor_id).first()
+    ancestor = await db.scalar(select(Comment).where(Comment.comment_id == ancestor_id))
     while ancestor.ancestor_id != None:
-        ancestor = (
-            db.query(Comment).filter(Comment.comment_id == ancestor.ancestor_id).first()
+        ancestor = await db.scalar(
+            select(Comment).where(Comment.comment_id == ancestor.ancestor_id)
         )
     db.add(
         Comment(
@@ -92,19 +95,19 @@ async def reply_to_comment(
             ancestor_id=ancestor.comment_id,
         )
     )
-    db.commit()
+    await db.commit()
     return {"message": "Reply added successfully"}
 
 
 @router.delete("/comment/{comment_id}")
 async def delete_comment(
     comment_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    comment = db.query(Comment).filter(Comment.comment_id == comment_id).first()
+    comment = await db.scalar(select(Comment).where(Comment.comment_id == comment_id))
     if comment is None:
         return {"error": "Comment not found"}
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await db.commit()
     return {"message": "comment deleted successfully"}
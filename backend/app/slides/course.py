@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, Form, status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.models.course import Course
+from app.models.course import Course, CourseMember
 from app.models.group import Group
 from app.models.section import Section
 from app.models.assignment import Assignment
+from app.models.material import Material
+from app.models.file import FileDB
 from app.auth.middleware import get_current_user
-from app.db import get_db
-from app.models.section import Section
+from app.db import get_db, get_read_db
+from app.membership import add_course_member
+from app.blobs import blob_url
+from app.course_cache import bump_course_versions, course_cache, user_course_versions
+from app.slides.assignment import starter_file
+from app.slides.material import material_file
 import uuid
 
 
@@ -16,29 +23,28 @@ router = APIRouter()
 
 @router.get("/courses")
 async def get_courses(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    courses = (
-        db.query(Course).filter(Course.course_id.in_(current_user.courses)).all()
-        if current_user.courses
-        else []
-    )
-    # Collect all teacher_ids from all courses
-    all_teacher_ids = set()
-    for course in courses:
-        if course.teacher_id:
-            all_teacher_ids.update(course.teacher_id)
-    teachers = (
-        db.query(User).filter(User.user_id.in_(all_teacher_ids)).all()
-        if all_teacher_ids
-        else []
-    )
-    teacher_id_to_name = {teacher.user_id: teacher.name for teacher in teachers}
-    return {
-        "message": "Courses retrieved successfully",
-        "courses": [
-            {
+    versions = await user_course_versions(db, current_user.user_id)
+
+    async def build(course_ids):
+        courses = (
+            await db.scalars(select(Course).where(Course.course_id.in_(course_ids)))
+        ).all()
+        # Teacher names of all those courses in one query
+        teachers_name = {course.course_id: [] for course in courses}
+        for course_id, name in await db.execute(
+            select(CourseMember.course_id, User.name)
+            .join(User, User.user_id == CourseMember.user_id)
+            .where(
+                CourseMember.course_id.in_(course_ids),
+                CourseMember.is_teacher == True,
+            )
+        ):
+            teachers_name[course_id].append(name)
+        return {
+            course.course_id: {
                 "course_id": course.course_id,
                 "name": course.name,
                 "number": course.number,
@@ -47,34 +53,42 @@ async def get_courses(
                 "group_num": course.group_num,
                 "people_per_group": course.people_per_group,
                 "group_deadline": course.group_deadline,
-                "teachers_name": [
-                    teacher_id_to_name.get(tid, "Unknown")
-                    for tid in (course.teacher_id or [])
-                ],
+                "teachers_name": teachers_name[course.course_id],
             }
             for course in courses
-        ],
+        }
+
+    summaries = await course_cache.fragments("summary", versions, build)
+    return {
+        "message": "Courses retrieved successfully",
+        "courses": [summaries[course_id] for course_id in versions if course_id in summaries],
     }
 
 
 @router.get("/course_info/{course_id}")
 async def get_course_info(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
+    if course is None:
+        return {"message": "Course not found"}
+    sections = {
+        section.section_id: section
+        for section in await db.scalars(
+            select(Section).where(Section.section_id.in_(course.sections or []))
+        )
+    }
     schedules = [
         {
             "date": schedule,
-            "section_name": section.name,
+            "section_name": sections[section_id].name,
         }
-        for section_id in course.sections
-        for section in db.query(Section).filter(Section.section_id == section_id)
-        for schedule in section.schedules
+        for section_id in course.sections or []
+        if section_id in sections
+        for schedule in sections[section_id].schedules or []
     ]
-    if course is None:
-        return {"message": "Course not found"}
     return {
         "message": "Course retrieved successfully",
         "course_id": course.course_id,
@@ -85,9 +99,143 @@ async def get_course_info(
     }
 
 
+@router.get("/course/{course_id}/outline")
+async def get_course_outline(
+    course_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Everything a course page shows, in six queries however large the course
+    row = (
+        await db.execute(
+            select(Course, CourseMember.user_id)
+            .outerjoin(
+                CourseMember,
+                and_(
+                    CourseMember.course_id == Course.course_id,
+                    CourseMember.user_id == current_user.user_id,
+                ),
+            )
+            .where(Course.course_id == course_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Course not found"
+        )
+    course, member = row
+    # The outline links to material blobs, which need no token
+    if member is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this course",
+        )
+
+    sections = (
+        await db.scalars(select(Section).where(Section.course_id == course_id))
+    ).all()
+    material_ids = {
+        material_id for section in sections for material_id in section.materials or []
+    }
+    materials = {
+        material.material_id: material
+        for material in await db.execute(
+            select(
+                Material.material_id,
+                Material.material_name,
+                Material.data_hash,
+                Material.data_size,
+                Material.data_mime,
+            ).where(Material.material_id.in_(material_ids))
+        )
+    }
+    assignments = (
+        await db.scalars(
+            select(Assignment).where(
+                Assignment.assignment_id.in_(course.assignments or [])
+            )
+        )
+    ).all()
+    file_ids = {file_id for assignment in assignments for file_id in assignment.files or []}
+    files = {
+        str(file.file_id): file
+        for file in await db.scalars(
+            select(FileDB).where(FileDB.file_id.in_(file_ids), FileDB.is_deleted == False)
+        )
+    }
+    teachers = (
+        await db.scalars(
+            select(User)
+            .join(CourseMember, CourseMember.user_id == User.user_id)
+            .where(CourseMember.course_id == course_id, CourseMember.is_teacher == True)
+        )
+    ).all()
+
+    return {
+        "message": "Course outline retrieved successfully",
+        "course_id": course.course_id,
+        "name": course.name,
+        "number": course.number,
+        "description": course.description,
+        "require_group": course.require_group,
+        "group_num": course.group_num,
+        "people_per_group": course.people_per_group,
+        "group_deadline": course.group_deadline,
+        "sections": [
+            {
+                "section_id": section.section_id,
+                "name": section.name,
+                "schedules": section.schedules,
+                "materials": [
+                    {
+                        "material_id": materials[material_id].material_id,
+                        "material_name": materials[material_id].material_name,
+                        **material_file(materials[material_id]),
+                    }
+                    for material_id in section.materials or []
+                    if material_id in materials
+                ],
+            }
+            for section in sections
+        ],
+        "schedules": [
+            {"date": schedule, "section_name": section.name}
+            for section in sections
+            for schedule in section.schedules or []
+        ],
+        "assignments": [
+            {
+                "assignment_id": assignment.assignment_id,
+                "is_group_assign": assignment.is_group_assign,
+                "name": assignment.name,
+                "teacher_id": assignment.teacher_id,
+                "deadline": assignment.deadline,
+                "is_over": assignment.is_over,
+                "description": assignment.description,
+                "files": [
+                    starter_file(files[file_id])
+                    for file_id in assignment.files or []
+                    if file_id in files
+                ],
+            }
+            for assignment in assignments
+        ],
+        "instructors": [
+            {
+                "user_id": teacher.user_id,
+                "name": teacher.name,
+                "photo": blob_url(teacher.photo_hash, "avatar"),
+                "office_hour": teacher.office_hour,
+                "office_place": teacher.office_place,
+            }
+            for teacher in teachers
+        ],
+    }
+
+
 @router.post("/course_info")
 async def create_course(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     course_id: str = Form(None),
     name: str = Form(None),
     description: str = Form(None),
@@ -104,7 +252,7 @@ async def create_course(
             detail="You are not authorized to create a course",
         )
 
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if course is None:
         course = Course(
             course_id=course_id,
@@ -115,22 +263,20 @@ async def create_course(
             group_num=group_num,
             people_per_group=people_per_group,
             group_deadline=group_deadline,
-            teacher_id=[current_user.user_id],
             sections=[],
             assignments=[],
         )
         db.add(course)
-        db.commit()
-        db.refresh(course)
-        current_user.courses = list(set(current_user.courses + [course_id]))
-        db.commit()
-        db.refresh(current_user)
+        await db.flush()
+        await add_course_member(db, course_id, current_user.user_id, is_teacher=True)
+        await db.commit()
+        await db.refresh(course)
         if require_group:
             for _ in range(group_num):
-                group = Group(group_id=str(uuid.uuid4()), course_id=course_id, users=[])
+                group = Group(group_id=str(uuid.uuid4()), course_id=course_id)
                 db.add(group)
-                db.commit()
-                db.refresh(group)
+                await db.commit()
+                await db.refresh(group)
         return {"message": "Course created successfully"}
     else:
         if name is not None:
@@ -146,30 +292,31 @@ async def create_course(
                         "message": "Group number is required when require_group is True"
                     }
                 for _ in range(group_num):
-                    group = Group(
-                        group_id=str(uuid.uuid4()), course_id=course_id, users=[]
-                    )
+                    group = Group(group_id=str(uuid.uuid4()), course_id=course_id)
                     db.add(group)
-                    db.commit()
-                    db.refresh(group)
+                    await db.commit()
+                    await db.refresh(group)
             elif course.require_group == True and require_group == False:
-                for group in course.groups:
-                    db.delete(group)
-                    db.commit()
-                    db.refresh(group)
+                groups = (
+                    await db.scalars(select(Group).where(Group.course_id == course_id))
+                ).all()
+                for group in groups:
+                    await db.delete(group)
+                await db.commit()
                 course.require_group = require_group
         if group_num is not None:
             course.group_num = group_num
         if people_per_group is not None:
             course.people_per_group = people_per_group
-        db.commit()
-        db.refresh(course)
+        await bump_course_versions(db, course_id)
+        await db.commit()
+        await db.refresh(course)
         return {"message": "Course updated successfully"}
 
 
 @router.post("/enroll")
 async def enroll_to_course(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     course_id: str = Form(None),
     user_id: str = Form(None),
@@ -180,70 +327,104 @@ async def enroll_to_course(
             detail="You are not authorized to enroll students",
         )
 
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if current_user.is_teacher == False:
         return {"message": "You are not a teacher"}
     if course is None:
         return {"message": "Course not found"}
-    member = db.query(User).filter(User.user_id == user_id).first()
+    member = await db.scalar(select(User).where(User.user_id == user_id))
     if member is None:
         return {"message": "Student or Teachers not found"}
-    member.courses = list(set(member.courses + [course_id]))
-    if member.is_teacher == True:
-        course.teacher_id = list(set(course.teacher_id + [member.user_id]))
-    db.commit()
-    db.refresh(member)
+    await add_course_member(db, course_id, member.user_id, is_teacher=member.is_teacher)
+    # Teacher names are part of the course summary
+    await bump_course_versions(db, course_id)
+    await db.commit()
     return {"message": "Student added to course successfully"}
 
 
 @router.get("/courses/calendar")
 async def get_calendar(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    courses = (
-        db.query(Course).filter(Course.course_id.in_(current_user.courses)).all()
-        if current_user.courses
-        else []
-    )
-    
-    return {
-        "message": "Calendar retrieved successfully",
-        "courses": [
-            {
+    versions = await user_course_versions(db, current_user.user_id)
+
+    async def build(course_ids):
+        courses = (
+            await db.scalars(select(Course).where(Course.course_id.in_(course_ids)))
+        ).all()
+        # Sections and assignments of all those courses, one query each
+        sections = {
+            str(section.section_id): section
+            for section in await db.scalars(
+                select(Section).where(
+                    Section.section_id.in_(
+                        {section_id for course in courses for section_id in course.sections or []}
+                    )
+                )
+            )
+        }
+        assignments = {
+            str(assignment.assignment_id): assignment
+            for assignment in await db.scalars(
+                select(Assignment).where(
+                    Assignment.assignment_id.in_(
+                        {
+                            assignment_id
+                            for course in courses
+                            for assignment_id in course.assignments or []
+                        }
+                    )
+                )
+            )
+        }
+        return {
+            course.course_id: {
                 "sections": [
-                    {"name": section.name, "schedules": section.schedules}
-                    for section in db.query(Section).filter(Section.section_id.in_(course.sections or [])).all()
+                    {
+                        "name": sections[section_id].name,
+                        "schedules": sections[section_id].schedules,
+                    }
+                    for section_id in course.sections or []
+                    if section_id in sections
                 ],
                 "course_name": course.name,
                 "assignments": [
-                    {"name": assignment.name, "deadline": assignment.deadline}
-                    for assignment in db.query(Assignment).filter(Assignment.assignment_id.in_(course.assignments or [])).all()
+                    {
+                        "name": assignments[assignment_id].name,
+                        "deadline": assignments[assignment_id].deadline,
+                    }
+                    for assignment_id in course.assignments or []
+                    if assignment_id in assignments
                 ],
             }
             for course in courses
-        ],
+        }
+
+    calendars = await course_cache.fragments("calendar", versions, build)
+    return {
+        "message": "Calendar retrieved successfully",
+        "courses": [calendars[course_id] for course_id in versions if course_id in calendars],
     }
 
 
 @router.get("/fetch_member/{course_id}")
 async def fetch_member(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
     if course is None:
         return {"message": "Course not found"}
-    teachers = (
-        db.query(User).filter(User.user_id.in_(course.teacher_id)).all()
-        if course.teacher_id
-        else []
-    )
-    students = db.query(User).filter(User.is_teacher == False).all()
-    enrolled_students = [
-        student for student in students if course_id in student.courses
-    ]
+    members = (
+        await db.scalars(
+            select(User)
+            .join(CourseMember, CourseMember.user_id == User.user_id)
+            .where(CourseMember.course_id == course_id)
+            .order_by(CourseMember.is_teacher.desc())
+        )
+    ).all()
     return {
         "message": "Members retrieved successfully",
         "users": [
@@ -252,10 +433,10 @@ async def fetch_member(
                 "name": user.name,
                 "email": user.email,
                 "is_teacher": user.is_teacher,
-                "photo": user.photo,
+                "photo": blob_url(user.photo_hash, "avatar"),
                 "office_hour": user.office_hour,
                 "office_place": user.office_place,
             }
-            for user in teachers + enrolled_students
+            for user in members
         ],
     }
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, Body, HTTPException, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.models.file import FileDB
 from app.auth.middleware import get_current_user
 from app.db import get_db
-import base64
+from app.blobs import blob_store, guess_mime
+from app.slides.upload import take_upload
 
 router = APIRouter()
 
@@ -13,24 +15,33 @@ async def create_file(
     file_name: str = Form(None),
     file_path: str = Form(None),
     file = File(None),
-    db: Session = Depends(get_db),
+    upload_id: str = Form(None),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    data = await file.read()
-    data = base64.b64encode(data).decode("utf-8")
+    if upload_id is not None:
+        upload = await take_upload(db, upload_id, current_user)
+        content_hash, size, content_mime = upload.content_hash, upload.size, upload.content_mime
+    elif file is not None:
+        head = await file.read(8)
+        content_hash, size = await blob_store.save_file(file)
+        content_mime = guess_mime(file_name, head)
+    else:
+        raise HTTPException(status_code=400, detail="No file uploaded")
     
     db_file = FileDB(
         file_name=file_name,
         file_path=file_path,
         file_type="pdf" if file_name.endswith(".pdf") else "code",
-        file_size=len(data),
-        content=data,
+        file_size=str(size),
+        content_hash=content_hash,
+        content_mime=content_mime,
         uploader_id=current_user.user_id
     )
     
     db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
+    await db.commit()
+    await db.refresh(db_file)
     return {
         "message": "File created successfully",
         "file_id": db_file.file_id,
@@ -40,10 +51,10 @@ async def create_file(
 @router.delete("/file/{file_id}")
 async def delete_file(
     file_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_file = db.query(FileDB).filter(FileDB.file_id == file_id).first()
+    db_file = await db.scalar(select(FileDB).where(FileDB.file_id == file_id))
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     if current_user.user_id != db_file.uploader_id:
@@ -51,8 +62,8 @@ async def delete_file(
             status_code=404, detail="No privilege for modifying the file."
         )
     db_file.is_deleted = True
-    db.commit()
-    db.refresh(db_file)
+    await db.commit()
+    await db.refresh(db_file)
     return db_file
 
 
@@ -61,10 +72,10 @@ async def update_file(
     file_id: str,
     file_name: str = Form(None),
     file_path: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_file = db.query(FileDB).filter(FileDB.file_id == file_id).first()
+    db_file = await db.scalar(select(FileDB).where(FileDB.file_id == file_id))
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     if current_user.user_id != db_file.uploader_id:
@@ -76,6 +87,6 @@ async def update_file(
         db_file.file_type = "pdf" if file_name.endswith(".pdf") else "code"
     if file_path:
         db_file.file_path = file_path
-    db.commit()
-    db.refresh(db_file)
+    await db.commit()
+    await db.refresh(db_file)
     return db_file
@@ -1,9 +1,17 @@
 from fastapi import APIRouter, Depends, Body, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.models.group import Group
+from app.models.group import Group, GroupMember
 from app.auth.middleware import get_current_user
 from app.db import get_db
+from app.blobs import blob_url
+from app.membership import (
+    add_group_member,
+    get_group_user_ids,
+    get_user_group_keys,
+    remove_group_member,
+)
 
 
 router = APIRouter()
@@ -12,16 +20,18 @@ router = APIRouter()
 @router.get("/group/{course_id}")
 async def get_group(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    groups = db.query(Group).filter(Group.course_id == course_id).all()
-    user_info = {}
-    for group in groups:
-        group_users = []
-        for user_id in group.users:
-            group_users.append(db.query(User).filter(User.user_id == user_id).first())
-        user_info[group.group_id] = group_users
+    groups = (await db.scalars(select(Group).where(Group.course_id == course_id))).all()
+    user_info = {group.group_id: [] for group in groups}
+    for group_id, user in await db.execute(
+        select(GroupMember.group_id, User)
+        .join(User, User.user_id == GroupMember.user_id)
+        .where(GroupMember.course_id == course_id)
+        .order_by(GroupMember.user_id)
+    ):
+        user_info[group_id].append(user)
     if groups is None:
         return {"message": "Group not found"}
     else:
@@ -31,8 +41,17 @@ async def get_group(
                 {
                     "group_id": group.group_id,
                     "course_id": group.course_id,
-                    "users": group.users,
-                    "user_info": user_info[group.group_id],
+                    "users": [user.user_id for user in user_info[group.group_id]],
+                    "user_info": [
+                        {
+                            "user_id": user.user_id,
+                            "name": user.name,
+                            "email": user.email,
+                            "is_teacher": user.is_teacher,
+                            "photo": blob_url(user.photo_hash, "avatar"),
+                        }
+                        for user in user_info[group.group_id]
+                    ],
                 }
                 for group in groups
             ],
@@ -44,21 +63,17 @@ async def get_group(
 async def delete_group(
     group_id: str,
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    group = db.query(Group).filter(Group.group_id == group_id).first()
+    group = await db.scalar(select(Group).where(Group.group_id == group_id))
     if group is None:
         return {"message": "Group not found"}
     else:
-        new_users = [user for user in group.users if user != user_id]
-        setattr(group, "users", new_users)
-        user = db.query(User).filter(User.user_id == user_id).first()
-        new_groups = [group for group in user.groups if group.split(":")[1] != group_id]
-        setattr(user, "groups", new_groups)
-        db.commit()
-        db.refresh(user)
-        db.refresh(group)
+        await remove_group_member(db, group_id, user_id)
+        await db.commit()
+        new_users = await get_group_user_ids(db, group_id)
+        new_groups = await get_user_group_keys(db, user_id)
         return {
             "message": "User deleted from group",
             "group_users": new_users,
@@ -70,24 +85,18 @@ async def delete_group(
 async def add_user_to_group(
     group_id: str,
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    group = db.query(Group).filter(Group.group_id == group_id).first()
+    group = await db.scalar(select(Group).where(Group.group_id == group_id))
     if group is None:
         return {"message": "Group not found"}
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if user is None:
         return {"message": "User not found"}
 
-    if user.user_id in group.users:
+    if not await add_group_member(db, group, user.user_id):
         return {"message": "User already in group"}
-
-    group.users = group.users + [user.user_id]
-    user.groups = user.groups + [f"{group.course_id}:{group.group_id}"]
-    db.commit()
-    db.refresh(user)
-    db.refresh(group)
-    print("USER", user.user_id, "GROUP", group.users)
+    await db.commit()
     return {"message": "User added to group"}
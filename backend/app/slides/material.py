@@ -1,57 +1,198 @@
-from fastapi import APIRouter, Depends, Body, File, Form, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Body, File, Form, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.material import Material
 from app.models.comment import Comment
 from app.auth.middleware import get_current_user
 from app.models.user import User
 from app.models.section import Section
+from app.models.course import CourseMember
 import base64
-from app.db import get_db
+import json
+import os
+import uuid
+from app.db import get_db, get_read_db
+from app.blobs import (
+    DIGEST,
+    PRIVATE_IMMUTABLE,
+    blob_response,
+    blob_store,
+    blob_url,
+    file_response,
+    guess_mime,
+)
+from app.slides.upload import take_upload
+from app.pages import THUMBNAIL_WIDTHS, material_processor, thumbnail_path
+from app.models.bookmarklist import BookmarkList
+from app.models.code_snippet import CodeSnippet
+from app.models.material_page import MaterialPage
+from app.models.pdf_index import PdfIndex
 
 
 router = APIRouter()
 
 
+def readable_by(user_id: str):
+    """Materials of the user's courses. Everything returning a blob URL or
+    bytes of a material checks it: blob URLs need no token to download."""
+    return Material.section_id.in_(
+        select(Section.section_id).where(
+            Section.course_id.in_(
+                select(CourseMember.course_id).where(CourseMember.user_id == user_id)
+            )
+        )
+    )
+
+
+def material_file(material: Material) -> dict:
+    return {
+        "url": blob_url(material.data_hash, material.material_name),
+        "size": material.data_size,
+        "mime": material.data_mime,
+    }
+
+
+def upload_mime(file, data: bytes) -> str:
+    if file.content_type and file.content_type != "application/octet-stream":
+        return file.content_type
+    return guess_mime(file.filename, data)
+
+
+async def store_upload(db: AsyncSession, file, upload_id: str | None, current_user: User):
+    """The hash, size and mime type of the PDF sent with the request, or of
+    the chunked upload ``upload_id``; None when there is neither."""
+    if upload_id is not None:
+        upload = await take_upload(db, upload_id, current_user)
+        return upload.content_hash, upload.size, upload.content_mime
+    if file is not None:
+        head = await file.read(8)
+        data_hash, data_size = await blob_store.save_file(file)
+        return data_hash, data_size, upload_mime(file, head)
+    return None
+
+
+# Columns each field of GET /materials needs; "data" is the PDF inline
+MATERIAL_FIELDS = {
+    "material_id": [Material.material_id],
+    "material_name": [Material.material_name],
+    "section_id": [Material.section_id],
+    "url": [Material.data_hash, Material.material_name],
+    "size": [Material.data_size],
+    "mime": [Material.data_mime],
+    "data": [Material.data_hash],
+}
+DEFAULT_MATERIAL_FIELDS = "material_id,material_name,section_id,url,size,mime"
+MATERIALS_PAGE_SIZE = 100
+MATERIALS_MAX_PAGE_SIZE = 1000
+
+
 @router.get("/materials")
 async def get_materials(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    section_id: str = None,
+    course_id: str = None,
+    cursor: str = None,
+    limit: int = Query(MATERIALS_PAGE_SIZE, ge=1, le=MATERIALS_MAX_PAGE_SIZE),
+    fields: str = DEFAULT_MATERIAL_FIELDS,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
 ):
-    materials = db.query(Material).all()
-    return {
-        "message": "Materials retrieved successfully",
-        "materials": [
-            {
-                "material_id": material.material_id,
-                "material_name": material.material_name,
-                "section_id": material.section_id,
-                "data": material.data,
-            }
-            for material in materials
-        ],
-    }
+    fields = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in MATERIAL_FIELDS]
+    if unknown or not fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested",
+        )
+    if cursor is not None:
+        try:
+            cursor = str(uuid.UUID(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+
+    # Keyset pagination on the primary key; material_id is always read for it
+    columns = {Material.material_id}
+    for field in fields:
+        columns.update(MATERIAL_FIELDS[field])
+    query = (
+        select(*columns)
+        .where(readable_by(current_user.user_id))
+        .order_by(Material.material_id)
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(Material.material_id > cursor)
+    if section_id is not None:
+        query = query.where(Material.section_id == section_id)
+    if course_id is not None:
+        query = query.join(Section, Section.section_id == Material.section_id).where(
+            Section.course_id == course_id
+        )
+    rows = (await db.execute(query)).all()
+    next_cursor = str(rows[limit].material_id) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    def value(row, field):
+        if field == "url":
+            return blob_url(row.data_hash, row.material_name)
+        if field == "size":
+            return row.data_size
+        if field == "mime":
+            return row.data_mime
+        return getattr(row, field)
+
+    # Written one material at a time, so at most one PDF is held when data
+    # is asked for
+    async def body():
+        yield (
+            '{"message": "Materials retrieved successfully", '
+            f'"next_cursor": {json.dumps(next_cursor)}, "materials": ['
+        )
+        for i, row in enumerate(rows):
+            item = {}
+            for field in fields:
+                if field == "data":
+                    item["data"] = base64.b64encode(
+                        await blob_store.load(row.data_hash)
+                    ).decode("utf-8")
+                else:
+                    item[field] = value(row, field)
+            yield ("," if i else "") + json.dumps(item, default=str)
+        yield "]}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
 
 @router.get("/material/{material_id}")
 async def get_material(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    material = db.query(Material).filter(Material.material_id == material_id).first()
+    material = await db.scalar(
+        select(Material).where(
+            Material.material_id == material_id, readable_by(current_user.user_id)
+        )
+    )
     if not material:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Material not found"
         )
     comments = (
-        db.query(Comment)
-        .filter(Comment.material_id == material_id, Comment.ancestor_id == None)
-        .all()
-    )
+        await db.scalars(
+            select(Comment).where(
+                Comment.material_id == material_id, Comment.ancestor_id == None
+            )
+        )
+    ).all()
     return {
         "message": "Material retrieved successfully",
         "material_id": material.material_id,
         "material_name": material.material_name,
         "section_id": material.section_id,
-        "data": material.data,
+        **material_file(material),
         "comments": [
             {
                 "comment_id": comment.comment_id,
@@ -66,64 +207,342 @@ async def get_material(
     }
 
 
+@router.get("/material/{material_id}/file")
+async def get_material_file(
+    material_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    material = (
+        await db.execute(
+            select(Material.data_hash, Material.data_mime, Material.material_name).where(
+                Material.material_id == material_id, readable_by(current_user.user_id)
+            )
+        )
+    ).first()
+    if not material:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Material not found"
+        )
+    return blob_response(
+        request, material.data_hash, material.data_mime, material.material_name
+    )
+
+
+async def get_page_index(db: AsyncSession, material_id: str, user_id: str):
+    row = (
+        await db.execute(
+            select(Material.data_hash, Material.data_mime, PdfIndex)
+            .outerjoin(PdfIndex, PdfIndex.data_hash == Material.data_hash)
+            .where(Material.material_id == material_id, readable_by(user_id))
+        )
+    ).first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Material not found"
+        )
+    if row.data_mime != "application/pdf":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Material is not a PDF"
+        )
+    index = row.PdfIndex
+    if index is None:
+        material_processor.submit(row.data_hash)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Pages are being prepared",
+            headers={"Retry-After": "5"},
+        )
+    if index.error is not None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Material could not be split into pages",
+        )
+    return index
+
+
+def page_info(index: PdfIndex, number: int, page: list) -> dict:
+    width, height, digest, size = page
+    return {
+        "page": number,
+        "width": width,
+        "height": height,
+        "url": blob_url(digest, f"page-{number}.pdf"),
+        "size": size,
+        # Keyed by content, so they can be cached for good
+        "thumbnails": {
+            str(thumbnail_width): f"/api/thumbnail/{index.data_hash}/{number}?width={thumbnail_width}"
+            for thumbnail_width in index.thumbnails or []
+            # Pages without an area are not rendered
+            if width > 0 and height > 0
+        },
+    }
+
+
+def page_of(index: PdfIndex, page: int) -> list:
+    if not 1 <= page <= index.page_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Page not found"
+        )
+    return index.pages[page - 1]
+
+
+@router.get("/material/{material_id}/pages")
+async def get_material_pages(
+    material_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    index = await get_page_index(db, material_id, current_user.user_id)
+    return {
+        "message": "Pages retrieved successfully",
+        "material_id": material_id,
+        "page_count": index.page_count,
+        "pages": [
+            page_info(index, number, page)
+            for number, page in enumerate(index.pages, start=1)
+        ],
+    }
+
+
+@router.get("/material/{material_id}/page/{page}")
+async def get_material_page(
+    material_id: str,
+    page: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    index = await get_page_index(db, material_id, current_user.user_id)
+    info = page_info(index, page, page_of(index, page))
+    comments = (
+        await db.scalars(
+            select(Comment).where(Comment.material_id == material_id, Comment.page == page)
+        )
+    ).all()
+    # Teachers' snippets, replaced by the user's own edit of them (as in
+    # GET /snippet/{material_id})
+    teacher_snippets, own_snippets = {}, {}
+    for snippet, is_teacher in (
+        await db.execute(
+            select(CodeSnippet, User.is_teacher)
+            .join(User, User.user_id == CodeSnippet.user_id)
+            .where(
+                CodeSnippet.material_id == material_id,
+                CodeSnippet.page == page,
+                (User.is_teacher == True) | (CodeSnippet.user_id == current_user.user_id),
+            )
+        )
+    ).all():
+        if snippet.user_id == current_user.user_id:
+            own_snippets[snippet.snippet_id] = snippet
+        if is_teacher:
+            teacher_snippets.setdefault(snippet.snippet_id, snippet)
+    snippets = [
+        own_snippets.get(snippet_id, snippet)
+        for snippet_id, snippet in teacher_snippets.items()
+    ]
+    marklists = (
+        await db.scalars(
+            select(BookmarkList).where(
+                BookmarkList.material_id == material_id,
+                BookmarkList.user_id == current_user.user_id,
+                BookmarkList.page == page,
+            )
+        )
+    ).all()
+    # None until extracted
+    page_text = await db.scalar(
+        select(MaterialPage.text).where(
+            MaterialPage.material_id == material_id,
+            MaterialPage.page == page,
+            MaterialPage.data_hash == index.data_hash,
+        )
+    )
+    return {
+        "message": "Page retrieved successfully",
+        "material_id": material_id,
+        "page_count": index.page_count,
+        **info,
+        "text": page_text,
+        "comments": [
+            {
+                "comment_id": comment.comment_id,
+                "content": comment.content,
+                "user_id": comment.user_id,
+                "material_id": comment.material_id,
+                "page": comment.page,
+                "ancestor_id": comment.ancestor_id,
+            }
+            for comment in comments
+        ],
+        "code_snippets": [
+            {
+                "snippet_id": snippet.snippet_id,
+                "user_id": snippet.user_id,
+                "material_id": snippet.material_id,
+                "lang": snippet.lang,
+                "page": snippet.page,
+                "content": snippet.content,
+                "position": {"x": snippet.position_x, "y": snippet.position_y},
+            }
+            for snippet in snippets
+        ],
+        "marklists": [
+            {
+                "list_id": marklist.list_id,
+                "material_id": marklist.material_id,
+                "user_id": marklist.user_id,
+                "page": marklist.page,
+                "bookmark_list": marklist.bookmark_list,
+            }
+            for marklist in marklists
+        ],
+    }
+
+
+@router.get("/material/{material_id}/page/{page}/file")
+async def get_material_page_file(
+    material_id: str,
+    page: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    index = await get_page_index(db, material_id, current_user.user_id)
+    _, _, digest, _ = page_of(index, page)
+    return blob_response(request, digest, "application/pdf")
+
+
+@router.get("/thumbnail/{data_hash}/{page}")
+async def get_thumbnail(
+    data_hash: str,
+    page: int,
+    request: Request,
+    width: int = THUMBNAIL_WIDTHS[0],
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Only for PDFs of materials the user can read
+    if (
+        width not in THUMBNAIL_WIDTHS
+        or not DIGEST.fullmatch(data_hash)
+        or not await db.scalar(
+            select(
+                exists().where(
+                    Material.data_hash == data_hash, readable_by(current_user.user_id)
+                )
+            )
+        )
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail not found"
+        )
+    path = thumbnail_path(data_hash, page, width)
+    if not os.path.exists(path):
+        index = (
+            await db.execute(
+                select(
+                    PdfIndex.page_count, PdfIndex.thumbnails, PdfIndex.thumbnail_error
+                ).where(PdfIndex.data_hash == data_hash)
+            )
+        ).first()
+        if (
+            index
+            and index.thumbnails is None
+            and index.thumbnail_error is None
+            and 1 <= page <= index.page_count
+        ):
+            material_processor.submit(data_hash)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Thumbnails are being rendered",
+                headers={"Retry-After": "5"},
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail not found"
+        )
+    return file_response(
+        request,
+        path,
+        f"{data_hash}-{page}-{width}",
+        "image/webp",
+        cache_control=PRIVATE_IMMUTABLE,
+    )
+
+
 @router.post("/material/{material_id}")
 async def update_material(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     material_name: str = Form(None),
     section_id: str = Form(None),
     file=File(None),
+    upload_id: str = Form(None),
     current_user: User = Depends(get_current_user),
 ):
-    material = db.query(Material).filter(Material.material_id == material_id).first()
+    material = await db.scalar(
+        select(Material).where(Material.material_id == material_id)
+    )
     if material is None:
-        section = db.query(Section).filter(Section.section_id == section_id).first()
+        section = await db.scalar(
+            select(Section).where(Section.section_id == section_id)
+        )
         if section is None:
             return {"message": "Section not found"}
         if material_id not in section.materials:
             section.materials = section.materials + [material_id]
         section.materials = list(set(section.materials))
-        data = await file.read()
-        data = base64.b64encode(data).decode("utf-8")
+        stored = await store_upload(db, file, upload_id, current_user)
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded"
+            )
+        data_hash, data_size, data_mime = stored
         db.add(
             Material(
                 material_id=material_id,
                 material_name=material_name,
                 section_id=section_id,
-                data=data,
+                data_hash=data_hash,
+                data_size=data_size,
+                data_mime=data_mime,
                 comments=[],
             )
         )
-        db.commit()
+        await db.commit()
+        if data_mime == "application/pdf":
+            material_processor.submit(data_hash)
         return {"message": "Material created successfully"}
     else:
         if material_name is not None:
             material.material_name = material_name
         if section_id is not None and section_id != material.section_id:
-            origin_section = (
-                db.query(Section)
-                .filter(Section.section_id == material.section_id)
-                .first()
+            origin_section = await db.scalar(
+                select(Section).where(Section.section_id == material.section_id)
             )
             if origin_section is not None:
                 new_materials = [material for material in origin_section.materials if material != material_id]
                 setattr(origin_section, "materials", new_materials)
-            new_section = (
-                db.query(Section).filter(Section.section_id == section_id).first()
+            new_section = await db.scalar(
+                select(Section).where(Section.section_id == section_id)
             )
             if new_section is not None:
                 new_section.materials = new_section.materials + [material_id]
             material.section_id = section_id
-        if data is not None:
-            material.data = data
-        db.commit()
-    db.refresh(material)
+        stored = await store_upload(db, file, upload_id, current_user)
+        if stored is not None:
+            material.data_hash, material.data_size, material.data_mime = stored
+        await db.commit()
+        if stored is not None and material.data_mime == "application/pdf":
+            material_processor.submit(material.data_hash)
+    await db.refresh(material)
     return {
         "message": "Material updated successfully",
         "material_id": material.material_id,
         "material_name": material.material_name,
         "section_id": material.section_id,
-        "data": material.data,
+        **material_file(material),
         "comments": [
             {
                 "comment_id": comment.comment_id,
@@ -141,20 +560,22 @@ async def update_material(
 @router.delete("/material/{material_id}")
 async def delete_material(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    material = db.query(Material).filter(Material.material_id == material_id).first()
+    material = await db.scalar(
+        select(Material).where(Material.material_id == material_id)
+    )
     if material is None:
         return {"message": "Material not found"}
-    section = (
-        db.query(Section).filter(Section.section_id == material.section_id).first()
+    section = await db.scalar(
+        select(Section).where(Section.section_id == material.section_id)
     )
     if section is not None and material_id in section.materials:
         new_materials = [material for material in section.materials if material != material_id]
         setattr(section, "materials", new_materials)
-        db.commit()
-        db.refresh(section)
-    db.delete(material)
-    db.commit()
+        await db.commit()
+        await db.refresh(section)
+    await db.delete(material)
+    await db.commit()
     return {"message": "Material deleted successfully"}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Body, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.note import Note
 from app.auth.middleware import get_current_user
 from app.models.user import User
@@ -12,16 +13,14 @@ router = APIRouter()
 @router.get("/note/{material_id}")
 async def get_note(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    note = (
-        db.query(Note)
-        .filter(
+    note = await db.scalar(
+        select(Note).where(
             Note.material_id == material_id,
             Note.user_id == current_user.user_id,
         )
-        .first()
     )
     return {
         "note_id": note.note_id if note else None,
@@ -37,15 +36,13 @@ async def create_note(
     current_user: User = Depends(get_current_user),
     material_id: str = Form(None),
     content: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    note = (
-        db.query(Note)
-        .filter(
+    note = await db.scalar(
+        select(Note).where(
             Note.note_id == note_id,
             Note.user_id == current_user.user_id,
         )
-        .first()
     )
     if note is None:
         note = Note(
@@ -55,8 +52,8 @@ async def create_note(
             content=content,
         )
         db.add(note)
-        db.commit()
-        db.refresh(note)
+        await db.commit()
+        await db.refresh(note)
         return {
             "message": "Note created successfully",
             "note_id": note.note_id,
@@ -73,8 +70,8 @@ async def create_note(
             note.material_id = material_id
         if content is not None:
             note.content = content
-        db.commit()
-        db.refresh(note)
+        await db.commit()
+        await db.refresh(note)
         return {
             "message": "Note updated successfully",
             "note_id": note.note_id,
@@ -87,17 +84,15 @@ async def create_note(
 @router.delete("/note/{note_id}")
 async def delete_note(
     note_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    note = (
-        db.query(Note)
-        .filter(Note.note_id == note_id, Note.user_id == current_user.user_id)
-        .first()
+    note = await db.scalar(
+        select(Note).where(Note.note_id == note_id, Note.user_id == current_user.user_id)
     )
     if note is None:
         return {"message": "Note not found"}
     else:
-        db.delete(note)
-        db.commit()
+        await db.delete(note)
+        await db.commit()
         return {"message": "Note deleted successfully"}
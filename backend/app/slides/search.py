@@ -0,0 +1,188 @@
+import os
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, exists, func, literal, null, or_, select, union_all, Integer, String
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from app.models.course import CourseMember
+from app.models.section import Section
+from app.models.material import Material
+from app.models.material_page import MaterialPage
+from app.models.note import Note
+from app.models.comment import Comment
+from app.models.code_snippet import CodeSnippet
+from app.auth.middleware import get_current_user
+from app.db import get_read_db
+
+
+router = APIRouter()
+
+# Must match the configuration the search_vector columns are generated with
+SEARCH_CONFIG = "english"
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5"
+# Every page ranks all hits before it again, so deep pages are not served
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+
+
+def matches(model, query):
+    return model.search_vector.bool_op("@@")(query)
+
+
+def hits(user_id: str, query, depth: int):
+    """The ``depth`` best ranked each of the pages, notes, comments and code
+    snippets the user can see that match ``query``, with their rank and text.
+    The first ``depth`` of them all are among these."""
+    courses = select(CourseMember.course_id).where(CourseMember.user_id == user_id)
+    sections = select(Section.section_id).where(Section.course_id.in_(courses))
+    materials = select(Material.material_id).where(Material.section_id.in_(sections))
+
+    def hit(kind: str, model, hit_id, page, text):
+        return select(
+            literal(kind).label("kind"),
+            hit_id.label("id"),
+            model.material_id.label("material_id"),
+            page.label("page"),
+            func.ts_rank(model.search_vector, query).label("rank"),
+            text.label("text"),
+        ).where(matches(model, query))
+
+    def best(branch):
+        # In the order the endpoint sorts by, kind being the same for all
+        hit = branch.selected_columns
+        return branch.order_by(
+            hit.rank.desc(), hit.material_id, hit.page, hit.id
+        ).limit(depth)
+
+    pages = hit(
+        "page", MaterialPage, null().cast(String), MaterialPage.page, MaterialPage.text
+    ).join(
+        Material,
+        and_(
+            Material.material_id == MaterialPage.material_id,
+            # Text of a file the material no longer has
+            Material.data_hash == MaterialPage.data_hash,
+        ),
+    ).where(Material.section_id.in_(sections))
+    # Notes are private
+    notes = hit(
+        "note", Note, Note.note_id.cast(String), null().cast(Integer), Note.content
+    ).where(Note.material_id.in_(materials), Note.user_id == user_id)
+    comments = hit(
+        "comment", Comment, Comment.comment_id.cast(String), Comment.page, Comment.content
+    ).where(Comment.material_id.in_(materials))
+    # The user's own snippets and teachers' ones the user has not edited, as
+    # in GET /snippet/{material_id}
+    own = aliased(CodeSnippet)
+    snippets = (
+        hit(
+            "code_snippet",
+            CodeSnippet,
+            CodeSnippet.snippet_id.cast(String),
+            CodeSnippet.page,
+            CodeSnippet.content,
+        )
+        .join(User, User.user_id == CodeSnippet.user_id)
+        .where(
+            CodeSnippet.material_id.in_(materials),
+            or_(
+                CodeSnippet.user_id == user_id,
+                and_(
+                    User.is_teacher == True,
+                    ~exists().where(
+                        own.snippet_id == CodeSnippet.snippet_id, own.user_id == user_id
+                    ),
+                ),
+            ),
+        )
+    )
+    # Each kind is ranked on its own, so Postgres keeps only the best
+    # ``depth`` of it while sorting instead of sorting all matches
+    return union_all(
+        *(best(branch) for branch in (pages, notes, comments, snippets))
+    ).subquery("hits")
+
+
+def search_statement(user_id: str, q: str, limit: int, offset: int):
+    """The hits ``offset`` to ``offset + limit``, and one more to tell whether
+    there is a next page, with where they are and a headline."""
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    found = hits(user_id, query, offset + limit + 1)
+    # Only the returned hits are highlighted, ts_headline is the slow part
+    ranked = (
+        select(found)
+        .order_by(
+            found.c.rank.desc(),
+            found.c.material_id,
+            found.c.page,
+            found.c.kind,
+            found.c.id,
+        )
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery("ranked")
+    )
+    return (
+        select(
+            ranked.c.kind,
+            ranked.c.id,
+            ranked.c.material_id,
+            ranked.c.page,
+            ranked.c.rank,
+            func.ts_headline(SEARCH_CONFIG, ranked.c.text, query, HEADLINE_OPTIONS),
+            Material.material_name,
+            Material.section_id,
+            Section.course_id,
+        )
+        .select_from(ranked)
+        .join(Material, Material.material_id == ranked.c.material_id)
+        .join(Section, Section.section_id == Material.section_id)
+        .order_by(
+            ranked.c.rank.desc(),
+            ranked.c.material_id,
+            ranked.c.page,
+            ranked.c.kind,
+            ranked.c.id,
+        )
+    )
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    rows = (
+        await db.execute(search_statement(current_user.user_id, q, limit, offset))
+    ).all()
+    return {
+        "message": "Search results retrieved successfully",
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "results": [
+            {
+                "kind": kind,
+                "id": hit_id,
+                "course_id": course_id,
+                "section_id": section_id,
+                "material_id": material_id,
+                "material_name": material_name,
+                "page": page_number,
+                "rank": rank,
+                "headline": headline,
+            }
+            for (
+                kind,
+                hit_id,
+                material_id,
+                page_number,
+                rank,
+                headline,
+                material_name,
+                section_id,
+                course_id,
+            ) in rows[:limit]
+        ],
+    }
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, Body, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.material import Material
 from app.models.user import User
 from app.models.course import Course
 from app.models.section import Section
 from app.auth.middleware import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.course_cache import bump_course_versions
+from app.slides.calendar import record_removal
 
 
 router = APIRouter()
@@ -14,10 +17,20 @@ router = APIRouter()
 @router.get("/sections/{course_id}")
 async def get_sections(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    sections = db.query(Section).filter(Section.course_id == course_id).all()
+    sections = (
+        await db.scalars(select(Section).where(Section.course_id == course_id))
+    ).all()
+    # The materials of every section in one query, grouped by section
+    materials = {}
+    for material in await db.execute(
+        select(Material.material_id, Material.material_name, Material.section_id).where(
+            Material.section_id.in_([section.section_id for section in sections])
+        )
+    ):
+        materials.setdefault(material.section_id, {})[material.material_id] = material
     return {
         "message": "Sections retrieved successfully",
         "sections": [
@@ -27,12 +40,11 @@ async def get_sections(
                 "schedules": section.schedules,
                 "materials": [
                     {
-                        "material_id": material.material_id,
-                        "material_name": material.material_name,
+                        "material_id": material_id,
+                        "material_name": materials[section.section_id][material_id].material_name,
                     }
-                    for material in db.query(Material)
-                    .filter(Material.material_id.in_(section.materials))
-                    .all()
+                    for material_id in section.materials or []
+                    if material_id in materials.get(section.section_id, {})
                 ],
             }
             for section in sections
@@ -42,14 +54,14 @@ async def get_sections(
 
 @router.post("/section")
 async def create_section(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     section_id: str = Form(None),
     course_id: str = Form(None),
     name: str = Form(None),
     schedules: list[str] = Form(None),
     current_user: User = Depends(get_current_user),
 ):
-    section = db.query(Section).filter(Section.section_id == section_id).first()
+    section = await db.scalar(select(Section).where(Section.section_id == section_id))
     if section is None:
         section = Section(
             section_id=section_id,
@@ -58,46 +70,55 @@ async def create_section(
             materials=[],
             schedules=schedules if schedules is not None else [],
         )
-        course = db.query(Course).filter(Course.course_id == course_id).first()
+        course = await db.scalar(select(Course).where(Course.course_id == course_id))
         if course is None:
             return {"message": "Course not found"}
         if section_id not in course.sections:
             course.sections = course.sections + [section_id]
         course.sections = list(set(course.sections))
         db.add(section)
-        db.commit()
-        db.refresh(section)
+        await bump_course_versions(db, course_id)
+        await db.commit()
+        await db.refresh(section)
         return {"message": "Section created successfully"}
     else:
+        await bump_course_versions(db, section.course_id, course_id)
         if course_id is not None and course_id != section.course_id:
-            origin_course = (
-                db.query(Course).filter(Course.course_id == section.course_id).first()
+            origin_course = await db.scalar(
+                select(Course).where(Course.course_id == section.course_id)
             )
             if origin_course is not None:
                 new_sections = [section for section in origin_course.sections if section != section_id]
                 setattr(origin_course, "sections", new_sections)
-            new_course = db.query(Course).filter(Course.course_id == course_id).first()
+            new_course = await db.scalar(
+                select(Course).where(Course.course_id == course_id)
+            )
             if new_course is not None:
                 new_course.sections = new_course.sections + [section_id]
+            await record_removal(db, "section", section_id, section.course_id)
             section.course_id = course_id
 
         if name is not None:
             section.name = name
         if schedules is not None:
             section.schedules = schedules
-        db.commit()
-        db.refresh(section)
+        if course_id is not None or name is not None or schedules is not None:
+            section.updated_at = func.now()
+        await db.commit()
+        await db.refresh(section)
         return {"message": "Section updated successfully"}
 
 
 @router.delete("/section/{section_id}")
 async def delete_section(
     section_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    section = db.query(Section).filter(Section.section_id == section_id).first()
+    section = await db.scalar(select(Section).where(Section.section_id == section_id))
     if section is None:
         return {"message": "Section not found"}
-    db.delete(section)
-    db.commit()
+    await db.delete(section)
+    await record_removal(db, "section", section_id, section.course_id)
+    await bump_course_versions(db, section.course_id)
+    await db.commit()
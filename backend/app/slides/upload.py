@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from app.models.upload import Upload
+from app.models.user import User
+from app.auth.middleware import get_current_user
+from app.db import get_db
+from app.uploads import (
+    UPLOAD_MAX_SIZE,
+    create_part,
+    finish_part,
+    receive_chunk,
+    received_bytes,
+    remove_part,
+    upload_hashes,
+)
+from datetime import datetime
+import uuid
+
+
+router = APIRouter()
+
+
+async def get_upload(db: AsyncSession, upload_id: str, current_user: User) -> Upload:
+    try:
+        upload = await db.scalar(
+            select(Upload).where(
+                Upload.upload_id == uuid.UUID(upload_id),
+                Upload.user_id == current_user.user_id,
+            )
+        )
+    except ValueError:
+        upload = None
+    if not upload:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    return upload
+
+
+async def take_upload(db: AsyncSession, upload_id: str, current_user: User) -> Upload:
+    """The finalized upload ``upload_id``, removed so it is attached once; the
+    removal commits with the caller's changes."""
+    upload = await get_upload(db, upload_id, current_user)
+    if upload.content_hash is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Upload is not finalized"
+        )
+    await db.delete(upload)
+    return upload
+
+
+def upload_response(message: str, upload: Upload, offset: int) -> dict:
+    return {
+        "message": message,
+        "upload_id": str(upload.upload_id),
+        "file_name": upload.file_name,
+        "size": upload.size,
+        "offset": offset,
+        "finalized": upload.content_hash is not None,
+        "hash": upload.content_hash,
+        "mime": upload.content_mime,
+    }
+
+
+@router.post("/upload")
+async def create_upload(
+    file_name: str = Form(...),
+    size: int = Form(..., ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if size > UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Uploads are limited to {UPLOAD_MAX_SIZE} bytes",
+        )
+    upload = Upload(
+        upload_id=uuid.uuid4(),
+        user_id=current_user.user_id,
+        file_name=file_name,
+        size=size,
+        created_at=datetime.now(),
+    )
+    await run_in_threadpool(create_part, upload.upload_id)
+    db.add(upload)
+    await db.commit()
+    return upload_response("Upload created successfully", upload, 0)
+
+
+@router.get("/upload/{upload_id}")
+async def get_upload_status(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    offset = upload.size if upload.content_hash else received_bytes(upload.upload_id)
+    return upload_response("Upload retrieved successfully", upload, offset)
+
+
+@router.put("/upload/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    if upload.content_hash is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Upload is already finalized"
+        )
+    # A chunk can take minutes to arrive; don't hold a connection meanwhile
+    await db.close()
+    try:
+        offset = await receive_chunk(upload.upload_id, offset, upload.size, request.stream())
+    except ClientDisconnect:
+        # What arrived is kept; the client resumes from GET /upload/{upload_id}
+        return None
+    return upload_response("Chunk received successfully", upload, offset)
+
+
+@router.post("/upload/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    sha256: str = Form(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    if upload.content_hash is None:
+        upload.content_hash, upload.content_mime = await run_in_threadpool(
+            finish_part, upload.upload_id, upload.size, upload.file_name, sha256
+        )
+        await db.commit()
+    elif upload.content_hash != sha256.lower():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Checksum mismatch"
+        )
+    return upload_response("Upload finalized successfully", upload, upload.size)
+
+
+@router.delete("/upload/{upload_id}")
+async def delete_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    await db.delete(upload)
+    await db.commit()
+    await run_in_threadpool(remove_part, upload.upload_id)
+    upload_hashes.discard(upload.upload_id)
+    return {"message": "Upload deleted successfully"}
@@ -1,23 +1,33 @@
-from fastapi import APIRouter, Depends, Form, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.models.course import Course
+from app.models.course import CourseMember
 from app.auth.middleware import get_current_user
+from app.auth.cache import notify_user_changed
 from app.db import get_db
-import base64
+from app.blobs import blob_store, blob_url
+import os
 
 
 router = APIRouter()
 
+USER_PHOTO_MAX_SIZE = int(os.getenv("USER_PHOTO_MAX_SIZE", str(5 * 1024 * 1024)))
+
 
 @router.get("/instructors/{course_id}")
 async def get_instructors(
     course_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
-    teachers = db.query(User).filter(User.user_id.in_(course.teacher_id)).all()
+    teachers = (
+        await db.scalars(
+            select(User)
+            .join(CourseMember, CourseMember.user_id == User.user_id)
+            .where(CourseMember.course_id == course_id, CourseMember.is_teacher == True)
+        )
+    ).all()
     if not teachers:
         return {"message": "No instructors found for this course."}
     instructors = []
@@ -25,7 +35,7 @@ async def get_instructors(
         instructors.append(
             {
                 "name": teacher.name,
-                "photo": teacher.photo,
+                "photo": blob_url(teacher.photo_hash, "avatar"),
                 "office_hour": teacher.office_hour,
                 "office_place": teacher.office_place,
             }
@@ -36,10 +46,10 @@ async def get_instructors(
 @router.get("/search_user/{name}")
 async def search_user(
     name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    users = db.query(User).filter(User.name.like(f"%{name}%")).all()
+    users = (await db.scalars(select(User).where(User.name.like(f"%{name}%")))).all()
     if not users:
         return {"message": "No user found."}
     return {
@@ -58,12 +68,12 @@ async def search_user(
 async def modify_user(
     user_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     office_hour: str = Form(None),
     office_place: str = Form(None),
     photo: UploadFile = Form(None),
 ):
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if user.user_id != current_user.user_id:
         return {"message": "You are not allowed to modify this user."}
     if office_hour:
@@ -71,7 +81,13 @@ async def modify_user(
     if office_place:
         user.office_place = office_place
     if photo:
-        # convert to base64
-        user.photo = base64.b64encode(photo.file.read()).decode("utf-8")
-    db.commit()
+        # Only avatar sized images are accepted
+        if photo.size is not None and photo.size > USER_PHOTO_MAX_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Photos are limited to {USER_PHOTO_MAX_SIZE} bytes",
+            )
+        user.photo_hash, _ = await blob_store.save_file(photo)
+    await notify_user_changed(db, user.user_id)
+    await db.commit()
     return {"message": "User modified successfully"}
@@ -0,0 +1,231 @@
+"""Chunked, resumable uploads.
+
+A client opens an upload with the file's name and size, PUTs the bytes in
+chunks at increasing offsets, and finalizes it with the SHA-256 of the whole
+file. After a dropped connection it asks for the offset received so far and
+carries on from there. Chunks are appended to a part file under
+``UPLOAD_PATH`` and hashed as they arrive; finalizing moves the part file
+into the blob store, after which the upload can be attached to a material or
+a file by its id.
+"""
+
+import fcntl
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+
+from app.blobs import CHUNK_SIZE, blob_store, guess_mime
+from app.models.upload import Upload
+
+# Must be on the same filesystem as BLOB_STORE_PATH, finished uploads are
+# renamed into it
+UPLOAD_PATH = os.getenv("UPLOAD_PATH", "data/uploads")
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(2 * 1024**3)))
+# Uploads not finished and attached within this many seconds are dropped
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", "86400"))
+GENERATION_SUFFIX = ".generation"
+
+
+def part_path(upload_id) -> str:
+    return os.path.join(UPLOAD_PATH, str(upload_id))
+
+
+def create_part(upload_id):
+    os.makedirs(UPLOAD_PATH, exist_ok=True)
+    open(part_path(upload_id), "xb").close()
+
+
+def generation_path(upload_id) -> str:
+    return part_path(upload_id) + GENERATION_SUFFIX
+
+
+def remove_part(upload_id):
+    for path in (part_path(upload_id), generation_path(upload_id)):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def part_generation(upload_id) -> int:
+    """How many times the part file started over. Hash states of an earlier
+    generation describe bytes that are gone, whatever their offset."""
+    try:
+        with open(generation_path(upload_id)) as f:
+            return int(f.read())
+    except FileNotFoundError:
+        return 0
+
+
+def restart_part(upload_id, f):
+    """Empties the part file; the caller holds its lock."""
+    # The new generation is in place before any byte is dropped, so no worker
+    # can resume a state of the old bytes
+    tmp = generation_path(upload_id) + ".tmp"
+    with open(tmp, "w") as g:
+        g.write(str(part_generation(upload_id) + 1))
+    os.replace(tmp, generation_path(upload_id))
+    f.truncate(0)
+
+
+def open_part(upload_id):
+    """Opens the part file, locked against chunks of the same upload arriving
+    at another worker."""
+    try:
+        f = open(part_path(upload_id), "r+b")
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another chunk of this upload is being received",
+        )
+    return f
+
+
+class UploadHashes:
+    """SHA-256 state of the uploads this worker is receiving, so every byte is
+    hashed once, as it arrives. When earlier chunks went to another worker
+    (or this one forgot them) the state is rebuilt from the part file. States
+    are kept with the generation of the part file they were taken from, so
+    one left over from before a restart is never resumed."""
+
+    def __init__(self, size: int = 1000):
+        self.size = size
+        self.states = OrderedDict()
+
+    def take(self, upload_id, generation: int, f, offset: int):
+        state = self.states.pop(upload_id, None)
+        if state is not None and state[:2] == (generation, offset):
+            return state[2]
+        sha = hashlib.sha256()
+        f.seek(0)
+        remaining = offset
+        while remaining:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            sha.update(chunk)
+            remaining -= len(chunk)
+        return sha
+
+    def keep(self, upload_id, generation: int, offset: int, sha):
+        self.states[upload_id] = (generation, offset, sha)
+        while len(self.states) > self.size:
+            self.states.popitem(last=False)
+
+    def discard(self, upload_id):
+        self.states.pop(upload_id, None)
+
+
+upload_hashes = UploadHashes()
+
+
+def append(f, sha, data: bytes):
+    f.write(data)
+    sha.update(data)
+
+
+async def receive_chunk(upload_id, offset: int, size: int, chunks) -> int:
+    """Appends the body ``chunks`` to the part file at ``offset``, which must
+    be where the upload stopped, and returns the new offset. Everything that
+    arrived is kept when the client disconnects midway."""
+    f = await run_in_threadpool(open_part, upload_id)
+    try:
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is at offset {received}",
+                headers={"Upload-Offset": str(received)},
+            )
+        generation = await run_in_threadpool(part_generation, upload_id)
+        sha = await run_in_threadpool(upload_hashes.take, upload_id, generation, f, offset)
+        f.seek(offset)
+        buffer = bytearray()
+        try:
+            async for chunk in chunks:
+                if offset + len(buffer) + len(chunk) > size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Chunk goes past the declared size",
+                    )
+                buffer += chunk
+                if len(buffer) >= CHUNK_SIZE:
+                    await run_in_threadpool(append, f, sha, bytes(buffer))
+                    offset += len(buffer)
+                    buffer.clear()
+        finally:
+            if buffer:
+                await run_in_threadpool(append, f, sha, bytes(buffer))
+                offset += len(buffer)
+            upload_hashes.keep(upload_id, generation, offset, sha)
+    finally:
+        await run_in_threadpool(f.close)
+    return offset
+
+
+def received_bytes(upload_id) -> int:
+    try:
+        return os.path.getsize(part_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def finish_part(upload_id, size: int, file_name: str, checksum: str) -> tuple[str, str]:
+    """Checks the complete part file against ``checksum`` and moves it into
+    the blob store; returns its hash and mime type."""
+    with open_part(upload_id) as f:
+        received = os.fstat(f.fileno()).st_size
+        if received != size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is at offset {received} of {size}",
+                headers={"Upload-Offset": str(received)},
+            )
+        digest = upload_hashes.take(upload_id, part_generation(upload_id), f, size).hexdigest()
+        upload_hashes.discard(upload_id)
+        if digest != checksum.lower():
+            # Some chunk was corrupted; there is no telling which
+            restart_part(upload_id, f)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Checksum mismatch, upload again from offset 0",
+                headers={"Upload-Offset": "0"},
+            )
+        f.seek(0)
+        mime = guess_mime(file_name, f.read(8))
+        blob_store.adopt(part_path(upload_id), digest)
+    remove_part(upload_id)
+    return digest, mime
+
+
+def expire_uploads(engine, ttl: float = UPLOAD_TTL) -> int:
+    """Drops uploads older than ``ttl`` seconds and part files with no upload;
+    their blobs, if finalized, are left to the blob GC."""
+    with engine.begin() as conn:
+        expired = conn.execute(
+            delete(Upload)
+            .where(Upload.created_at < datetime.now() - timedelta(seconds=ttl))
+            .returning(Upload.upload_id)
+        ).scalars().all()
+        live = {str(upload_id) for upload_id in conn.execute(select(Upload.upload_id)).scalars()}
+    for upload_id in expired:
+        remove_part(upload_id)
+    # Left behind by an init whose row was never committed
+    cutoff = time.time() - ttl
+    if os.path.isdir(UPLOAD_PATH):
+        for name in os.listdir(UPLOAD_PATH):
+            upload_id = name.removesuffix(GENERATION_SUFFIX)
+            if upload_id not in live and os.stat(os.path.join(UPLOAD_PATH, name)).st_mtime < cutoff:
+                remove_part(upload_id)
+    return len(expired)
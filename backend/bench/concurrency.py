@@ -0,0 +1,104 @@
+"""Concurrent-request throughput of a single worker.
+
+Two modes:
+
+* ``inprocess`` (default) mounts two handlers on one event loop and drives them
+  with the same load. ``/blocking`` runs a query through the synchronous
+  ``SessionLocal`` inside ``async def`` (what every route did before the async
+  migration), ``/async`` awaits the same query on ``AsyncSessionLocal``.
+* ``url`` fires the load at a running server, e.g. one uvicorn worker started
+  with ``uvicorn app.main:app --workers 1``, so the real routes can be
+  compared across commits.
+
+    python -m bench.concurrency --concurrency 50 --requests 500
+    python -m bench.concurrency --mode url --url http://localhost:5000/api/courses --token <jwt>
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.db import SessionLocal, AsyncSessionLocal
+
+
+def build_app(delay: float) -> FastAPI:
+    app = FastAPI()
+    query = text("SELECT pg_sleep(:delay)")
+
+    @app.get("/blocking")
+    async def blocking():
+        with SessionLocal() as db:
+            db.execute(query, {"delay": delay})
+        return {}
+
+    @app.get("/async")
+    async def non_blocking():
+        async with AsyncSessionLocal() as db:
+            await db.execute(query, {"delay": delay})
+        return {}
+
+    return app
+
+
+async def run_load(client: httpx.AsyncClient, url: str, total: int, concurrency: int, headers=None):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return elapsed, sorted(latencies)
+
+
+def report(label: str, total: int, elapsed: float, latencies: list[float]):
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f"{label:<10} {total / elapsed:>9.1f} req/s   p50 {p50:>8.1f} ms   p99 {p99:>8.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "url"], default="inprocess")
+    parser.add_argument("--url", help="endpoint to load in url mode")
+    parser.add_argument("--token", help="bearer token for url mode")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--delay", type=float, default=0.02, help="simulated query time in seconds"
+    )
+    args = parser.parse_args()
+
+    if args.mode == "url":
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+        async with httpx.AsyncClient(timeout=None) as client:
+            elapsed, latencies = await run_load(
+                client, args.url, args.requests, args.concurrency, headers
+            )
+        report("server", args.requests, elapsed, latencies)
+        return
+
+    transport = httpx.ASGITransport(app=build_app(args.delay))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label in ("blocking", "async"):
+            elapsed, latencies = await run_load(
+                client, f"/{label}", args.requests, args.concurrency
+            )
+            report(label, args.requests, elapsed, latencies)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
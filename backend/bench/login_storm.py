@@ -0,0 +1,123 @@
+"""Login latency when a whole class logs in at once.
+
+Two modes:
+
+* ``inprocess`` (default) mounts two login-like handlers on one event loop,
+  each checking a password against a stored bcrypt hash. ``/inline`` calls
+  bcrypt on the event loop (what ``/login`` did before), ``/offloaded`` awaits
+  ``app.auth.hashing.password_hasher``. No database is involved.
+* ``url`` posts to the ``/api/login`` of a running server, e.g.
+  ``uvicorn app.main:app --workers 4``, with the credentials of an existing user.
+
+All logins are sent at once and latencies are measured from that moment, as
+users would see them. In-process, a probe also requests a cheap endpoint
+every 10 ms during the storm: its latency is what everyone else on the worker
+sees while bcrypt runs.
+
+    python -m bench.login_storm --concurrency 500
+    python -m bench.login_storm --mode url --url http://localhost:5000/api/login --user alice --password secret
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.auth.hashing import password_hasher, pwd_context, AUTH_BCRYPT_ROUNDS
+from bench.concurrency import report
+
+PASSWORD = "password"
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    hashed = pwd_context.hash(PASSWORD)
+
+    @app.post("/inline")
+    async def inline(body: dict):
+        if not pwd_context.verify(body["password"], hashed):
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.post("/offloaded")
+    async def offloaded(body: dict):
+        valid, _ = await password_hasher.verify(body["password"], hashed)
+        if not valid:
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return app
+
+
+async def storm(client: httpx.AsyncClient, url: str, total: int, json: dict):
+    start = time.perf_counter()
+    latencies = []
+
+    async def one():
+        response = await client.post(url, json=json)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+async def probe(client: httpx.AsyncClient, done: asyncio.Event) -> list[float]:
+    # Measured from when the request was due, so time the loop spent blocked
+    # before it could even send it counts too
+    latencies = []
+    while not done.is_set():
+        due = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        await client.get("/ping")
+        latencies.append(time.perf_counter() - due)
+    return sorted(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "url"], default="inprocess")
+    parser.add_argument("--url", help="login endpoint to load in url mode")
+    parser.add_argument("--user", help="user_id to log in as in url mode")
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=500, help="simultaneous logins")
+    args = parser.parse_args()
+    total = args.concurrency
+
+    if args.mode == "url":
+        limits = httpx.Limits(max_connections=total)
+        async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+            elapsed, latencies = await storm(
+                client, args.url, total, {"name": args.user, "password": args.password}
+            )
+        report("server", total, elapsed, latencies)
+        return
+
+    print(f"bcrypt rounds {AUTH_BCRYPT_ROUNDS}, {password_hasher.workers} hashing threads")
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label in ("inline", "offloaded"):
+            done = asyncio.Event()
+            probing = asyncio.create_task(probe(client, done))
+            elapsed, latencies = await storm(
+                client, f"/{label}", total, {"password": args.password}
+            )
+            done.set()
+            pings = await probing
+            report(label, total, elapsed, latencies)
+            print(
+                f"  probe    {len(pings):>5} pings   p50 {statistics.median(pings) * 1000:>8.1f} ms"
+                f"   max {pings[-1] * 1000:>8.1f} ms"
+            )
+    print(f"max queued {password_hasher.max_queued}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+"""Latency of GET /api/search on a synthetic corpus.
+
+Seeds ``--materials`` materials spread over ``--courses`` courses, each with
+``--pages`` pages of text drawn from a Zipf-like vocabulary plus a comment,
+a note and a code snippet, enrolls a fresh user in all of them, and times
+searches for words of every frequency through the real app. Exits non-zero
+when a p99 is over ``--target-ms``, after printing the plan of a search for
+the most common words. The corpus (not the user) is deleted afterwards unless
+``--keep`` is given. Needs the migrated database the app is configured with.
+
+    python -m bench.search --materials 10000 --queries 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import string
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, insert
+
+from app.db import engine
+from app.main import app
+from app.models.code_snippet import CodeSnippet
+from app.models.comment import Comment
+from app.models.course import Course, CourseMember
+from app.models.material import Material
+from app.models.material_page import MaterialPage
+from app.models.note import Note
+from app.models.section import Section
+from app.slides.search import search_statement
+from bench.concurrency import report
+
+_vocabulary = random.Random(0)
+VOCABULARY = [
+    "".join(_vocabulary.choices(string.ascii_lowercase, k=_vocabulary.randint(4, 10)))
+    for _ in range(5000)
+]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+BATCH = 1000
+
+
+def words(count: int) -> str:
+    return " ".join(random.choices(VOCABULARY, weights=WEIGHTS, k=count))
+
+
+def seed(user_id: str, courses: int, materials: int, pages: int) -> list[str]:
+    course_ids = [str(uuid.uuid4()) for _ in range(courses)]
+    section_ids = [str(uuid.uuid4()) for _ in range(courses)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Course),
+            [{"course_id": c, "name": "bench", "description": "bench"} for c in course_ids],
+        )
+        conn.execute(
+            insert(CourseMember),
+            [{"course_id": c, "user_id": user_id, "is_teacher": True} for c in course_ids],
+        )
+        conn.execute(
+            insert(Section),
+            [
+                {"section_id": s, "course_id": c, "name": "bench"}
+                for s, c in zip(section_ids, course_ids)
+            ],
+        )
+        for start in range(0, materials, BATCH):
+            rows, page_rows, notes, comments, snippets = [], [], [], [], []
+            for i in range(start, min(start + BATCH, materials)):
+                material_id = str(uuid.uuid4())
+                data_hash = hashlib.sha256(material_id.encode()).hexdigest()
+                rows.append(
+                    {
+                        "material_id": material_id,
+                        "material_name": f"bench{i}.pdf",
+                        "section_id": section_ids[i % courses],
+                        "data_hash": data_hash,
+                        "data_size": 0,
+                        "data_mime": "application/pdf",
+                    }
+                )
+                page_rows += [
+                    {"material_id": material_id, "page": page, "data_hash": data_hash, "text": words(300)}
+                    for page in range(1, pages + 1)
+                ]
+                common = {"user_id": user_id, "material_id": material_id, "content": words(20)}
+                notes.append({"note_id": str(uuid.uuid4()), **common})
+                comments.append({"comment_id": str(uuid.uuid4()), "page": 1, **common})
+                snippets.append(
+                    {
+                        "snippet_id": str(uuid.uuid4()),
+                        "lang": "python",
+                        "page": 1,
+                        "position_x": 0,
+                        "position_y": 0,
+                        **common,
+                    }
+                )
+            conn.execute(insert(Material), rows)
+            conn.execute(insert(MaterialPage), page_rows)
+            conn.execute(insert(Note), notes)
+            conn.execute(insert(Comment), comments)
+            conn.execute(insert(CodeSnippet), snippets)
+        conn.exec_driver_sql("ANALYZE material_pages, notes, comments, code_snippets")
+    return course_ids
+
+
+def explain(user_id: str, q: str) -> str:
+    statement = search_statement(user_id, q, 20, 0).compile(engine)
+    with engine.connect() as conn:
+        return "\n".join(
+            conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS) {statement}", statement.params
+            ).scalars()
+        )
+
+
+def clean(course_ids: list[str]):
+    with engine.begin() as conn:
+        # Materials, pages, notes, comments and snippets cascade from these
+        conn.execute(delete(Course).where(Course.course_id.in_(course_ids)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--materials", type=int, default=10000)
+    parser.add_argument("--pages", type=int, default=5, help="pages per material")
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="leave the corpus in place")
+    parser.add_argument("--target-ms", type=float, default=50, help="p99 to stay under")
+    args = parser.parse_args()
+
+    user_id = f"bench{uuid.uuid4().hex[:8]}"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post(
+            "/api/register",
+            json={
+                "user_id": user_id,
+                "name": "Bench",
+                "password": "password",
+                "email": f"{user_id}@bench.invalid",
+                "is_teacher": True,
+            },
+        )
+        response.raise_for_status()
+        start = time.perf_counter()
+        course_ids = seed(user_id, args.courses, args.materials, args.pages)
+        print(f"seeded {args.materials} materials in {time.perf_counter() - start:.1f} s")
+        try:
+            token = (
+                await client.post("/api/login", json={"name": user_id, "password": "password"})
+            ).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            slow = []
+            # From the most common words, which match most pages, to rare ones
+            for label, pool in (
+                ("common", VOCABULARY[:10]),
+                ("medium", VOCABULARY[100:1000]),
+                ("rare", VOCABULARY[-1000:]),
+            ):
+                latencies = []
+                elapsed = time.perf_counter()
+                for _ in range(args.queries):
+                    q = " ".join(random.sample(pool, 2))
+                    sent = time.perf_counter()
+                    response = await client.get("/api/search", params={"q": q}, headers=headers)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - sent)
+                latencies.sort()
+                report(label, args.queries, time.perf_counter() - elapsed, latencies)
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                if p99 > args.target_ms:
+                    slow.append(label)
+            print(explain(user_id, " ".join(VOCABULARY[:2])))
+        finally:
+            if not args.keep:
+                clean(course_ids)
+    if slow:
+        sys.exit(f"p99 over {args.target_ms:g} ms for {', '.join(slow)} words")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,8 @@
 
 python3 -m pytest && rm -rf test .pytest_cache
 
+python3 -m app.migrate || exit 1
+
 uvicorn app.main:app --host 0.0.0.0 --port 5000 --workers 4
 
 echo $?
\ No newline at end of file
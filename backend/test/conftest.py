@@ -0,0 +1,72 @@
+import os
+import random
+import string
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# TestClient runs every request on a new event loop, which pooled asyncpg
+# connections cannot follow.
+os.environ.setdefault("DB_NULL_POOL", "1")
+
+
+def generate_random_string(length=8):
+    """Generate a random string of specified length"""
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def register_and_login(client, is_teacher, name="Test User"):
+    """Registers a new user and logs them in; returns the user id and the
+    headers authenticating as them."""
+    user_id = f"t{generate_random_string(10)}"
+    client.post(
+        "/api/register",
+        json={
+            "user_id": user_id,
+            "name": name,
+            "password": "password",
+            "email": f"{user_id}@gmail.com",
+            "is_teacher": is_teacher,
+        },
+    )
+    token = client.post(
+        "/api/login", json={"name": user_id, "password": "password"}
+    ).json()["token"]
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def captured_statements():
+    """Collects the SQL of every statement the app runs inside the block."""
+    from app.db import async_engine
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def reset_database():
+    """Drops every table and builds the schema again through the migrations."""
+    from app.db import Base, engine
+    from app.migrate import upgrade_database
+
+    Base.metadata.reflect(bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    upgrade_database()
+
+
+@pytest.fixture(scope="session")
+def database():
+    """A freshly migrated schema, built once per run. Modules talking to the
+    database opt in with pytestmark = pytest.mark.usefixtures("database"),
+    so the rest run without Postgres."""
+    reset_database()
+    yield
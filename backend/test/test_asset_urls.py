@@ -0,0 +1,100 @@
+import io
+import os
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.main import app
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_assets_are_served_by_content_hash():
+    user_id, headers = register_and_login(client, is_teacher=True)
+
+    # Avatars
+    avatar = png("red")
+    client.post(
+        f"/api/user/{user_id}", files={"photo": ("me", avatar, "image/png")}, headers=headers
+    )
+    photo = client.get("/api/user", headers=headers).json()["photo"]
+    assert photo.startswith("/api/blob/")
+    # No token needed, the URL is the capability
+    response = client.get(photo)
+    assert response.status_code == 200
+    assert response.content == avatar
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == IMMUTABLE
+    response = client.get(photo, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    # A new avatar gets a new URL, the old one still serves the old bytes
+    client.post(
+        f"/api/user/{user_id}", files={"photo": ("me", png("blue"), "image/png")}, headers=headers
+    )
+    assert client.get("/api/user", headers=headers).json()["photo"] != photo
+    assert client.get(photo).content == avatar
+
+    # Materials
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Assets", "description": "assets"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    pdf = b"%PDF-1.4\n" + os.urandom(1000)
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "slides.pdf", "section_id": section_id},
+        files={"file": ("slides.pdf", pdf, "application/pdf")},
+        headers=headers,
+    )
+    url = client.get(f"/api/material/{material_id}", headers=headers).json()["url"]
+    response = client.get(url)
+    assert response.content == pdf
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["content-disposition"].startswith("inline")
+
+    # Assignment starter files; markup is downloaded, never rendered
+    file_id = client.post(
+        "/api/file",
+        data={"file_name": "index.html", "file_path": "/"},
+        files={"file": ("index.html", b"<script>alert(1)</script>", "text/html")},
+        headers=headers,
+    ).json()["file_id"]
+    client.post(
+        "/api/assignment",
+        data={"name": "Homework", "course_id": course_id, "files": [file_id]},
+        headers=headers,
+    )
+    assignment = client.get(f"/api/assignments/{course_id}", headers=headers).json()[
+        "assignments"
+    ][0]
+    [starter] = assignment["files"]
+    _, outsider = register_and_login(client, is_teacher=True)
+    assert client.get(f"/api/assignments/{course_id}", headers=outsider).status_code == 404
+    assert starter["file_name"] == "index.html"
+    response = client.get(starter["url"])
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment")
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+    assert client.get(f"/api/blob/{'0' * 64}/missing").status_code == 404
+    assert client.get("/api/blob/not-a-hash/missing").status_code == 404
@@ -1,26 +1,20 @@
 import uuid
 import random
-import string
 from fastapi.testclient import TestClient
 import pytest
 from app.main import app
+from conftest import generate_random_string, reset_database
 
 client = TestClient(app)
 
-from app.db import Base, engine
+from app.db import engine
 
 @pytest.fixture(autouse=True)
 def run_around_tests():
-    # Startup: setup database
-    Base.metadata.reflect(bind=engine)
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    # Startup: a fresh database for every test here
+    reset_database()
     yield
 
-def generate_random_string(length=8):
-    """Generate a random string of specified length"""
-    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
-
 
 def generate_random_user_data():
     """Generate random user data for testing"""
@@ -138,3 +132,69 @@ def test_protected_endpoint_access():
         "/api/user", headers={"Authorization": f"Bearer {invalid_token}"}
     )
     assert response.status_code == 401
+
+
+def test_password_is_rehashed_when_rounds_change(monkeypatch):
+    from passlib.context import CryptContext
+    from sqlalchemy import text
+    from app.auth.hashing import password_hasher
+
+    user_data = generate_random_user_data()
+    client.post("/api/register", json=user_data)
+
+    monkeypatch.setattr(
+        password_hasher,
+        "context",
+        CryptContext(
+            schemes=["bcrypt"],
+            bcrypt__default_rounds=4,
+            bcrypt__min_rounds=4,
+            bcrypt__max_rounds=4,
+        ),
+    )
+    login = {"name": user_data["user_id"], "password": user_data["password"]}
+    assert client.post("/api/login", json=login).status_code == 200
+
+    with engine.connect() as conn:
+        stored = conn.execute(
+            text("SELECT password FROM users WHERE user_id = :id"),
+            {"id": user_data["user_id"]},
+        ).scalar()
+    assert stored.startswith("$2b$04$")
+    # The new hash still verifies
+    assert client.post("/api/login", json=login).status_code == 200
+
+
+def test_expired_sessions_are_reaped():
+    import asyncio
+    from sqlalchemy import text
+    from app.auth.reaper import session_reaper
+
+    user_data = generate_random_user_data()
+    client.post("/api/register", json=user_data)
+    login = {"name": user_data["user_id"], "password": user_data["password"]}
+    tokens = [client.post("/api/login", json=login).json()["token"] for _ in range(3)]
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE sessions SET expires_at = now() - interval '1 day' "
+                "WHERE id IN (SELECT id FROM sessions WHERE user_id = :id LIMIT 2)"
+            ),
+            {"id": user_data["user_id"]},
+        )
+
+    run = asyncio.run(session_reaper.reap())
+    assert run["deleted"]["sessions"] == 2
+
+    with engine.connect() as conn:
+        remaining = conn.execute(
+            text("SELECT count(*) FROM sessions WHERE user_id = :id"),
+            {"id": user_data["user_id"]},
+        ).scalar()
+    assert remaining == 1
+    statuses = [
+        client.get("/api/user", headers={"Authorization": f"Bearer {token}"}).status_code
+        for token in tokens
+    ]
+    assert sorted(statuses) == [200, 401, 401]
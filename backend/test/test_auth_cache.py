@@ -0,0 +1,92 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.db import engine
+from app.main import app
+from app.models.user import User
+from conftest import register_and_login
+
+
+def query_count(response):
+    assert response.status_code == 200
+    return int(response.headers["X-DB-Query-Count"])
+
+
+def wait_for_listener():
+    from app.auth.cache import session_cache
+
+    for _ in range(50):
+        if session_cache.enabled:
+            return
+        time.sleep(0.1)
+    raise AssertionError("auth cache listener did not start")
+
+
+@pytest.mark.usefixtures("database")
+def test_session_cache():
+    # Entering the client runs the lifespan, which starts the LISTEN task
+    with TestClient(app) as client:
+        wait_for_listener()
+        user_id, headers = register_and_login(client, is_teacher=False)
+
+        cold = query_count(client.get("/api/courses", headers=headers))
+        warm = query_count(client.get("/api/courses", headers=headers))
+        assert warm == cold - 1
+
+        # Another worker changing the user
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify('auth_cache', :p)"), {"p": f"user:{user_id}"})
+        time.sleep(0.5)
+        assert query_count(client.get("/api/courses", headers=headers)) == cold
+
+        # Profile changes are visible right away
+        client.post(f"/api/user/{user_id}", data={"office_place": "Room 101"}, headers=headers)
+        assert client.get("/api/user", headers=headers).json()["office_place"] == "Room 101"
+
+        client.delete("/api/logout", headers=headers)
+        assert client.get("/api/courses", headers=headers).status_code == 401
+
+
+@pytest.mark.usefixtures("database")
+def test_stateless_tokens(monkeypatch):
+    from app import auth
+    from app.auth import middleware
+
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+    monkeypatch.setattr(middleware, "AUTH_STATELESS", True)
+    with TestClient(app) as client:
+        wait_for_listener()
+        user_id, headers = register_and_login(client, is_teacher=True, name="Stateless User")
+
+        response = client.get("/api/user", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Stateless User"
+        assert response.json()["is_teacher"] is True
+
+        assert client.delete("/api/logout", headers=headers).status_code == 200
+        assert client.get("/api/courses", headers=headers).status_code == 401
+
+
+def test_put_after_invalidation_is_dropped(monkeypatch):
+    from app.auth.cache import SessionCache, listener
+
+    monkeypatch.setattr(listener, "listening", True)
+    cache = SessionCache(60, 10)
+    user = User(user_id="u", name="User", password="password")
+    expires_at = datetime.now() + timedelta(hours=1)
+
+    # The session was read before a logout whose notification came first
+    generation = cache.generation
+    cache.invalidate_session("s")
+    cache.put("s", user, expires_at, generation)
+    assert cache.get("s") is None
+
+    cache.put("s", user, expires_at, cache.generation)
+    assert cache.get("s")["user_id"] == "u"
+    # Evicting and expiring entries invalidates nothing
+    generation = cache.generation
+    for i in range(20):
+        cache.put(f"s{i}", user, expires_at, generation)
+    assert cache.generation == generation
@@ -0,0 +1,100 @@
+import os
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.blobs import blob_store, collect_garbage
+from app.db import engine
+from app.main import app
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+
+def test_identical_uploads_share_a_blob():
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id = str(uuid.uuid4()), str(uuid.uuid4())
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Blobs", "description": "blobs"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+
+    pdf = b"%PDF-1.4\n" + os.urandom(1000)
+    material_ids = [str(uuid.uuid4()) for _ in range(2)]
+    for material_id in material_ids:
+        client.post(
+            f"/api/material/{material_id}",
+            data={"material_name": "slides.pdf", "section_id": section_id},
+            files={"file": ("slides.pdf", pdf, "application/pdf")},
+            headers=headers,
+        )
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT data_hash, data_size, data_mime FROM materials "
+                "WHERE CAST(material_id AS VARCHAR) = ANY(:ids)"
+            ),
+            {"ids": material_ids},
+        ).all()
+    assert len(rows) == 2 and rows[0] == rows[1]
+    digest, size, mime = rows[0]
+    assert (size, mime) == (len(pdf), "application/pdf")
+    assert blob_store.get(digest) == pdf
+
+    response = client.get(f"/api/material/{material_ids[0]}/file", headers=headers)
+    assert response.content == pdf
+
+    # Referenced blobs survive a collection, orphans past the grace period do not
+    orphan, _ = blob_store.put(os.urandom(100))
+    collect_garbage(engine, grace=0)
+    assert blob_store.exists(digest)
+    assert not blob_store.exists(orphan)
+
+
+def test_material_download():
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Download", "description": "download"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    pdf = b"%PDF-1.4\n" + os.urandom(10000)
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "slides.pdf", "section_id": section_id},
+        files={"file": ("slides.pdf", pdf, "application/pdf")},
+        headers=headers,
+    )
+
+    material = client.get(f"/api/material/{material_id}", headers=headers).json()
+    assert "data" not in material
+    assert material["size"] == len(pdf)
+
+    response = client.get(material["url"], headers=headers)
+    assert response.status_code == 200
+    assert response.content == pdf
+    assert response.headers["content-type"] == "application/pdf"
+    etag = response.headers["etag"]
+
+    response = client.get(material["url"], headers={**headers, "Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.content == pdf[:100]
+    assert response.headers["content-range"] == f"bytes 0-99/{len(pdf)}"
+
+    response = client.get(material["url"], headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,106 @@
+import uuid
+from datetime import timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.slides import calendar
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+
+def test_calendar_changes_and_feed(monkeypatch):
+    # Only what changed after the token, without the lookback
+    monkeypatch.setattr(calendar, "SYNC_GRACE", timedelta(0))
+    _, teacher = register_and_login(client, is_teacher=True)
+    student_id, student = register_and_login(client, is_teacher=False)
+    course_id, section_id, other_section_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Calendar", "description": "calendar"},
+        headers=teacher,
+    )
+    client.post("/api/enroll", data={"course_id": course_id, "user_id": student_id}, headers=teacher)
+    for sid, name in [(section_id, "Week 1"), (other_section_id, "Week 2")]:
+        client.post(
+            "/api/section",
+            data={
+                "section_id": sid,
+                "course_id": course_id,
+                "name": name,
+                "schedules": ["2025-03-01 10:00:00"],
+            },
+            headers=teacher,
+        )
+    assignment_id = client.post(
+        "/api/assignment",
+        data={"name": "Homework", "course_id": course_id, "deadline": "2025-04-01 23:59:59"},
+        headers=teacher,
+    ).json()["assignment_id"]
+
+    response = client.get("/api/calendar/changes", headers=student)
+    assert response.status_code == 200
+    first = response.json()
+    assert first["full"] is True
+    assert {entry["uid"] for entry in first["changed"]} == {
+        f"section-{section_id}",
+        f"section-{other_section_id}",
+        f"assignment-{assignment_id}",
+    }
+    assert first["courses"] == [{"course_id": course_id, "name": "Calendar"}]
+
+    # Polling without changes
+    etag = response.headers["etag"]
+    response = client.get("/api/calendar/changes", headers={**student, "If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get(
+        "/api/calendar/changes",
+        headers={**student, "If-Modified-Since": response.headers["last-modified"]},
+    )
+    assert response.status_code == 304
+    token = first["sync_token"]
+    changes = client.get(f"/api/calendar/changes?sync_token={token}", headers=student).json()
+    assert changes["full"] is False
+    assert changes["changed"] == [] and changes["removed"] == []
+
+    # Only the edited and removed entries come back
+    client.post(
+        f"/api/assignment/{assignment_id}", data={"deadline": "2025-04-02 23:59:59"}, headers=teacher
+    )
+    client.delete(f"/api/section/{other_section_id}", headers=teacher)
+    response = client.get(
+        f"/api/calendar/changes?sync_token={token}", headers={**student, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    changes = response.json()
+    [entry] = changes["changed"]
+    assert entry["uid"] == f"assignment-{assignment_id}"
+    assert entry["deadline"] == "2025-04-02 23:59:59"
+    assert changes["removed"] == [f"section-{other_section_id}"]
+    assert changes["sync_token"] != token
+
+    assert (
+        client.get("/api/calendar/changes?sync_token=nope", headers=student).status_code == 400
+    )
+
+    # The .ics feed needs no token, its URL is the secret
+    assert client.get("/api/calendar/feed", headers=student).json()["url"] is None
+    url = client.post("/api/calendar/feed", headers=student).json()["url"]
+    assert client.get("/api/calendar/feed", headers=student).json()["url"] == url
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    body = response.text
+    assert body.startswith("BEGIN:VCALENDAR\r\n")
+    assert "SUMMARY:Calendar: Week 1\r\n" in body
+    assert "DTSTART:20250301T100000\r\n" in body
+    assert "DTSTART:20250402T235959\r\n" in body
+    assert "Week 2" not in body
+    response = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    # A new URL retires the old one
+    client.post("/api/calendar/feed", headers=student)
+    assert client.get(url).status_code == 404
@@ -0,0 +1,84 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+
+def get(url, headers):
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return response.json(), int(response.headers["X-DB-Query-Count"])
+
+
+def test_dashboard_is_cached_per_course_and_follows_writes():
+    _, teacher = register_and_login(client, is_teacher=True)
+    student_id, student = register_and_login(client, is_teacher=False)
+    course_ids = [str(uuid.uuid4()) for _ in range(3)]
+    section_id = str(uuid.uuid4())
+    for course_id in course_ids:
+        client.post(
+            "/api/course_info",
+            data={"course_id": course_id, "name": "Cached", "description": "cached"},
+            headers=teacher,
+        )
+        client.post(
+            "/api/enroll", data={"course_id": course_id, "user_id": student_id}, headers=teacher
+        )
+    client.post(
+        "/api/section",
+        data={
+            "section_id": section_id,
+            "course_id": course_ids[0],
+            "name": "Week 1",
+            "schedules": ["2025-03-01"],
+        },
+        headers=teacher,
+    )
+    assignment_id = client.post(
+        "/api/assignment",
+        data={"name": "Homework", "course_id": course_ids[0], "deadline": "2025-04-01"},
+        headers=teacher,
+    ).json()["assignment_id"]
+
+    courses, built = get("/api/courses", student)
+    assert len(courses["courses"]) == 3
+    again, cached = get("/api/courses", student)
+    assert again == courses
+    # Only the versions are read once every course is cached
+    assert cached < built
+    _, calendar_built = get("/api/courses/calendar", student)
+    calendar, calendar_cached = get("/api/courses/calendar", student)
+    assert calendar_cached == cached < calendar_built
+    [course] = [course for course in calendar["courses"] if course["sections"]]
+    assert course["sections"] == [{"name": "Week 1", "schedules": ["2025-03-01"]}]
+    assert course["assignments"] == [{"name": "Homework", "deadline": "2025-04-01"}]
+
+    # Writes to sections, assignments and members show up right away
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "schedules": ["2025-03-02"]},
+        headers=teacher,
+    )
+    client.post(
+        f"/api/assignment/{assignment_id}", data={"deadline": "2025-04-02"}, headers=teacher
+    )
+    calendar, _ = get("/api/courses/calendar", student)
+    [course] = [course for course in calendar["courses"] if course["sections"]]
+    assert course["sections"] == [{"name": "Week 1", "schedules": ["2025-03-02"]}]
+    assert course["assignments"] == [{"name": "Homework", "deadline": "2025-04-02"}]
+
+    co_teacher_id, _ = register_and_login(client, is_teacher=True, name="Co Teacher")
+    client.post(
+        "/api/enroll", data={"course_id": course_ids[1], "user_id": co_teacher_id}, headers=teacher
+    )
+    courses, rebuilt = get("/api/courses", student)
+    teachers = {course["course_id"]: course["teachers_name"] for course in courses["courses"]}
+    assert "Co Teacher" in teachers[course_ids[1]]
+    assert "Co Teacher" not in teachers[course_ids[2]]
+    # Only the changed course was built again
+    assert cached < rebuilt <= built
@@ -0,0 +1,78 @@
+import os
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from app.db import Base
+from app.main import app
+from conftest import captured_statements, register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+PAYLOAD_SIZE = 1_000_000
+
+# "table.column" of every deferred column, as it appears in a SELECT list
+DEFERRED = [
+    f"{prop.columns[0].table.name}.{prop.columns[0].name}"
+    for mapper in Base.registry.mappers
+    for prop in inspect(mapper).column_attrs
+    if prop.deferred
+]
+
+
+def get_light(path, headers):
+    """GETs ``path`` and checks that no deferred column was read for it."""
+    with captured_statements() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    loaded = [column for column in DEFERRED for statement in statements if column in statement]
+    assert not loaded
+    return response
+
+
+def setup_course_with_material():
+    user_id, headers = register_and_login(client, is_teacher=True)
+
+    client.post(
+        f"/api/user/{user_id}",
+        files={"photo": ("avatar.png", os.urandom(PAYLOAD_SIZE), "image/png")},
+        headers=headers,
+    )
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Deferred", "description": "deferred"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "slides.pdf", "section_id": section_id},
+        files={"file": ("slides.pdf", os.urandom(PAYLOAD_SIZE), "application/pdf")},
+        headers=headers,
+    )
+    return headers, course_id, material_id
+
+
+def test_heavy_columns_are_only_fetched_when_returned():
+    headers, course_id, material_id = setup_course_with_material()
+
+    # These used to read the whole avatar on every request, and every PDF of
+    # the course for the section list
+    get_light("/api/courses", headers)
+    get_light(f"/api/sections/{course_id}", headers)
+
+    # Avatars are in the blob store, responses only link to them
+    response = get_light(f"/api/fetch_member/{course_id}", headers)
+    assert response.json()["users"][0]["photo"].startswith("/api/blob/")
+    get_light("/api/user", headers)
+
+    # Materials come from the blob store, not the database
+    response = get_light(f"/api/material/{material_id}", headers)
+    assert response.json()["size"] == PAYLOAD_SIZE
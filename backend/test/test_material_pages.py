@@ -0,0 +1,258 @@
+import asyncio
+import io
+import os
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from app import pages
+from app.blobs import blob_store
+from app.main import app
+from app.pages import THUMBNAIL_WIDTHS, material_processor
+from conftest import generate_random_string, register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+PDF_PATH = os.path.join(os.path.dirname(__file__), "2503.21708v2.pdf")
+
+
+def test_material_pages():
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Pages", "description": "pages"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    with open(PDF_PATH, "rb") as f:
+        pdf = f.read()
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "paper.pdf", "section_id": section_id},
+        files={"file": ("paper.pdf", pdf, "application/pdf")},
+        headers=headers,
+    )
+    client.post(
+        "/api/comment",
+        data={
+            "content": "On page two",
+            "material_id": material_id,
+            "page": 2,
+        },
+        headers=headers,
+    )
+
+    # The test client does not start the background processor
+    response = client.get(f"/api/material/{material_id}/file", headers=headers)
+    data_hash = response.headers["etag"].strip('"')
+    asyncio.run(material_processor.process(data_hash))
+
+    pages = client.get(f"/api/material/{material_id}/pages", headers=headers).json()
+    page_count = len(PdfReader(io.BytesIO(pdf)).pages)
+    assert pages["page_count"] == page_count
+    assert len(pages["pages"]) == page_count
+
+    response = client.get(f"/api/material/{material_id}/page/2", headers=headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert page["page"] == 2 and page["width"] > 0 and page["height"] > 0
+    assert [comment["content"] for comment in page["comments"]] == ["On page two"]
+    assert page["text"].strip()
+
+    response = client.get(page["url"], headers=headers)
+    assert response.status_code == 200
+    assert len(response.content) == page["size"] < len(pdf)
+    assert len(PdfReader(io.BytesIO(response.content)).pages) == 1
+
+    response = client.get(f"/api/material/{material_id}/page/{page_count + 1}", headers=headers)
+    assert response.status_code == 404
+
+    # Thumbnails are keyed by content and cached for good
+    thumbnails = page["thumbnails"]
+    assert set(thumbnails) == {str(width) for width in THUMBNAIL_WIDTHS}
+    response = client.get(thumbnails[str(THUMBNAIL_WIDTHS[0])], headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    assert Image.open(io.BytesIO(response.content)).width == THUMBNAIL_WIDTHS[0]
+    response = client.get(
+        thumbnails[str(THUMBNAIL_WIDTHS[0])],
+        headers={**headers, "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+    # Nothing that hands out its URLs or bytes is open to non-members
+    _, outsider = register_and_login(client, is_teacher=True)
+    for url in (
+        f"/api/material/{material_id}",
+        f"/api/material/{material_id}/file",
+        f"/api/material/{material_id}/pages",
+        f"/api/material/{material_id}/page/2",
+        f"/api/material/{material_id}/page/2/file",
+        thumbnails[str(THUMBNAIL_WIDTHS[0])],
+    ):
+        assert client.get(url, headers=outsider).status_code == 404, url
+    assert client.get(thumbnails[str(THUMBNAIL_WIDTHS[0])]).status_code == 401
+
+    # An identical upload reuses the pages and renders
+    copy_id = str(uuid.uuid4())
+    client.post(
+        f"/api/material/{copy_id}",
+        data={"material_name": "copy.pdf", "section_id": section_id},
+        files={"file": ("copy.pdf", pdf, "application/pdf")},
+        headers=headers,
+    )
+    copy = client.get(f"/api/material/{copy_id}/page/2", headers=headers).json()
+    assert copy["thumbnails"] == thumbnails
+    # Its text is copied over once processed
+    assert copy["text"] is None
+
+    # Workers storing the same text at once do not trip over each other
+    async def process_twice():
+        await asyncio.gather(*(material_processor.process(data_hash) for _ in range(2)))
+
+    asyncio.run(process_twice())
+    copy = client.get(f"/api/material/{copy_id}/page/2", headers=headers).json()
+    assert copy["text"] == page["text"]
+
+
+def test_render_failure_is_recorded(monkeypatch):
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Pages", "description": "pages"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=100)
+    # A PDF of its own, not rendered by an earlier run
+    writer.add_metadata({"/Title": generate_random_string(16)})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "blank.pdf", "section_id": section_id},
+        files={"file": ("blank.pdf", buffer.getvalue(), "application/pdf")},
+        headers=headers,
+    )
+    response = client.get(f"/api/material/{material_id}/file", headers=headers)
+    data_hash = response.headers["etag"].strip('"')
+
+    # Thumbnails cannot be written under a file
+    monkeypatch.setattr(pages, "THUMBNAIL_PATH", os.path.join(PDF_PATH, "thumbnails"))
+    failed = material_processor.failed
+    asyncio.run(material_processor.process(data_hash))
+    assert material_processor.failed == failed + 1
+
+    # The pages are still served, without thumbnails, and nothing waits for them
+    page = client.get(f"/api/material/{material_id}/page/1", headers=headers).json()
+    assert page["thumbnails"] == {}
+    response = client.get(f"/api/thumbnail/{data_hash}/1", headers=headers)
+    assert response.status_code == 404
+    # Not rendered again
+    asyncio.run(material_processor.process(data_hash))
+    assert material_processor.failed == failed + 1
+
+
+def upload_pdf(data):
+    """A material holding ``data`` in a course of its own; returns the
+    teacher's headers, the material id and the PDF's hash."""
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Pages", "description": "pages"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "upload.pdf", "section_id": section_id},
+        files={"file": ("upload.pdf", data, "application/pdf")},
+        headers=headers,
+    )
+    response = client.get(f"/api/material/{material_id}/file", headers=headers)
+    return headers, material_id, response.headers["etag"].strip('"')
+
+
+def blank_pdf():
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=100)
+    writer.add_metadata({"/Title": generate_random_string(16)})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_unreadable_pdf_is_recorded():
+    headers, material_id, data_hash = upload_pdf(b"%PDF-1.4\n" + os.urandom(1000))
+
+    failed = material_processor.failed
+    asyncio.run(material_processor.process(data_hash))
+    assert material_processor.failed == failed + 1
+    assert data_hash not in material_processor.attempts
+    response = client.get(f"/api/material/{material_id}/pages", headers=headers)
+    assert response.status_code == 422
+
+    # Not split again
+    asyncio.run(material_processor.process(data_hash))
+    assert material_processor.failed == failed + 1
+
+
+def test_blob_store_failure_is_retried():
+    headers, material_id, data_hash = upload_pdf(blank_pdf())
+    path = blob_store.path(data_hash)
+
+    os.replace(path, f"{path}.away")
+    try:
+        failed = material_processor.failed
+        asyncio.run(material_processor.process(data_hash))
+    finally:
+        os.replace(f"{path}.away", path)
+    assert material_processor.failed == failed + 1
+    assert material_processor.attempts[data_hash] == 1
+    # Nothing recorded, the PDF is still waiting
+    response = client.get(f"/api/material/{material_id}/pages", headers=headers)
+    assert response.status_code == 503
+
+    asyncio.run(material_processor.process(data_hash))
+    assert data_hash not in material_processor.attempts
+    pages = client.get(f"/api/material/{material_id}/pages", headers=headers).json()
+    assert pages["page_count"] == 1
+
+
+def test_broken_pool_is_replaced():
+    headers, material_id, data_hash = upload_pdf(blank_pdf())
+
+    # A pool process dying, as when the kernel kills it for memory
+    pool = material_processor.executor()
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    asyncio.run(material_processor.process(data_hash))
+    assert material_processor.pool is not pool
+    assert material_processor.attempts[data_hash] == 1
+    response = client.get(f"/api/material/{material_id}/pages", headers=headers)
+    assert response.status_code == 503
+
+    asyncio.run(material_processor.process(data_hash))
+    pages = client.get(f"/api/material/{material_id}/pages", headers=headers).json()
+    assert pages["page_count"] == 1
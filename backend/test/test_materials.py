@@ -0,0 +1,117 @@
+import base64
+import os
+import re
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from conftest import captured_statements, register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+PAYLOAD_SIZE = 100_000
+
+
+def setup_course(material_count):
+    user_id, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id = str(uuid.uuid4()), str(uuid.uuid4())
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Materials", "description": "materials"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    pdfs = {}
+    for _ in range(material_count):
+        material_id = str(uuid.uuid4())
+        pdfs[material_id] = b"%PDF-1.4\n" + os.urandom(PAYLOAD_SIZE)
+        client.post(
+            f"/api/material/{material_id}",
+            data={"material_name": "slides.pdf", "section_id": section_id},
+            files={"file": ("slides.pdf", pdfs[material_id], "application/pdf")},
+            headers=headers,
+        )
+    return headers, course_id, section_id, pdfs
+
+
+def test_materials_are_paginated_and_filtered():
+    headers, course_id, section_id, pdfs = setup_course(5)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"course_id": course_id, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/materials", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["materials"]) <= 2
+        seen += page["materials"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(material["material_id"] for material in seen) == sorted(pdfs)
+    material = seen[0]
+    assert "data" not in material
+    assert material["section_id"] == section_id
+    assert re.fullmatch(r"/api/blob/[0-9a-f]{64}/.+\.pdf", material["url"])
+    assert material["size"] == PAYLOAD_SIZE + 9
+
+    response = client.get(
+        "/api/materials", params={"section_id": section_id, "limit": 10}, headers=headers
+    )
+    assert len(response.json()["materials"]) == 5
+
+    response = client.get(
+        "/api/materials", params={"section_id": str(uuid.uuid4())}, headers=headers
+    )
+    assert response.json() == {
+        "message": "Materials retrieved successfully",
+        "next_cursor": None,
+        "materials": [],
+    }
+
+    # Nothing of courses the user is not in, even unfiltered
+    other, _, _, _ = setup_course(1)
+    for params in ({"course_id": course_id}, {"section_id": section_id}, {"limit": 1000}):
+        response = client.get("/api/materials", params=params, headers=other)
+        assert not set(pdfs) & {material["material_id"] for material in response.json()["materials"]}
+
+
+def test_materials_fields_projection():
+    headers, course_id, _, pdfs = setup_course(2)
+
+    with captured_statements() as statements:
+        response = client.get(
+            "/api/materials",
+            params={"course_id": course_id, "fields": "material_id"},
+            headers=headers,
+        )
+    assert [set(material) for material in response.json()["materials"]] == [
+        {"material_id"}
+    ] * 2
+    # Only the projected columns are read
+    assert not [statement for statement in statements if "materials.material_name" in statement]
+
+    response = client.get(
+        "/api/materials",
+        params={"course_id": course_id, "fields": "material_id,data"},
+        headers=headers,
+    )
+    for material in response.json()["materials"]:
+        assert base64.b64decode(material["data"]) == pdfs[material["material_id"]]
+
+    response = client.get(
+        "/api/materials", params={"fields": "material_id,secret"}, headers=headers
+    )
+    assert response.status_code == 400
+    response = client.get("/api/materials", params={"cursor": "nope"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,162 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from conftest import generate_random_string, register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+
+def query_count(response):
+    assert response.status_code == 200
+    return int(response.headers["X-DB-Query-Count"])
+
+
+def test_query_count_headers():
+    _, headers = register_and_login(client, is_teacher=False)
+    response = client.get("/api/courses", headers=headers)
+    assert query_count(response) > 0
+    assert float(response.headers["X-DB-Query-Time"]) >= 0
+
+
+def test_group_members_are_not_fetched_one_by_one():
+    _, headers = register_and_login(client, is_teacher=True)
+    course_id = str(uuid.uuid4())
+    client.post(
+        "/api/course_info",
+        data={
+            "course_id": course_id,
+            "name": "Query Count",
+            "description": "query count",
+            "require_group": True,
+            "group_num": 1,
+            "people_per_group": 5,
+        },
+        headers=headers,
+    )
+    group_id = client.get(f"/api/group/{course_id}", headers=headers).json()["groups"][0]["group_id"]
+
+    counts = []
+    for _ in range(3):
+        student_id, _ = register_and_login(client, is_teacher=False)
+        client.post(f"/api/group/{group_id}/user/{student_id}", headers=headers)
+        response = client.get(f"/api/group/{course_id}", headers=headers)
+        counts.append(query_count(response))
+        assert "X-DB-Query-Warning" not in response.headers
+
+    assert counts[0] == counts[1] == counts[2]
+
+
+def test_course_outline_runs_the_same_queries_for_any_course_size():
+    _, headers = register_and_login(client, is_teacher=True)
+    course_id = str(uuid.uuid4())
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Outline", "description": "outline"},
+        headers=headers,
+    )
+
+    def grow():
+        section_id = str(uuid.uuid4())
+        client.post(
+            "/api/section",
+            data={
+                "section_id": section_id,
+                "course_id": course_id,
+                "name": f"Section {generate_random_string(4)}",
+                "schedules": ["2025-03-01", "2025-03-08"],
+            },
+            headers=headers,
+        )
+        for _ in range(2):
+            client.post(
+                f"/api/material/{uuid.uuid4()}",
+                data={"material_name": "slides.pdf", "section_id": section_id},
+                files={"file": ("slides.pdf", b"%PDF-1.4\n" + uuid.uuid4().bytes, "application/pdf")},
+                headers=headers,
+            )
+        file_id = client.post(
+            "/api/file",
+            data={"file_name": "main.py", "file_path": "/"},
+            files={"file": ("main.py", b"print(1)\n", "text/x-python")},
+            headers=headers,
+        ).json()["file_id"]
+        client.post(
+            "/api/assignment",
+            data={"name": "Homework", "course_id": course_id, "deadline": "2025-04-01", "files": [file_id]},
+            headers=headers,
+        )
+        co_teacher_id, _ = register_and_login(client, is_teacher=True)
+        client.post(
+            "/api/enroll", data={"course_id": course_id, "user_id": co_teacher_id}, headers=headers
+        )
+
+    counts = []
+    for size in range(1, 4):
+        grow()
+        response = client.get(f"/api/course/{course_id}/outline", headers=headers)
+        counts.append(query_count(response))
+        assert "X-DB-Query-Warning" not in response.headers
+        outline = response.json()
+        assert len(outline["sections"]) == size
+        assert all(len(section["materials"]) == 2 for section in outline["sections"])
+        assert len(outline["schedules"]) == 2 * size
+        assert len(outline["assignments"]) == size
+        assert all(len(assignment["files"]) == 1 for assignment in outline["assignments"])
+        assert len(outline["instructors"]) == size + 1
+
+    assert counts[0] == counts[1] == counts[2]
+
+    _, outsider = register_and_login(client, is_teacher=False)
+    response = client.get(f"/api/course/{course_id}/outline", headers=outsider)
+    assert response.status_code == 403
+
+
+def test_sections_and_course_info_run_the_same_queries_for_any_course_size():
+    _, headers = register_and_login(client, is_teacher=True)
+    course_id = str(uuid.uuid4())
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Sections", "description": "sections"},
+        headers=headers,
+    )
+
+    section_counts, info_counts = [], []
+    for size in range(1, 4):
+        section_id = str(uuid.uuid4())
+        client.post(
+            "/api/section",
+            data={
+                "section_id": section_id,
+                "course_id": course_id,
+                "name": f"Section {size}",
+                "schedules": ["2025-03-01", "2025-03-08"],
+            },
+            headers=headers,
+        )
+        for name in ("first.pdf", "second.pdf"):
+            client.post(
+                f"/api/material/{uuid.uuid4()}",
+                data={"material_name": name, "section_id": section_id},
+                files={"file": (name, b"%PDF-1.4\n" + uuid.uuid4().bytes, "application/pdf")},
+                headers=headers,
+            )
+
+        response = client.get(f"/api/sections/{course_id}", headers=headers)
+        section_counts.append(query_count(response))
+        sections = response.json()["sections"]
+        assert len(sections) == size
+        assert all(
+            sorted(material["material_name"] for material in section["materials"])
+            == ["first.pdf", "second.pdf"]
+            for section in sections
+        )
+
+        response = client.get(f"/api/course_info/{course_id}", headers=headers)
+        info_counts.append(query_count(response))
+        assert len(response.json()["schedules"]) == 2 * size
+
+    assert section_counts[0] == section_counts[1] == section_counts[2]
+    assert info_counts[0] == info_counts[1] == info_counts[2]
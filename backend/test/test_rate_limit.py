@@ -0,0 +1,36 @@
+import time
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from app.ratelimit import RateLimiter, Limit
+
+app = FastAPI()
+rejecting = RateLimiter("test_reject", per_user=Limit(1, 3))
+queueing = RateLimiter("test_queue", global_limit=Limit(10, 1), queue=True, max_wait=1)
+
+
+@app.get("/reject", dependencies=[Depends(rejecting)])
+async def reject():
+    return {}
+
+
+@app.get("/queue", dependencies=[Depends(queueing)])
+async def queue():
+    return {}
+
+
+client = TestClient(app)
+
+
+def test_burst_then_429():
+    statuses = [client.get("/reject").status_code for _ in range(5)]
+    assert statuses == [200, 200, 200, 429, 429]
+    assert rejecting.status()["rejected"] == 2
+
+
+def test_queue_waits_for_a_token():
+    start = time.perf_counter()
+    statuses = [client.get("/queue").status_code for _ in range(5)]
+    assert statuses == [200] * 5
+    # One immediately, then one every 0.1 s
+    assert time.perf_counter() - start >= 0.3
+    assert queueing.status()["queued"] >= 3
@@ -0,0 +1,60 @@
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db import replica_health
+from conftest import register_and_login
+
+pytestmark = [
+    pytest.mark.skipif(
+        not os.getenv("POSTGRES_REPLICA_HOST"), reason="no read replica configured"
+    ),
+    pytest.mark.usefixtures("database"),
+]
+
+client = TestClient(app)
+
+
+def test_reads_stay_on_primary_after_own_write():
+    user_id, headers = register_and_login(client, is_teacher=False)
+    time.sleep(1)
+    replica_health.checked_at = 0
+
+    # Like the frontend, without cookies: the server remembers the writer
+    response = client.post(
+        f"/api/user/{user_id}", data={"office_place": "Room 7"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+    client.cookies.clear()
+    response = client.get("/api/courses", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["X-DB-Target"] == "primary"
+
+    # Other users still read from the replica
+    _, other = register_and_login(client, is_teacher=False)
+    time.sleep(1)
+    replica_health.checked_at = 0
+    response = client.get("/api/courses", headers=other)
+    assert response.headers["X-DB-Target"] == "replica"
+
+
+def test_reads_go_to_healthy_replica():
+    _, headers = register_and_login(client, is_teacher=False)
+
+    # Give the replica time to replay the login, then force a fresh probe
+    time.sleep(1)
+    replica_health.checked_at = 0
+    response = client.get("/api/courses", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["X-DB-Target"] == "replica"
+
+
+def test_reads_fall_back_when_replica_is_down():
+    _, headers = register_and_login(client, is_teacher=False)
+
+    replica_health.mark_down(RuntimeError("replica stopped"))
+    response = client.get("/api/courses", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["X-DB-Target"] == "primary"
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import random
+import string
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.db import engine
+from app.main import app
+from app.pages import material_processor
+from app.slides.search import search_statement
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+PDF_PATH = os.path.join(os.path.dirname(__file__), "2503.21708v2.pdf")
+
+
+def search(q, headers, **params):
+    response = client.get("/api/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search():
+    teacher_id, teacher = register_and_login(client, is_teacher=True)
+    student_id, student = register_and_login(client, is_teacher=False)
+    _, outsider = register_and_login(client, is_teacher=False)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Search", "description": "search"},
+        headers=teacher,
+    )
+    client.post(
+        "/api/enroll", data={"course_id": course_id, "user_id": student_id}, headers=teacher
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=teacher,
+    )
+    with open(PDF_PATH, "rb") as f:
+        client.post(
+            f"/api/material/{material_id}",
+            data={"material_name": "paper.pdf", "section_id": section_id},
+            files={"file": ("paper.pdf", f.read(), "application/pdf")},
+            headers=teacher,
+        )
+    response = client.get(f"/api/material/{material_id}/file", headers=teacher)
+    asyncio.run(material_processor.process(response.headers["etag"].strip('"')))
+
+    # Page text, with where it was found
+    results = search("Stollenwerk", student)["results"]
+    assert {"kind": "page", "material_id": material_id, "page": 1}.items() <= results[0].items()
+    assert results[0]["course_id"] == course_id
+    assert "<b>Stollenwerk</b>" in results[0]["headline"]
+    assert search("Stollenwerk", outsider)["results"] == []
+
+    # Letters only, digits would be split into separate tokens
+    word = "".join(random.choices(string.ascii_lowercase, k=12))
+    client.post(
+        "/api/comment",
+        data={"content": f"What does {word} mean?", "material_id": material_id, "page": 3},
+        headers=student,
+    )
+    note_id, snippet_id = str(uuid.uuid4()), str(uuid.uuid4())
+    client.post(
+        f"/api/note/{note_id}",
+        data={"material_id": material_id, "content": f"{word} {word} is private"},
+        headers=teacher,
+    )
+    client.post(
+        f"/api/snippet/{material_id}/page/2",
+        data={
+            "snippet_id": snippet_id,
+            "lang": "python",
+            "content": f"print('{word}')",
+            "position_x": 0,
+            "position_y": 0,
+        },
+        headers=teacher,
+    )
+
+    results = search(word, teacher)["results"]
+    assert sorted((hit["kind"], hit["page"]) for hit in results) == [
+        ("code_snippet", 2),
+        ("comment", 3),
+        ("note", None),
+    ]
+    # Repeated words rank higher
+    assert results[0]["kind"] == "note" and results[0]["id"] == note_id
+    # Others' notes are not searched
+    assert sorted(hit["kind"] for hit in search(word, student)["results"]) == [
+        "code_snippet",
+        "comment",
+    ]
+    assert search(word, outsider)["results"] == []
+
+    # Vectors follow edits
+    client.post(
+        f"/api/snippet/{material_id}/page/2",
+        data={"snippet_id": snippet_id, "content": "print('edited')"},
+        headers=teacher,
+    )
+    assert [hit["kind"] for hit in search(word, student)["results"]] == ["comment"]
+
+    first = search(word, teacher, limit=1)
+    assert len(first["results"]) == 1 and first["next_offset"] == 1
+    second = search(word, teacher, limit=1, offset=1)
+    assert second["results"] != first["results"] and second["next_offset"] is None
+
+    # The best comment is found however many others come before it
+    for _ in range(3):
+        client.post(
+            "/api/comment",
+            data={"content": f"{word}?", "material_id": material_id, "page": 4},
+            headers=student,
+        )
+    client.post(
+        "/api/comment",
+        data={"content": f"{word} {word} {word}", "material_id": material_id, "page": 5},
+        headers=student,
+    )
+    [best] = search(word, student, limit=1)["results"]
+    assert best["kind"] == "comment" and best["page"] == 5
+
+
+def test_search_ranks_each_kind_before_the_union():
+    user_id, _ = register_and_login(client, is_teacher=False)
+    statement = search_statement(user_id, "word", 20, 0).compile(engine)
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN {statement}", statement.params).scalars().all()
+    # One per kind, each keeping the best 21 of its sort, and the page itself
+    assert sum("Limit" in line for line in plan) == 5
+    assert sum("Sort Key: (ts_rank(" in line for line in plan) == 4
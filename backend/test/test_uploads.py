@@ -0,0 +1,118 @@
+import hashlib
+import os
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.uploads import upload_hashes
+from conftest import register_and_login
+
+pytestmark = pytest.mark.usefixtures("database")
+
+client = TestClient(app)
+
+
+def test_chunked_upload_resumes_and_attaches_to_material():
+    _, headers = register_and_login(client, is_teacher=True)
+    course_id, section_id, material_id = (str(uuid.uuid4()) for _ in range(3))
+    client.post(
+        "/api/course_info",
+        data={"course_id": course_id, "name": "Uploads", "description": "uploads"},
+        headers=headers,
+    )
+    client.post(
+        "/api/section",
+        data={"section_id": section_id, "course_id": course_id, "name": "Section"},
+        headers=headers,
+    )
+    pdf = b"%PDF-1.4\n" + os.urandom(3_000_000)
+
+    upload = client.post(
+        "/api/upload", data={"file_name": "slides.pdf", "size": len(pdf)}, headers=headers
+    ).json()
+    url = f"/api/upload/{upload['upload_id']}"
+    assert upload["offset"] == 0
+
+    response = client.put(url, params={"offset": 0}, content=pdf[:1_000_000], headers=headers)
+    assert response.json()["offset"] == 1_000_000
+
+    # A chunk at the wrong offset is refused with the offset to resume from
+    response = client.put(url, params={"offset": 0}, content=pdf[:10], headers=headers)
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "1000000"
+
+    # Resuming on a worker that has not seen the earlier chunks
+    upload_hashes.states.clear()
+    assert client.get(url, headers=headers).json()["offset"] == 1_000_000
+    response = client.put(url, params={"offset": 1_000_000}, content=pdf[1_000_000:], headers=headers)
+    assert response.json()["offset"] == len(pdf)
+
+    response = client.put(url, params={"offset": len(pdf)}, content=b"x", headers=headers)
+    assert response.status_code == 413
+
+    response = client.post(
+        f"{url}/finalize", data={"sha256": hashlib.sha256(pdf).hexdigest()}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["finalized"]
+    assert response.json()["mime"] == "application/pdf"
+
+    client.post(
+        f"/api/material/{material_id}",
+        data={"material_name": "slides.pdf", "section_id": section_id, "upload_id": upload["upload_id"]},
+        headers=headers,
+    )
+    material = client.get(f"/api/material/{material_id}", headers=headers).json()
+    assert material["size"] == len(pdf)
+    assert client.get(material["url"], headers=headers).content == pdf
+
+    # An upload is attached once
+    assert client.get(url, headers=headers).status_code == 404
+
+
+def test_checksum_mismatch_restarts_upload():
+    _, headers = register_and_login(client, is_teacher=True)
+    data = os.urandom(1000)
+    upload = client.post(
+        "/api/upload", data={"file_name": "main.py", "size": len(data)}, headers=headers
+    ).json()
+    url = f"/api/upload/{upload['upload_id']}"
+    client.put(url, params={"offset": 0}, content=data, headers=headers)
+
+    response = client.post(f"{url}/finalize", data={"sha256": "0" * 64}, headers=headers)
+    assert response.status_code == 422
+    assert client.get(url, headers=headers).json()["offset"] == 0
+
+    # Uploads are private to their owner
+    _, stranger = register_and_login(client, is_teacher=True)
+    assert client.get(url, headers=stranger).status_code == 404
+
+
+def test_restart_drops_hash_states_of_other_workers():
+    _, headers = register_and_login(client, is_teacher=True)
+    data = os.urandom(2000)
+    upload = client.post(
+        "/api/upload", data={"file_name": "main.py", "size": len(data)}, headers=headers
+    ).json()
+    url = f"/api/upload/{upload['upload_id']}"
+    corrupted = bytes(len(data) // 2)
+    client.put(url, params={"offset": 0}, content=corrupted, headers=headers)
+    # What another worker would still hold once this one restarts the upload
+    other_worker = dict(upload_hashes.states)
+    client.put(url, params={"offset": len(corrupted)}, content=data[len(corrupted):], headers=headers)
+    response = client.post(
+        f"{url}/finalize", data={"sha256": hashlib.sha256(data).hexdigest()}, headers=headers
+    )
+    assert response.status_code == 422
+
+    # The client starts over with the same chunk sizes; the second chunk
+    # lands on the worker with the state of the corrupted bytes
+    client.put(url, params={"offset": 0}, content=data[: len(corrupted)], headers=headers)
+    upload_hashes.states.clear()
+    upload_hashes.states.update(other_worker)
+    client.put(url, params={"offset": len(corrupted)}, content=data[len(corrupted):], headers=headers)
+    response = client.post(
+        f"{url}/finalize", data={"sha256": hashlib.sha256(data).hexdigest()}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["hash"] == hashlib.sha256(data).hexdigest()
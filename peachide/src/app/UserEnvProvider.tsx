@@ -119,8 +119,10 @@ export const UserProvider = ({ children }: { children: React.ReactNode }) => {
 
         const data = await response.json();
 
-        // Convert photo base64 to data URL if needed
-        if (data.photo && !data.photo.startsWith('data:')) {
+        // The photo is a backend URL (/api/blob/<hash>); older data is base64
+        if (data.photo && data.photo.startsWith('/')) {
+          data.photo = new URL(data.photo, process.env.NEXT_PUBLIC_API_URL).href;
+        } else if (data.photo && !data.photo.startsWith('data:')) {
           // Backend returns pure base64, convert to data URL
           // Assume JPEG format by default, but detect PNG if it starts with PNG signature
           const isPNG = data.photo.startsWith('iVBORw0KGgo'); // PNG base64 signature
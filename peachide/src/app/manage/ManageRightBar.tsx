@@ -41,6 +41,7 @@ import { SmartAvatar } from "@/components/ui/smart-avatar";
 import { Badge } from "@/components/ui/badge";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription, CardFooter } from "@/components/ui/card";
 import debounce from 'lodash/debounce';
+import { uploadInChunks } from '@/lib/upload';
 
 // Student data type
 interface Student {
@@ -1109,7 +1110,7 @@ const UploadMaterialDialog = ({
 
       formData.append('material_name', materialName);
       formData.append('section_id', sectionId);
-      formData.append('file', file);
+      formData.append('upload_id', await uploadInChunks(file, token));
 
       const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/material/${materialId}`, {
         method: 'POST',
@@ -1772,7 +1773,7 @@ const CreateAssignmentDialog = ({
       const formData = new FormData();
       formData.append('file_path', displayPath);
       formData.append('file_name', file.name);
-      formData.append('file', file);
+      formData.append('upload_id', await uploadInChunks(file, token));
 
       const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/file`, {
         method: 'POST',
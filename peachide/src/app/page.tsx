@@ -172,11 +172,9 @@ export default function Home() {
         if (userResponse.ok) {
           const updatedUserData = await userResponse.json();
 
-          // Convert photo base64 to data URL if needed
-          if (updatedUserData.photo && !updatedUserData.photo.startsWith('data:')) {
-            const isPNG = updatedUserData.photo.startsWith('iVBORw0KGgo');
-            const mimeType = isPNG ? 'image/png' : 'image/jpeg';
-            updatedUserData.photo = `data:${mimeType};base64,${updatedUserData.photo}`;
+          // The photo is a backend URL (/api/blob/<hash>)
+          if (updatedUserData.photo && updatedUserData.photo.startsWith('/')) {
+            updatedUserData.photo = new URL(updatedUserData.photo, process.env.NEXT_PUBLIC_API_URL).href;
           }
 
           setUserData(updatedUserData);
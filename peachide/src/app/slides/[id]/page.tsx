@@ -38,13 +38,16 @@ function PDFSection({ url, materialId, materialName }: { url: string, materialId
     const { isTeacher } = useUserContext();
     const { token } = useUserContext();
 
-    const downloadPDF = () => {
-        const pdfUrl = 'data:application/pdf;base64,' + url;
+    const downloadPDF = async () => {
+        const response = await fetch(url, {
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        const pdfUrl = URL.createObjectURL(await response.blob());
         const link = document.createElement('a');
         link.href = pdfUrl;
         link.download = `${materialName}.pdf`;
-        console.log(materialName, pdfUrl);
         link.click();
+        URL.revokeObjectURL(pdfUrl);
     };
 
     const handleFeedback = async (feedback: any) => {
@@ -473,7 +476,7 @@ export default function Slides({ params }: {
             transition={{ duration: 0.5 }}>
             <ResizablePanelGroup direction="horizontal">
                 <ResizablePanel defaultSize={70} className="col-span-2 h-full flex flex-col pr-5">
-                    <PDFSection url={material?.data} materialId={material?.material_id || ''} materialName={material?.material_name || ''} />
+                    <PDFSection url={material?.url ? new URL(material.url, process.env.NEXT_PUBLIC_API_URL).href : ''} materialId={material?.material_id || ''} materialName={material?.material_name || ''} />
                     <CommentsSection id={resolvedParams.id} />
                 </ResizablePanel>
                 <ResizableHandle />
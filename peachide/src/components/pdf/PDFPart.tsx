@@ -110,6 +110,7 @@ export const PDFPart: React.FC<PDFPartProps> = ({ props, onFeedbackAction }) =>
     const { userId } = useUserContext();
     const [localSnippets, setLocalSnippets] = useState<SnippetsData>([]);
     const { isTeacher } = useUserContext();
+    const { token } = useUserContext();
 
     useEffect(() => {
         setLocalSnippets(snippets);
@@ -171,19 +172,18 @@ export const PDFPart: React.FC<PDFPartProps> = ({ props, onFeedbackAction }) =>
         }
     };
 
-    const getPDFFile = () => {
+    // Fetched by pdf.js with range requests, so the first pages render before
+    // the whole file has arrived
+    const pdfFile = useMemo(() => {
         if (!props.url) return undefined;
-        if (typeof props.url === 'string' && !props.url.startsWith('data:application/pdf;base64,')) {
-            return `data:application/pdf;base64,${props.url}`;
-        }
-        return props.url;
-    };
+        return { url: props.url, httpHeaders: { 'Authorization': `Bearer ${token}` } };
+    }, [props.url, token]);
 
     return (
         <div ref={pdfContainerRef}
             className={`rounded-[var(--radius)] border-1 grow-0 h-full overflow-scroll`}
             style={{ "width": props.width }}>
-            <PDFDocument options={options} file={getPDFFile()}
+            <PDFDocument options={options} file={pdfFile}
                 onLoadSuccess={onDocumentLoadSuccess}>
                 {Array.from(new Array(numPages), (el, index) => (
                     <Page key={`page_${index + 1}`} pageNumber={index + 1} scale={scale}
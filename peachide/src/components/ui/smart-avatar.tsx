@@ -19,6 +19,11 @@ const convertPhotoFormat = (photo?: string): string => {
         return photo;
     }
 
+    // Avatars are served by the backend under /api/blob/<hash>
+    if (photo.startsWith('/')) {
+        return new URL(photo, process.env.NEXT_PUBLIC_API_URL).href;
+    }
+
     // Backend returns pure base64, convert to data URL
     // Detect PNG if it starts with PNG signature, otherwise assume JPEG
     const isPNG = photo.startsWith('iVBORw0KGgo'); // PNG base64 signature
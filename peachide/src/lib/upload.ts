@@ -0,0 +1,105 @@
+import { Sha256 } from '@/lib/sha256';
+
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_ATTEMPTS = 5;
+// 409s in a row, each answered by asking the server for its offset
+const MAX_CONFLICTS = 3;
+
+// One chunk in memory at a time, however large the file
+async function sha256Hex(file: File) {
+  const hash = new Sha256();
+  for (let start = 0; start < file.size; start += CHUNK_SIZE) {
+    hash.update(new Uint8Array(await file.slice(start, start + CHUNK_SIZE).arrayBuffer()));
+  }
+  return hash.hex();
+}
+
+/**
+ * Uploads a file in chunks through /upload and returns the upload id to attach
+ * it with (`upload_id` of POST /material/{id} and POST /file). An interrupted
+ * upload of the same file resumes where the server stopped receiving it.
+ */
+export async function uploadInChunks(file: File, token: string | null): Promise<string> {
+  const api = process.env.NEXT_PUBLIC_API_URL;
+  const headers = { 'Authorization': `Bearer ${token}` };
+  const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+  let uploadId = localStorage.getItem(resumeKey);
+  let offset = 0;
+  let finalized = false;
+  if (uploadId) {
+    const response = await fetch(`${api}/upload/${uploadId}`, { headers });
+    if (response.ok) {
+      const status = await response.json();
+      offset = status.offset;
+      finalized = status.finalized;
+    } else {
+      uploadId = null;
+    }
+  }
+  if (!uploadId) {
+    const formData = new FormData();
+    formData.append('file_name', file.name);
+    formData.append('size', String(file.size));
+    const response = await fetch(`${api}/upload`, { method: 'POST', headers, body: formData });
+    if (!response.ok) {
+      throw new Error('Failed to start upload');
+    }
+    uploadId = (await response.json()).upload_id as string;
+    localStorage.setItem(resumeKey, uploadId);
+  }
+
+  let attempts = 0;
+  let conflicts = 0;
+  while (!finalized && offset < file.size) {
+    let conflict = false;
+    try {
+      const response = await fetch(`${api}/upload/${uploadId}?offset=${offset}`, {
+        method: 'PUT',
+        headers,
+        body: file.slice(offset, offset + CHUNK_SIZE),
+      });
+      if (response.ok) {
+        offset = (await response.json()).offset;
+        attempts = 0;
+        conflicts = 0;
+        continue;
+      }
+      if (response.status !== 409) {
+        throw new Error(`Chunk rejected with ${response.status}`);
+      }
+      conflict = true;
+    } catch (error) {
+      if (++attempts >= MAX_ATTEMPTS) {
+        throw error;
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempts));
+    }
+    // A server that never takes the chunk would otherwise be asked forever
+    if (conflict && ++conflicts > MAX_CONFLICTS) {
+      throw new Error(`Upload kept conflicting at offset ${offset}`);
+    }
+    // Ask how much actually arrived before sending more
+    const response = await fetch(`${api}/upload/${uploadId}`, { headers });
+    if (!response.ok) {
+      throw new Error('Failed to resume upload');
+    }
+    offset = (await response.json()).offset;
+  }
+
+  if (!finalized) {
+    const formData = new FormData();
+    formData.append('sha256', await sha256Hex(file));
+    const response = await fetch(`${api}/upload/${uploadId}/finalize`, {
+      method: 'POST',
+      headers,
+      body: formData,
+    });
+    if (!response.ok) {
+      localStorage.removeItem(resumeKey);
+      throw new Error('Failed to finalize upload');
+    }
+  }
+  localStorage.removeItem(resumeKey);
+  return uploadId;
+}